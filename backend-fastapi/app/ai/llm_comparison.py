@@ -1,7 +1,11 @@
-import ollama as llama
+import logging
 import re
 import json
 
+from app.services.metrics import timed
+
+logger = logging.getLogger(__name__)
+
 
 def llm_semantic_comparison(buffer_a, buffer_b):
     # TODO: could be improved with input from the cosine similarity comparison as well -- works good enough for now though
@@ -25,14 +29,17 @@ def llm_semantic_comparison(buffer_a, buffer_b):
     second_pass_prompt = comparison_prompt(
         buffer_a, buffer_b, "prompts/second_pass.txt"
     )
+    import ollama as llama  # Imported on first use, like the models in semantic_comparison
+
     prompts = [first_pass_prompt, second_pass_prompt]
     responses = [None, None]
 
     for response_index, prompt in enumerate(prompts):
-        server_response = llama.generate(
-            model="deepseek-r1:latest", prompt=prompt, options={"temperature": 0.0}
-        )
-        print(server_response["response"])
+        with timed("llm_generate"):
+            server_response = llama.generate(
+                model="deepseek-r1:latest", prompt=prompt, options={"temperature": 0.0}
+            )
+        logger.debug("LLM response (pass %d): %s", response_index + 1, server_response["response"])
         prompt_response = remove_think_section(server_response["response"])
         prompt_response = (
             prompt_response.replace("```json", "").replace("```", "").strip()
@@ -43,12 +50,10 @@ def llm_semantic_comparison(buffer_a, buffer_b):
     combined_json = {**responses[0], **responses[1]}
 
     try:
-        print(f"COMBINED IS: {combined_json}")
+        logger.debug("Combined LLM comparison: %s", combined_json)
         return combined_json
     except Exception:
-        print("-" * 200)
-        print(f"COULD NOT PARSE JSON STRING:\n{prompt_response}")
-        print("-" * 200)
+        logger.error("Could not parse JSON string:\n%s", prompt_response)
         return {}
 
 
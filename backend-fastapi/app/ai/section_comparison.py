@@ -0,0 +1,193 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.ai.semantic_comparison import encode_sentences, preprocess_input
+from app.models.wiki_structure import Section
+from app.services.metrics import timed
+
+"""
+Section-aligned comparison of two versions of an article.
+
+semantic_compare compares every sentence of one article with every sentence of the other. This
+mode takes the sections of both articles (see app/services/article_parser.py) and first aligns
+them: each section is represented by the embedding of its title and lead sentence, and sections
+are paired one to one, most similar first, above ALIGNMENT_THRESHOLD. Sentences are then only
+compared within their pair of sections, which divides the similarity work by about the number
+of sections and avoids matches between unrelated sections.
+
+Sentences without a match in their aligned section (and the sentences of unaligned sections)
+are compared with the whole other article when the global fallback is on, so content moved to
+another section is not reported as missing.
+"""
+
+ALIGNMENT_THRESHOLD = 0.5  # Least similarity of two section representations to align them
+
+
+def configure(alignment_threshold: float = ALIGNMENT_THRESHOLD) -> None:
+    global ALIGNMENT_THRESHOLD
+    ALIGNMENT_THRESHOLD = alignment_threshold
+
+
+def _normalize(embeddings) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    return embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+
+def _encode(model_name: str, sentences: List[str]) -> np.ndarray:
+    if not sentences:
+        return np.zeros((0, 0), dtype=np.float32)
+    return _normalize(encode_sentences(model_name, sentences))
+
+
+def section_representation(title: str, sentences: List[str]) -> str:
+    """The text standing for a section when aligning: its title and lead sentence."""
+    return f"{title}. {sentences[0]}" if sentences else title
+
+
+def align_sections(similarities: np.ndarray, threshold: float) -> List[Tuple[int, int, float]]:
+    """
+    Pair sections one to one, most similar pairs first, ignoring pairs below the threshold.
+    'similarities' holds the similarity of each source section (rows) with each target section.
+    Returns (source index, target index, similarity) in source order.
+    """
+    pairs = []
+    used_source, used_target = set(), set()
+    order = np.argsort(similarities, axis=None)[::-1]
+    for flat in order:
+        source, target = np.unravel_index(flat, similarities.shape)
+        if similarities[source, target] < threshold:
+            break
+        if source in used_source or target in used_target:
+            continue
+        used_source.add(source)
+        used_target.add(target)
+        pairs.append((int(source), int(target), float(similarities[source, target])))
+    return sorted(pairs)
+
+
+def _section_sentences(sections: List[Section], language: str) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """All sentences of the sections, and the (start, end) range of each section in them."""
+    sentences, ranges = [], []
+    for section in sections:
+        start = len(sentences)
+        if section.clean_content:
+            sentences.extend(preprocess_input(section.clean_content, language))
+        ranges.append((start, len(sentences)))
+    return sentences, ranges
+
+
+def section_compare(model_name, source_sections: List[Section], target_sections: List[Section],
+                    source_language, target_language, sim_threshold, global_fallback=True,
+                    alignment_threshold: Optional[float] = None):
+    """
+    Compares two articles section by section.
+
+    Expected parameters:
+    {
+        "model_name": "string - name of the transformer model to use",
+        "source_sections": [Section of the original article],
+        "target_sections": [Section of the translated article],
+        "source_language": "string - language code of original article",
+        "target_language": "string - language code of translated article",
+        "sim_threshold": "float - similarity threshold value",
+        "global_fallback": "bool - compare sentences unmatched within their section with the whole other article",
+        "alignment_threshold": "float - least similarity to align two sections (ALIGNMENT_THRESHOLD if None)"
+    }
+
+    Returns:
+    {
+        "source_sentences": [sentences from original article, section after section],
+        "target_sentences": [sentences from translated article, section after section],
+        "missing_info_index": [indices of missing content],
+        "extra_info_index": [indices of extra content],
+        "sections": [one entry per aligned pair, then per unaligned section: {
+            "source_section", "target_section": section titles (None when unaligned),
+            "alignment_similarity", "source_range", "target_range": [start, end) in the sentences,
+            "missing_info_index", "extra_info_index"
+        }]
+    }
+    """
+    if sim_threshold is None:
+        sim_threshold = 0.75
+    if alignment_threshold is None:
+        alignment_threshold = ALIGNMENT_THRESHOLD
+
+    source_sentences, source_ranges = _section_sentences(source_sections, source_language)
+    target_sentences, target_ranges = _section_sentences(target_sections, target_language)
+
+    with timed("encode"):
+        source_embeddings = _encode(model_name, source_sentences)
+        target_embeddings = _encode(model_name, target_sentences)
+        source_titles = _encode(model_name, [
+            section_representation(section.title, source_sentences[start:end])
+            for section, (start, end) in zip(source_sections, source_ranges)
+        ])
+        target_titles = _encode(model_name, [
+            section_representation(section.title, target_sentences[start:end])
+            for section, (start, end) in zip(target_sections, target_ranges)
+        ])
+
+    with timed("similarity"):
+        if len(source_titles) and len(target_titles):
+            pairs = align_sections(source_titles @ target_titles.T, alignment_threshold)
+        else:
+            pairs = []
+
+        # Best similarity of every sentence within its aligned section, -1 when it has none
+        source_best = np.full(len(source_sentences), -1.0, dtype=np.float32)
+        target_best = np.full(len(target_sentences), -1.0, dtype=np.float32)
+        for source, target, _ in pairs:
+            (source_start, source_end), (target_start, target_end) = source_ranges[source], target_ranges[target]
+            if source_start == source_end or target_start == target_end:
+                continue
+            block = source_embeddings[source_start:source_end] @ target_embeddings[target_start:target_end].T
+            source_best[source_start:source_end] = block.max(axis=1)
+            target_best[target_start:target_end] = block.max(axis=0)
+
+        if global_fallback:
+            _fallback(source_best, source_embeddings, target_embeddings, sim_threshold)
+            _fallback(target_best, target_embeddings, source_embeddings, sim_threshold)
+
+    # Fragments too short to be encoded have zero embeddings and are never reported
+    missing = (source_best < sim_threshold) & source_embeddings.any(axis=1)
+    extra = (target_best < sim_threshold) & target_embeddings.any(axis=1)
+    missing_info_index = np.flatnonzero(missing).tolist()
+    extra_info_index = np.flatnonzero(extra).tolist()
+
+    sections = []
+    for source, target, similarity in pairs:
+        sections.append(_section_result(source_sections[source].title, target_sections[target].title, similarity,
+                                        source_ranges[source], target_ranges[target], missing, extra))
+    aligned_source = {source for source, _, _ in pairs}
+    aligned_target = {target for _, target, _ in pairs}
+    for source, section in enumerate(source_sections):
+        if source not in aligned_source:
+            sections.append(_section_result(section.title, None, None, source_ranges[source], None, missing, extra))
+    for target, section in enumerate(target_sections):
+        if target not in aligned_target:
+            sections.append(_section_result(None, section.title, None, None, target_ranges[target], missing, extra))
+
+    return source_sentences, target_sentences, missing_info_index, extra_info_index, sections
+
+
+def _fallback(best: np.ndarray, embeddings: np.ndarray, other_embeddings: np.ndarray, sim_threshold: float) -> None:
+    # Only the sentences still below the threshold are compared with the whole other article
+    unmatched = np.flatnonzero(best < sim_threshold)
+    if len(unmatched) and len(other_embeddings):
+        best[unmatched] = (embeddings[unmatched] @ other_embeddings.T).max(axis=1)
+
+
+def _section_result(source_title, target_title, similarity, source_range, target_range,
+                    missing: np.ndarray, extra: np.ndarray) -> Dict:
+    source_range = source_range or (0, 0)
+    target_range = target_range or (0, 0)
+    return {
+        "source_section": source_title,
+        "target_section": target_title,
+        "alignment_similarity": similarity,
+        "source_range": list(source_range),
+        "target_range": list(target_range),
+        "missing_info_index": (source_range[0] + np.flatnonzero(missing[slice(*source_range)])).tolist(),
+        "extra_info_index": (target_range[0] + np.flatnonzero(extra[slice(*target_range)])).tolist(),
+    }
@@ -1,6 +1,17 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import spacy
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+from app.services import model_cache
+from app.services import shared_cache
+from app.services.metrics import counter, timed
+
+# sentence_transformers (and torch), sklearn and spacy take seconds to import, so they are
+# imported on first use. Workers that never compare articles never import them.
+
 comparison_models = [
     "sentence-transformers/LaBSE",
     "xlm-roberta-base",
@@ -8,6 +19,102 @@ comparison_models = [
     "multi-qa-MiniLM-L6-cos-v1",
     "multi-qa-mpnet-base-cos-v1"
 ]
+DEFAULT_MODEL = "sentence-transformers/LaBSE"
+
+MODEL_LOADS = counter("symmetry_model_loads_total", "Models loaded, by kind and name.", ["kind", "model"])
+ENCODE_SENTENCES = counter("symmetry_encode_sentences_total",
+                           "Sentences given to encode_sentences, by outcome (encoded, duplicate, dropped).",
+                           ["outcome"])
+ENCODE_WINDOWED = counter("symmetry_encode_windowed_sentences_total",
+                          "Sentences longer than the model's max sequence length, encoded in windows.")
+ENCODE_WINDOWS = counter("symmetry_encode_windows_total", "Windows encoded for over-length sentences.")
+
+# Fragments with fewer tokens (words with a letter or digit) are not encoded nor reported as differences
+MIN_SENTENCE_TOKENS = 1
+# Sentences are encoded in batches of similar length, each holding at most ENCODE_BATCH_TOKENS
+# tokens including padding (and ENCODE_BATCH_SIZE sentences), see batched_encode
+ENCODE_BATCH_TOKENS = 1024
+ENCODE_BATCH_SIZE = 64
+ENCODE_THREADS = 0  # torch threads used to encode; 0 leaves torch's default (or the pre-fork launcher's)
+# Sentences longer than the model's max sequence length are encoded as overlapping windows of
+# tokens and their embeddings pooled, instead of being truncated
+WINDOWED_ENCODING = True
+WINDOW_OVERLAP = 32  # Tokens shared by consecutive windows, clamped below half of a window
+
+
+def configure(min_sentence_tokens=MIN_SENTENCE_TOKENS, batch_tokens=ENCODE_BATCH_TOKENS,
+              batch_size=ENCODE_BATCH_SIZE, threads=ENCODE_THREADS, windowed=WINDOWED_ENCODING,
+              window_overlap=WINDOW_OVERLAP):
+    global MIN_SENTENCE_TOKENS, ENCODE_BATCH_TOKENS, ENCODE_BATCH_SIZE, ENCODE_THREADS
+    global WINDOWED_ENCODING, WINDOW_OVERLAP
+    if window_overlap < 0:
+        raise ValueError(f"The window overlap must not be negative, got {window_overlap}")
+    MIN_SENTENCE_TOKENS = min_sentence_tokens
+    ENCODE_BATCH_TOKENS = batch_tokens
+    ENCODE_BATCH_SIZE = batch_size
+    ENCODE_THREADS = threads
+    WINDOWED_ENCODING = windowed
+    WINDOW_OVERLAP = window_overlap
+
+# Define a mapping of languages to spaCy model names
+language_model_map = {
+    "en": "en_core_web_sm",  # English
+    "de": "de_core_news_sm",  # German
+    "fr": "fr_core_news_sm",  # French
+    "es": "es_core_news_sm",  # Spanish
+    "it": "it_core_news_sm",  # Italian
+    "pt": "pt_core_news_sm",  # Portuguese
+    "nl": "nl_core_news_sm",  # Dutch
+}
+
+
+# Loaded sentence transformers by name, and the locks serializing the first load of each
+_models = {}
+_model_locks = {}
+_model_locks_lock = threading.Lock()
+
+
+def load_model(model_name):
+    """
+    Returns the sentence transformer for a model name, loading it on first use.
+    Unknown model names fall back to LaBSE. Models stay loaded for the life of the process.
+    Concurrent first uses of a model wait for one load instead of each loading a copy.
+    """
+    if model_name not in comparison_models:
+        model_name = DEFAULT_MODEL
+    model = _models.get(model_name)
+    if model is None:
+        with _model_locks_lock:
+            lock = _model_locks.setdefault(model_name, threading.Lock())
+        with lock:
+            model = _models.get(model_name)
+            if model is None:
+                model = _models[model_name] = _load_sentence_transformer(model_name)
+    return model
+
+
+def unload_models():
+    """Drops the loaded sentence transformers (they are loaded again on next use)."""
+    _models.clear()
+
+
+def _load_sentence_transformer(model_name):
+    MODEL_LOADS.inc(kind="sentence_transformer", model=model_name)
+    with timed("model_load"):
+        from sentence_transformers import SentenceTransformer
+        if ENCODE_THREADS:
+            import torch
+            torch.set_num_threads(ENCODE_THREADS)
+        return SentenceTransformer(model_name)
+
+
+@lru_cache(maxsize=None)
+def load_spacy(model_name):
+    """Returns the spaCy pipeline for a model name, loading it on first use."""
+    MODEL_LOADS.inc(kind="spacy", model=model_name)
+    with timed("model_load"):
+        import spacy
+        return spacy.load(model_cache.spacy_model(model_name))
 
 def semantic_compare(model_name, og_article, translated_article, source_language, target_language, sim_threshold):  # main function
     """
@@ -32,34 +139,265 @@ def semantic_compare(model_name, og_article, translated_article, source_language
         "extra_info_index": [indices of extra content]
     }
     """
-    # Load a multilingual sentence transformer model (LaBSE or cmlm)
-    match model_name:
-        case "sentence-transformers/LaBSE":
-            model = SentenceTransformer('sentence-transformers/LaBSE')
-        case "xlm-roberta-base":
-            model = SentenceTransformer('xlm-roberta-base')
-        case "multi-qa-distilbert-cos-v1":
-            model = SentenceTransformer('multi-qa-distilbert-cos-v1')
-        case "multi-qa-MiniLM-L6-cos-v1":
-            model = SentenceTransformer('multi-qa-MiniLM-L6-cos-v1')
-        case "multi-qa-mpnet-base-cos-v1":
-            model = SentenceTransformer('multi-qa-mpnet-base-cos-v1')
-        case _:   
-            model = SentenceTransformer('sentence-transformers/LaBSE') 
-
     og_article_sentences = preprocess_input(og_article, source_language)
     translated_article_sentences = preprocess_input(translated_article, target_language)
 
+    missing_info_index, extra_info_index = compare_sentences(
+        model_name, og_article_sentences, translated_article_sentences, sim_threshold
+    )
+    return og_article_sentences, translated_article_sentences, missing_info_index, extra_info_index
+
+def compare_sentences(model_name, og_article_sentences, translated_article_sentences, sim_threshold, deduped=None):
+    """
+    Encodes two lists of sentences and finds the sentences of each without a match in the other.
+    'deduped' optionally holds dedupe_sentences of both lists, when they are compared with several
+    models and only need to be normalized once.
+
+    Returns:
+    {
+        "missing_info_index": [indices of original sentences missing from the translation],
+        "extra_info_index": [indices of translated sentences missing from the original]
+    }
+    """
     # encode the sentences
-    og_embeddings = model.encode(og_article_sentences)
-    translated_embeddings = model.encode(translated_article_sentences)
+    og_deduped, translated_deduped = deduped or (None, None)
+    with timed("encode"):
+        og_embeddings = encode_sentences(model_name, og_article_sentences, og_deduped)
+        translated_embeddings = encode_sentences(model_name, translated_article_sentences, translated_deduped)
 
     if sim_threshold is None:
         sim_threshold = 0.75
 
-    missing_info, missing_info_index = sentences_diff(og_article_sentences, og_embeddings, translated_embeddings, sim_threshold)
-    extra_info, extra_info_index = sentences_diff(translated_article_sentences, translated_embeddings, og_embeddings, sim_threshold)
-    return og_article_sentences, translated_article_sentences, missing_info_index, extra_info_index
+    with timed("similarity"):
+        missing_info, missing_info_index = sentences_diff(og_article_sentences, og_embeddings, translated_embeddings, sim_threshold)
+        extra_info, extra_info_index = sentences_diff(translated_article_sentences, translated_embeddings, og_embeddings, sim_threshold)
+    return missing_info_index, extra_info_index
+
+EMBEDDING_NAMESPACE = "embedding"
+
+
+def normalize_sentence(sentence):
+    """Collapses runs of whitespace (including the newlines left by segmentation) to single spaces."""
+    return " ".join(sentence.split())
+
+
+def dedupe_sentences(sentences):
+    """
+    Normalizes sentences and keeps each distinct one once, dropping fragments shorter than
+    MIN_SENTENCE_TOKENS tokens.
+
+    Returns:
+    {
+        "unique": [distinct normalized sentences, in order of first appearance],
+        "inverse": [for each sentence, its index in unique, or -1 if it was dropped]
+    }
+    """
+    positions = {}
+    unique = []
+    inverse = np.full(len(sentences), -1, dtype=np.int64)
+    for i, sentence in enumerate(sentences):
+        normalized = normalize_sentence(sentence)
+        if sum(1 for token in normalized.split() if any(c.isalnum() for c in token)) < MIN_SENTENCE_TOKENS:
+            continue
+        position = positions.get(normalized)
+        if position is None:
+            position = positions[normalized] = len(unique)
+            unique.append(normalized)
+        inverse[i] = position
+    return unique, inverse
+
+
+def encode_sentences(model_name, sentences, deduped=None):
+    """
+    Encodes sentences with a multilingual sentence transformer (LaBSE or cmlm).
+
+    Each distinct sentence is encoded once (see dedupe_sentences, or 'deduped' when it was
+    already computed) and its embedding scattered back to every position it appears at, so the
+    result still has one row per sentence. Dropped fragments get a row of zeros, which
+    sentences_diff never reports.
+    """
+    unique, inverse = deduped or dedupe_sentences(sentences)
+    dropped = int(np.count_nonzero(inverse < 0))
+    ENCODE_SENTENCES.inc(len(unique), outcome="encoded")
+    ENCODE_SENTENCES.inc(len(sentences) - len(unique) - dropped, outcome="duplicate")
+    ENCODE_SENTENCES.inc(dropped, outcome="dropped")
+
+    if unique:
+        unique_embeddings = np.asarray(_encode_unique(model_name, unique))
+        dimension, dtype = unique_embeddings.shape[1], unique_embeddings.dtype
+    else:
+        unique_embeddings = None
+        dimension, dtype = load_model(model_name).get_sentence_embedding_dimension(), np.float32
+    if unique_embeddings is not None and len(unique) == len(sentences):
+        return unique_embeddings
+
+    embeddings = np.zeros((len(sentences), dimension), dtype=dtype)
+    kept = inverse >= 0
+    if unique_embeddings is not None:
+        embeddings[kept] = unique_embeddings[inverse[kept]]
+    return embeddings
+
+
+def length_batches(lengths, batch_tokens, batch_size):
+    """
+    Groups sentences into batches of similar length: sentences are sorted by token count and a
+    batch is closed when padding all of its sentences to the longest would exceed batch_tokens
+    tokens, or when it holds batch_size sentences. A sentence longer than batch_tokens gets a
+    batch of its own.
+
+    Returns:
+    {
+        "batches": [arrays of sentence indices, longest sentences first]
+    }
+    """
+    order = np.argsort(lengths, kind="stable")[::-1]
+    batches = []
+    start = 0
+    for end in range(1, len(order) + 1):
+        # Sorted longest first, so the first sentence of a batch sets its padded length
+        if end == len(order) or end + 1 - start > batch_size or \
+                (end + 1 - start) * lengths[order[start]] > batch_tokens:
+            batches.append(order[start:end])
+            start = end
+    return batches
+
+
+def token_windows(count, size, overlap):
+    """
+    Splits 'count' tokens into windows of at most 'size' tokens, consecutive windows sharing
+    'overlap' tokens.
+
+    Returns:
+    {
+        "windows": [slices of the tokens]
+    }
+    """
+    if not 0 <= overlap < size:
+        raise ValueError(f"The overlap of windows of {size} tokens must be in [0, {size}), got {overlap}")
+    step = size - overlap
+    return [slice(start, start + size) for start in range(0, max(count - overlap, 1), step)]
+
+
+@lru_cache(maxsize=None)
+def window_overlap(size, overlap):
+    """
+    The overlap used for windows of 'size' tokens: 'overlap', clamped below half of a window so
+    that every window adds at least as many new tokens as it repeats (the max length of a model
+    is only known once it is loaded, so this cannot be checked by configure).
+    """
+    limit = max((size - 1) // 2, 0)
+    if overlap > limit:
+        logging.warning("ENCODE_WINDOW_OVERLAP=%d is not less than half of the %d-token windows; using %d",
+                        overlap, size, limit)
+        return limit
+    return overlap
+
+
+def _special_tokens(tokenizer):
+    """The token ids the tokenizer puts before and after a single sequence."""
+    with_special = tokenizer(["a"], add_special_tokens=True, verbose=False)["input_ids"][0]
+    without = tokenizer(["a"], add_special_tokens=False, verbose=False)["input_ids"][0]
+    for start in range(len(with_special) - len(without) + 1):
+        if with_special[start:start + len(without)] == without:
+            return with_special[:start], with_special[start + len(without):]
+    raise ValueError("Cannot locate the special tokens of the tokenizer")
+
+
+def encode_token_ids(model, inputs):
+    """
+    Encodes inputs given as token ids (without special tokens) with a sentence transformer, so
+    they are not decoded and tokenized again, which does not always give back the same tokens.
+    """
+    import torch
+
+    prefix, suffix = _special_tokens(model.tokenizer)
+    features = model.tokenizer.pad({"input_ids": [prefix + list(ids) + suffix for ids in inputs]},
+                                   return_tensors="pt")
+    features = {name: tensor.to(model.device) for name, tensor in features.items()}
+    with torch.no_grad():
+        return model(features)["sentence_embedding"].float().cpu().numpy()
+
+
+def batched_encode(model, sentences):
+    """
+    Encodes sentences in length-homogeneous batches under a token budget (see length_batches),
+    which wastes far less compute on padding than fixed-size batches of mixed lengths.
+
+    Sentences longer than the model's max sequence length (tables and lists flattened into one
+    "sentence") would be truncated. With WINDOWED_ENCODING they are split into overlapping
+    windows of tokens (see token_windows), which are batched with the other sentences, and the
+    embeddings of the windows of a sentence are averaged, weighted by their token counts. Each
+    window costs at most one max-length input, so long sentences cost compute proportional to
+    their length and lose no content. Windows are given to the model as token ids (see
+    encode_token_ids): decoded to text, they could tokenize to more tokens and be truncated.
+
+    Embeddings are returned in the order of the sentences.
+    """
+    tokenizer = model.tokenizer
+    max_length = model.get_max_seq_length() or tokenizer.model_max_length
+    special = tokenizer.num_special_tokens_to_add()
+    overlap = window_overlap(max_length - special, WINDOW_OVERLAP)
+    token_ids = tokenizer(sentences, add_special_tokens=False, verbose=False)["input_ids"]
+
+    # The inputs actually encoded: sentences, or the token ids of windows of the over-length ones
+    inputs, lengths, owners = [], [], []
+    windowed = 0
+    for index, (sentence, ids) in enumerate(zip(sentences, token_ids)):
+        if len(ids) + special <= max_length or not WINDOWED_ENCODING:
+            inputs.append(sentence)
+            lengths.append(min(len(ids) + special, max_length))
+            owners.append(index)
+            continue
+        windowed += 1
+        for window in token_windows(len(ids), max_length - special, overlap):
+            inputs.append(ids[window])
+            lengths.append(len(ids[window]) + special)
+            owners.append(index)
+    if windowed:
+        ENCODE_WINDOWED.inc(windowed)
+        ENCODE_WINDOWS.inc(len(inputs) - len(sentences) + windowed)
+        logging.debug("Encoding %d over-length sentences of %d in %d windows",
+                      windowed, len(sentences), len(inputs) - len(sentences) + windowed)
+
+    lengths = np.array(lengths)
+    encoded = None
+    for batch in length_batches(lengths, ENCODE_BATCH_TOKENS, ENCODE_BATCH_SIZE):
+        sentence_batch = [i for i in batch if isinstance(inputs[i], str)]
+        window_batch = [i for i in batch if not isinstance(inputs[i], str)]
+        parts = []
+        if sentence_batch:
+            parts.append((sentence_batch, model.encode([inputs[i] for i in sentence_batch],
+                                                       batch_size=len(sentence_batch), convert_to_numpy=True)))
+        if window_batch:
+            parts.append((window_batch, encode_token_ids(model, [inputs[i] for i in window_batch])))
+        for indices, batch_embeddings in parts:
+            if encoded is None:
+                encoded = np.empty((len(inputs), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype)
+            encoded[indices] = batch_embeddings
+    if not windowed:
+        return encoded
+
+    # Pool the windows of each sentence: mean weighted by their token counts
+    owners = np.array(owners)
+    weights = lengths.astype(encoded.dtype)
+    embeddings = np.zeros((len(sentences), encoded.shape[1]), dtype=encoded.dtype)
+    np.add.at(embeddings, owners, encoded * weights[:, None])
+    return embeddings / np.bincount(owners, weights=weights).astype(encoded.dtype)[:, None]
+
+
+def _encode_unique(model_name, sentences):
+    # When the shared cache is enabled, embeddings are looked up in and stored to it, so an
+    # article encoded by one worker process is not encoded again by the others
+    if not shared_cache.enabled():
+        return batched_encode(load_model(model_name), sentences)
+    if model_name not in comparison_models:
+        model_name = DEFAULT_MODEL
+    key = model_name + ":" + hashlib.blake2b("\x1f".join(sentences).encode("utf-8"), digest_size=16).hexdigest()
+    embeddings = shared_cache.get_array(EMBEDDING_NAMESPACE, key)
+    if embeddings is None:
+        embeddings = batched_encode(load_model(model_name), sentences)
+        shared_cache.put_array(EMBEDDING_NAMESPACE, key, embeddings)
+    return embeddings
 
 def universal_sentences_split(text):
     """
@@ -81,6 +419,7 @@ def universal_sentences_split(text):
             sentences.append(sentence.strip())
     return sentences
 
+@timed("sentence_split")
 def preprocess_input(article, language):
     """
     Preprocesses input text based on language using appropriate spaCy model.
@@ -96,17 +435,6 @@ def preprocess_input(article, language):
         "sentences": [array of preprocessed sentences]
     }
     """
-    # Define a mapping of languages to spaCy model names
-    language_model_map = {
-        "en": "en_core_web_sm",  # English
-        "de": "de_core_news_sm",  # German
-        "fr": "fr_core_news_sm",  # French
-        "es": "es_core_news_sm",  # Spanish
-        "it": "it_core_news_sm",  # Italian
-        "pt": "pt_core_news_sm",  # Portuguese
-        "nl": "nl_core_news_sm",  # Dutch
-    }
-    
     # Acommodate for TITLES
     cleaned_article = article.replace('\n\n', '<DOUBLE_NEWLINE>') # temporarily replace double newlines
     cleaned_article = cleaned_article.replace('\n', '.') # replace single newlines with periods
@@ -119,7 +447,7 @@ def preprocess_input(article, language):
     else:
     # Load the appropriate spaCy model
         model_name = language_model_map[language]
-        nlp = spacy.load(model_name)
+        nlp = load_spacy(model_name)
 
         # Process the article and extract sentences
         doc = nlp(cleaned_article)
@@ -144,9 +472,14 @@ def sentences_diff(article_sentences, first_embeddings, second_embeddings, sim_t
         "indices": [array of indices where differences occur]
     }
     """
+    from sklearn.metrics.pairwise import cosine_similarity
+
     diff_info = []
     indices = []  # Track the indices of differing sentences
     for i, eng_embedding in enumerate(first_embeddings):
+        if not np.any(eng_embedding):
+            continue  # A fragment too short to be encoded (see dedupe_sentences)
+
         # Calculate similarity between the current English sentence and all French sentences
         similarities = cosine_similarity([eng_embedding], second_embeddings)[0]
 
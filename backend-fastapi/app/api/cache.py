@@ -1,11 +1,21 @@
 import hashlib
+import json
 import logging
+import struct
 from time import time
 from typing import Dict, List, Optional, Tuple
 from collections import OrderedDict
 from sys import getsizeof
 
-CACHE_LIMIT = 10  # Max number of cached articles
+from app.services import shared_cache
+from app.services.metrics import counter, gauge
+
+logger = logging.getLogger(__name__)
+
+CACHE_LIMIT = 1000  # Max number of cached articles, enough for a full batch request and its prefetches
+# Max approximate size of the cached articles with their serialized and compressed response bodies.
+# Each worker process has its own cache, so the memory it may take is this times the workers
+CACHE_MAX_BYTES = 64 * 1024 * 1024
 TTL_SECONDS = 4000  # Time to live for cached items in seconds
 
 """
@@ -17,73 +27,174 @@ extraported and used in other files in future implemenetations.
 """
 
 
+# Cache metrics, shared with the structured article cache (app/api/structured_wiki.py)
+CACHE_REQUESTS = counter("symmetry_cache_requests_total", "Cache lookups, by cache and result (hit or miss).",
+                         ["cache", "result"])
+CACHE_EVICTIONS = counter("symmetry_cache_evictions_total", "Cache entries evicted, by cache and reason.",
+                          ["cache", "reason"])
+CACHE_ENTRIES = gauge("symmetry_cache_entries", "Entries in the cache.", ["cache"])
+CACHE_BYTES = gauge("symmetry_cache_bytes", "Approximate size of the cached content and response bodies.", ["cache"])
+
+
+# Returns the approximate size of a cache entry: its content plus the serialized and compressed bodies
+def item_bytes(item: Dict) -> int:
+    size = getsizeof(item["content"])
+    if item["body"] is not None:
+        size += len(item["body"])
+    return size + sum(len(encoded) for encoded in list(item["encoded"].values()))
+
+
 # Internal LRU cache manager
 class ArticleCache:
     # Initializes the cache
-    def __init__(self, max_size: int = CACHE_LIMIT, ttl: int = TTL_SECONDS):
+    def __init__(self, max_size: int = CACHE_LIMIT, ttl: int = TTL_SECONDS, name: str = "article",
+                 max_bytes: int = CACHE_MAX_BYTES):
         self.cache: "OrderedDict[str, Dict]" = OrderedDict()
         self.max_size = max_size
+        self.max_bytes = max_bytes
         self.ttl = ttl
+        self.name = name  # Label of the cache in the metrics
         self.current_size = 0  # Approximate memory usage in bytes
     # Creates cache key
     def _get_cache_key(self, key: str) -> str:
         return hashlib.md5(key.encode()).hexdigest()
 
-    def get(self, key: str) -> Tuple[Optional[str], Optional[List[str]]]:
+    # Returns the live cache entry, or None on a miss
+    def _get_item(self, key: str) -> Optional[Dict]:
         cache_key = self._get_cache_key(key)
         cached_data = self.cache.get(cache_key)
         # Checks cache for articles, misses if none are found
         if not cached_data:
-            logging.info(f"[CACHE MISS] No cache entry for key: {cache_key}")
-            return None, None
+            logger.debug("[CACHE MISS] No cache entry for key: %s", cache_key)
+            CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            return None
         # Cached article expires and is evicted if it exists longer than 4000 seconds (approx. 1.1 hours)
         if time() - cached_data["timestamp"] > self.ttl:
             self._evict(cache_key, reason="expired")
-            return None, None
+            CACHE_REQUESTS.inc(cache=self.name, result="miss")
+            return None
 
         self.cache.move_to_end(cache_key)
-        logging.info(f"[CACHE HIT] Returning cached data for key: {cache_key}")
+        CACHE_REQUESTS.inc(cache=self.name, result="hit")
+        logger.debug("[CACHE HIT] Returning cached data for key: %s", cache_key)
+        return cached_data
+
+    def get(self, key: str) -> Tuple[Optional[str], Optional[Dict[str, str]]]:
+        cached_data = self._get_item(key)
+        if not cached_data:
+            return None, None
         return cached_data["content"], cached_data["languages"]
+
+    # Returns the whole cache entry, including the pre-serialized JSON "body" and its "etag"
+    def get_entry(self, key: str) -> Optional[Dict]:
+        return self._get_item(key)
+
+    # Approximate size of all entries in bytes
+    def nbytes(self) -> int:
+        return sum(item_bytes(item) for item in list(self.cache.values()))
+
+    # Seconds until a cache entry expires
+    def remaining_ttl(self, item: Dict) -> float:
+        return max(self.ttl - (time() - item["timestamp"]), 0)
+
     # Sets cached article if it has not been cached yet
-    def set(self, key: str, content: str, languages: List[str]) -> None:
+    def set(self, key: str, content: str, languages: Dict[str, str], body: Optional[bytes] = None,
+            etag: Optional[str] = None) -> Dict:
         cache_key = self._get_cache_key(key)
         item = {
             "content": content,
-            "languages": languages,
+            "languages": languages,  # Language code -> article title in that language
+            "body": body,  # Serialized JSON response, served as-is on cache hits
+            "etag": etag,  # Validator for conditional requests on the body
+            "encoded": {},  # Compressed variants of the body, by content encoding
             "timestamp": time(),
         }
-        # Determines size of article
-        item_size = getsizeof(item)
-
-        # Checks cache key and moves it accordingly based on LRU to enable effective eviction if needed
+        # Compressed variants are added to the entries as they are served, so sizes are summed
+        # again here rather than kept up to date
         if cache_key in self.cache:
-            self.current_size -= getsizeof(self.cache[cache_key])
-            self.cache.move_to_end(cache_key)
-        elif len(self.cache) >= self.max_size:
-            evicted_key, evicted_val = self.cache.popitem(last=False)
-            self.current_size -= getsizeof(evicted_val)
-            logging.info(f"[CACHE EVICTED] LRU item: {evicted_key}")
-
+            del self.cache[cache_key]
         self.cache[cache_key] = item
-        self.current_size += item_size
+        self.current_size = self.nbytes()
 
-        logging.info(f"[CACHE SET] Key: {cache_key} | Size: {len(self.cache)}/{self.max_size} | Approx. Memory: {self.current_size} bytes")
+        # Evicts least recently used articles, beyond the number of entries or the size limit
+        while len(self.cache) > 1 and (len(self.cache) > self.max_size or self.current_size > self.max_bytes):
+            evicted_key, evicted_val = self.cache.popitem(last=False)
+            self.current_size -= item_bytes(evicted_val)
+            logger.debug("[CACHE EVICTED] LRU item: %s", evicted_key)
+            CACHE_EVICTIONS.inc(cache=self.name, reason="lru")
+
+        logger.debug("[CACHE SET] Key: %s | Size: %d/%d | Approx. Memory: %d bytes",
+                     cache_key, len(self.cache), self.max_size, self.current_size)
+        return item
     # Nukes LRU article in the cache
     def _evict(self, key: str, reason: str = "manual") -> None:
         if key in self.cache:
-            self.current_size -= getsizeof(self.cache[key])
+            self.current_size -= item_bytes(self.cache[key])
             del self.cache[key]
-            logging.info(f"[CACHE {reason.upper()}] Evicted key: {key}")
+            CACHE_EVICTIONS.inc(cache=self.name, reason=reason)
+            logger.debug("[CACHE %s] Evicted key: %s", reason.upper(), key)
 
 # Instantiate global cache object
 _article_cache = ArticleCache()
+CACHE_ENTRIES.set_function(lambda: len(_article_cache.cache), cache=_article_cache.name)
+CACHE_BYTES.set_function(_article_cache.nbytes, cache=_article_cache.name)
+
+# Articles are also stored in the node-wide shared cache (app/services/shared_cache.py), when
+# enabled, so an article fetched by one worker process is a hit in the others
+SHARED_NAMESPACE = "article"
+_SHARED_LENGTHS = struct.Struct("<II")
+
+
+def _pack_shared(content: str, languages: Dict[str, str], body: Optional[bytes], etag: Optional[str]) -> bytes:
+    meta = json.dumps({"languages": languages, "etag": etag, "body": body is not None}).encode("utf-8")
+    content_bytes = content.encode("utf-8")
+    return _SHARED_LENGTHS.pack(len(meta), len(content_bytes)) + meta + content_bytes + (body or b"")
+
+
+# Copies an article from the shared cache into this process's cache; None if it is not there
+def _get_shared(key: str) -> Optional[Dict]:
+    found = shared_cache.get(SHARED_NAMESPACE, key)
+    if found is None:
+        return None
+    value, timestamp = found
+    meta_length, content_length = _SHARED_LENGTHS.unpack_from(value)
+    start = _SHARED_LENGTHS.size
+    meta = json.loads(value[start:start + meta_length])
+    content = value[start + meta_length:start + meta_length + content_length].decode("utf-8")
+    body = value[start + meta_length + content_length:] if meta["body"] else None
+    item = _article_cache.set(key, content, meta["languages"], body, meta["etag"])
+    item["timestamp"] = timestamp  # Expires when the shared entry does
+    return item
+
 
 # For external use
+def configure(max_size: int = CACHE_LIMIT, max_bytes: int = CACHE_MAX_BYTES) -> None:
+    _article_cache.max_size = max_size
+    _article_cache.max_bytes = max_bytes
+
 def get_article_cache_key(key: str) -> str:
     return _article_cache._get_cache_key(key)
 
-def get_cached_article(title: str) -> Tuple[Optional[str], Optional[List[str]]]:
-    return _article_cache.get(title)
+def get_cached_article(title: str) -> Tuple[Optional[str], Optional[Dict[str, str]]]:
+    content, languages = _article_cache.get(title)
+    if content is None and shared_cache.enabled():
+        item = _get_shared(title)
+        if item is not None:
+            return item["content"], item["languages"]
+    return content, languages
+
+def get_cached_article_entry(key: str) -> Optional[Dict]:
+    item = _article_cache.get_entry(key)
+    if item is None and shared_cache.enabled():
+        item = _get_shared(key)
+    return item
+
+def get_cached_article_max_age(item: Dict) -> float:
+    return _article_cache.remaining_ttl(item)
 
-def set_cached_article(key: str, content: str, languages: List[str]) -> None:
-    _article_cache.set(key, content, languages)
+def set_cached_article(key: str, content: str, languages: Dict[str, str], body: Optional[bytes] = None,
+                       etag: Optional[str] = None) -> Dict:
+    item = _article_cache.set(key, content, languages, body, etag)
+    if shared_cache.enabled():
+        shared_cache.put(SHARED_NAMESPACE, key, _pack_shared(content, languages, body, etag))
+    return item
@@ -1,58 +1,117 @@
-from app.model.response import CompareResponse, ComparisonResult
-from fastapi import APIRouter
-from app.model.request import CompareRequest
+import asyncio
+import logging
+from typing import List, Tuple
+
+from app.model.response import CompareResponse, ComparisonResult, SectionCompareResponse, SectionComparisonResult
+from fastapi import APIRouter, HTTPException
+from app.model.request import CompareRequest, SectionCompareRequest
+from app.ai.section_comparison import section_compare
+from app.ai.semantic_comparison import (
+    comparison_models, compare_sentences, dedupe_sentences, preprocess_input
+)
+from app.api.structured_wiki import get_structured_article_data
 
 router = APIRouter(prefix="/symmetry/v1", tags=["comparison"])
 
 
 @router.post("/articles/compare", response_model=CompareResponse)
-def compare_articles(payload: CompareRequest):
+async def compare_articles(payload: CompareRequest):
     """
     This endpoint requests a comparison of two blobs of text.
     The request includes the articles, the languages of the articles, the comparison threshold, and model name.
 
-    The response is an array of comparison results, allowing support for a future state where
-    output may be requested from multiple ML models in a single request.
+    'model_name' may be one model name or a list of them, all from comparison_models. The articles are segmented and normalized
+    once, then compared with every model concurrently on the thread pool, so a request for
+    several models takes about as long as the slowest of them.
+
+    The response is an array of comparison results, one per model, in the order requested.
 
     The schema for this response is defined in the model/response.py file.
+    """
+    models = _requested_models(payload.model_name)
+    _check_threshold(payload.comparison_threshold)
+    if not payload.article_text_blob_1.strip() or not payload.article_text_blob_2.strip():
+        raise HTTPException(status_code=400, detail="Both articles must have some text.")
+    sim_threshold = payload.comparison_threshold or 0.65  # Default to 0.65 if 0
+
+    (source_sentences, source_deduped), (target_sentences, target_deduped) = await asyncio.gather(
+        asyncio.to_thread(_segment, payload.article_text_blob_1, payload.article_text_blob_1_language),
+        asyncio.to_thread(_segment, payload.article_text_blob_2, payload.article_text_blob_2_language),
+    )
+    deduped = (source_deduped, target_deduped)
+    if not deduped[0][0] or not deduped[1][0]:
+        raise HTTPException(status_code=400, detail="Both articles must have at least one sentence.")
 
-    ------------------------------------------------------------------------------------------------
-    THIS ENDPOINT IS NOT FINALIZED!!!
+    results = await asyncio.gather(*(
+        asyncio.to_thread(compare_sentences, model_name, source_sentences, target_sentences, sim_threshold, deduped)
+        for model_name in models
+    ))
+    return CompareResponse(comparisons=[
+        ComparisonResult(
+            left_article_array=source_sentences,
+            right_article_array=target_sentences,
+            left_article_missing_info_index=missing_info_index,
+            right_article_extra_info_index=extra_info_index,
+            model_name=model_name,
+        )
+        for model_name, (missing_info_index, extra_info_index) in zip(models, results)
+    ])
 
-    This is currently returning dummy data, and still needs to be integrated with the ML model
-    in order to return the actual comparison results from the backend.
-    ------------------------------------------------------------------------------------------------
-    """
 
-    """
+def _segment(text: str, language: str) -> Tuple[List[str], tuple]:
+    # Both CPU-bound, so run together on the thread pool rather than on the event loop
+    sentences = preprocess_input(text, language)
+    return sentences, dedupe_sentences(sentences)
+
 
+def _requested_models(model_name) -> List[str]:
+    """The distinct models of a request, in order."""
+    names = [model_name] if isinstance(model_name, str) else model_name
+    if not names:
+        raise HTTPException(status_code=400, detail="At least one model name is required.")
+    models = []
+    for name in names:
+        if name not in comparison_models:
+            raise HTTPException(status_code=404, detail=f"Invalid model selected. {name} does not exist.")
+        if name not in models:
+            models.append(name)
+    return models
+
+
+def _check_threshold(threshold) -> None:
+    if threshold is not None and not 0 <= threshold <= 1:
+        raise HTTPException(status_code=400, detail="Provided similarity threshold is out of the defined valid range [0,1]")
+
+
+@router.post("/articles/compare-sections", response_model=SectionCompareResponse)
+def compare_article_sections(payload: SectionCompareRequest):
     """
+    Section-aligned comparison of a Wikipedia article with its version in another language.
 
-    left_article_array = [
-        "Barack Hussein Obama II is an American politician who served as the 44th president of the United States from 2009 to 2017.",
-        "Obama previously served as a U.S. senator representing Illinois from 2005 to 2008 and as an Illinois state senator from 1997 to 2004.",
-        "Obama was born in Honolulu, Hawaii.",
-        "He graduated from Columbia University in 1983 with a Bachelor of Arts degree in political science and later worked as a community organizer in Chicago.",
-        "In 1988, Obama enrolled in Harvard Law School, where he was the first black president of the Harvard Law Review.",
-        "In the 2008 presidential election, after a close primary campaign against Hillary Clinton, he was nominated by the Democratic Party for president.",
-        "Obama selected Joe Biden as his running mate and defeated Republican nominee John McCain and his running mate Sarah Palin.",
-    ]
-
-    right_article_array = [
-        "Barack Hussein Obama II is an American politician who served as the 44th president of the United States from 2009 to 2017.",
-        "A member of the Democratic Party, he was the first African-American president in American history.",
-        "He graduated from Columbia University in 1983 with a Bachelor of Arts degree in political science and later worked as a community organizer in Chicago.",
-        "In 1988, Obama enrolled in Harvard Law School, where he was the first black president of the Harvard Law Review.",
-        "He became a civil rights attorney and an academic, teaching constitutional law at the University of Chicago Law School from 1992 to 2004.",
-        "In 1996, Obama was elected to represent the 13th district in the Illinois Senate, a position he held until 2004, when he successfully ran for the U.S. Senate.",
-        "In the 2008 presidential election, after a close primary campaign against Hillary Clinton, he was nominated by the Democratic Party for president.",
-    ]
+    The sections of both articles are aligned first (by their titles and lead sentences), then
+    sentences are only compared within aligned sections, see app/ai/section_comparison.py.
+    The response holds the comparison of the whole articles, as /articles/compare, and the
+    result of every pair of aligned sections.
+    """
+    model_name = _requested_models(payload.model_name)[0]
+    _check_threshold(payload.comparison_threshold)
+    try:
+        source = get_structured_article_data(payload.source_title, payload.source_lang)
+        target = get_structured_article_data(payload.target_title, payload.target_lang)
+    except Exception as e:
+        logging.error("Error fetching the sections of '%s' and '%s': %s", payload.source_title, payload.target_title, e)
+        raise HTTPException(status_code=502, detail=f"Failed to fetch the articles: {e}")
 
+    source_sentences, target_sentences, missing_info_index, extra_info_index, sections = section_compare(
+        model_name, source.sections(), target.sections(), payload.source_lang, payload.target_lang,
+        payload.comparison_threshold, payload.global_fallback,
+    )
     comparison = ComparisonResult(
-        left_article_array=left_article_array,
-        right_article_array=right_article_array,
-        left_article_missing_info_index=[1, 2, 6],  # Dummy indices
-        right_article_extra_info_index=[1, 4, 5],  # Dummy indices
+        left_article_array=source_sentences,
+        right_article_array=target_sentences,
+        left_article_missing_info_index=missing_info_index,
+        right_article_extra_info_index=extra_info_index,
+        model_name=model_name,
     )
-
-    return CompareResponse(comparisons=[comparison])
+    return SectionCompareResponse(comparisons=[comparison],
+                                  sections=[SectionComparisonResult(**section) for section in sections])
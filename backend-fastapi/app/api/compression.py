@@ -0,0 +1,202 @@
+import gzip
+import time
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.metrics import counter
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses fall back to gzip without it
+    brotli = None
+
+"""
+Response compression (brotli and gzip, negotiated on Accept-Encoding).
+
+There are two ways a response gets compressed:
+
+1. Endpoints serving cached bytes call encode_cached_body(), which compresses a body once per
+   encoding and keeps the result in the cache entry, so popular articles are not recompressed
+   on every response.
+2. CompressionMiddleware compresses every other response above the minimum size. Responses that
+   already carry a Content-Encoding (i.e. the precompressed ones) are passed through untouched.
+
+Strong ETags are suffixed with the encoding (e.g. "...-gzip"), since each encoding is a
+different representation of the resource.
+"""
+
+MINIMUM_SIZE = 1024  # Bytes; smaller bodies are sent uncompressed
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 0-11; higher qualities cost far more CPU for a few percent of size
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/x-ndjson")
+
+COMPRESSION_RESPONSES = counter(
+    "symmetry_compression_responses_total",
+    "Responses sent compressed, by encoding and whether the bytes came from the cache.",
+    ["encoding", "source"],
+)
+COMPRESSION_INPUT_BYTES = counter(
+    "symmetry_compression_input_bytes_total", "Uncompressed bytes of compressed responses.", ["encoding"]
+)
+COMPRESSION_OUTPUT_BYTES = counter(
+    "symmetry_compression_output_bytes_total", "Bytes sent for compressed responses.", ["encoding"]
+)
+COMPRESSION_SAVED_BYTES = counter(
+    "symmetry_compression_saved_bytes_total", "Bytes saved by compressing responses.", ["encoding"]
+)
+COMPRESSION_CPU_SECONDS = counter(
+    "symmetry_compression_cpu_seconds_total", "CPU time spent compressing responses.", ["encoding"]
+)
+
+
+def configure(minimum_size: int) -> None:
+    """Set the minimum body size for compression, for both the middleware and cached bodies."""
+    global MINIMUM_SIZE
+    MINIMUM_SIZE = minimum_size
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick the encoding for a response from the Accept-Encoding header, or None for identity.
+    Brotli is preferred over gzip when the client accepts both with the same weight.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best, best_weight = None, 0.0
+    for coding in supported_encodings():
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body, recording the CPU cost and the bytes saved."""
+    start = time.thread_time()
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    COMPRESSION_CPU_SECONDS.inc(time.thread_time() - start, encoding=encoding)
+    return compressed
+
+
+def _record_response(encoding: str, source: str, original_size: int, compressed_size: int) -> None:
+    COMPRESSION_RESPONSES.inc(encoding=encoding, source=source)
+    COMPRESSION_INPUT_BYTES.inc(original_size, encoding=encoding)
+    COMPRESSION_OUTPUT_BYTES.inc(compressed_size, encoding=encoding)
+    COMPRESSION_SAVED_BYTES.inc(original_size - compressed_size, encoding=encoding)
+
+
+def encoded_etag(etag: Optional[str], encoding: Optional[str]) -> Optional[str]:
+    """Derive the strong ETag of an encoded representation."""
+    if not etag or not encoding or etag.startswith("W/"):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def encode_cached_body(body: bytes, encoded: Dict[str, bytes], encoding: Optional[str]) -> bytes:
+    """
+    Return the body in the given encoding, compressing it at most once per encoding.
+    'encoded' is the dict of compressed variants stored next to the cache entry.
+    """
+    if encoding is None:
+        return body
+    compressed = encoded.get(encoding)
+    source = "precompressed"
+    if compressed is None:
+        compressed = encoded[encoding] = compress(body, encoding)
+        source = "compressed"
+    _record_response(encoding, source, len(body), len(compressed))
+    return compressed
+
+
+def response_encoding(accept_encoding: Optional[str], body_size: int) -> Optional[str]:
+    """The encoding to use for a body of the given size, honouring the minimum size."""
+    if body_size < MINIMUM_SIZE:
+        return None
+    return negotiate_encoding(accept_encoding)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with brotli or gzip.
+
+    Only single-message bodies of compressible content types are compressed; streamed
+    responses and responses that already have a Content-Encoding are passed through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message  # Held back until the body is known
+                return
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if message.get("more_body", False) or len(body) < MINIMUM_SIZE:
+                # Streamed or small: send as-is
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            _record_response(encoding, "compressed", len(body), len(compressed))
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            if "etag" in headers:
+                headers["ETag"] = encoded_etag(headers["etag"], encoding)
+            passthrough = True
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed, "more_body": False})
+
+        await self.app(scope, receive, send_compressed)
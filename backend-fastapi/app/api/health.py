@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from starlette.responses import JSONResponse
+
+from app.services import warmup
+
+# Health checks are served at the root, where orchestrators probe by default
+router = APIRouter(tags=["health"])
+
+
+@router.get("/healthz/live", include_in_schema=False)
+def live():
+    """
+    Liveness probe: the process is up and serving requests. Does not wait for the models.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/healthz/ready", include_in_schema=False)
+def ready():
+    """
+    Readiness probe: 200 once every configured model is loaded, 503 with the warmup
+    progress of each model until then (or when a model failed to load).
+    """
+    state = warmup.status()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
@@ -0,0 +1,78 @@
+import hashlib
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.api.compression import response_encoding, encoded_etag, encode_cached_body
+from app.api.json_response import PreSerializedJSONResponse
+
+"""
+HTTP caching helpers (ETag / If-None-Match / Cache-Control) for the article endpoints.
+
+ETags are strong validators derived from the Wikipedia revision id of the article plus the
+schema version of the response, so they change whenever either the article or our response
+format changes. They are stored with the cache entry, which lets a revalidation request be
+answered with 304 Not Modified from the cache metadata alone.
+"""
+
+# Bump when the JSON shape of a cached response changes, so clients drop stale copies.
+RESPONSE_SCHEMA_VERSION = 1
+
+
+def make_etag(kind: str, lang: str, revision_id: Optional[int], body: Optional[bytes] = None) -> str:
+    """
+    Build a strong ETag for a response of the given kind (e.g. "article", "structured-article").
+    Revision ids are unique per language edition. When no revision id is known, the
+    body's hash is used instead.
+    """
+    if revision_id is not None:
+        tag = f"{lang}-{revision_id}"
+    else:
+        tag = hashlib.blake2b(body or b"", digest_size=12).hexdigest()
+    return f'"{kind}-v{RESPONSE_SCHEMA_VERSION}-{tag}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Whether an If-None-Match header matches the ETag (weak comparison, as RFC 9110 requires)."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(etag: Optional[str], max_age: float) -> dict:
+    """ETag and Cache-Control headers for a cached response that stays fresh for max_age seconds."""
+    headers = {"Cache-Control": f"public, max-age={max(int(max_age), 0)}"}
+    if etag:
+        headers["ETag"] = etag
+    return headers
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+def conditional_response(request: Request, body: bytes, etag: Optional[str], max_age: float,
+                         encoded: Dict[str, bytes]) -> Response:
+    """
+    Serve a cached JSON body: 304 Not Modified when the client's If-None-Match matches,
+    otherwise the body in the negotiated encoding. Compressed variants are kept in 'encoded',
+    the dict stored next to the cache entry, so each one is only compressed once.
+    """
+    encoding = response_encoding(request.headers.get("accept-encoding"), len(body))
+    etag = encoded_etag(etag, encoding)
+    headers = cache_headers(etag, max_age)
+    headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return PreSerializedJSONResponse(encode_cached_body(body, encoded, encoding), headers=headers)
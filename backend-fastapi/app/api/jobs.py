@@ -0,0 +1,63 @@
+import asyncio
+import json
+import logging
+
+from fastapi import APIRouter, HTTPException
+from starlette.responses import StreamingResponse
+
+from app.ai.semantic_comparison import comparison_models
+from app.model.request import ComparisonJobRequest
+from app.model.response import ComparisonJobResponse
+from app.services import jobs
+
+router = APIRouter(prefix="/symmetry/v1", tags=["jobs"])
+
+# Maximum number of comparisons accepted in one job
+MAX_JOB_SPECS = 10000
+
+
+@router.post("/jobs", response_model=ComparisonJobResponse, status_code=202)
+async def create_job(payload: ComparisonJobRequest):
+    """
+    This endpoint submits a bulk comparison job: each spec compares an article with its version
+    in another language. The job is processed in the background (see app/services/jobs.py);
+    poll /jobs/{job_id} for progress and download the results from /jobs/{job_id}/results.
+    """
+    if not payload.specs:
+        raise HTTPException(status_code=400, detail="At least one comparison must be provided.")
+    if len(payload.specs) > MAX_JOB_SPECS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_JOB_SPECS} comparisons can be submitted at once.")
+    for spec in payload.specs:
+        if spec.model_name not in comparison_models:
+            raise HTTPException(status_code=404, detail=f"Invalid model selected. {spec.model_name} does not exist.")
+        if spec.comparison_threshold is not None and not 0 <= spec.comparison_threshold <= 1:
+            raise HTTPException(status_code=400, detail="Provided similarity threshold is out of the defined valid range [0,1]")
+
+    runner = jobs.get_runner()
+    job_id = await asyncio.to_thread(runner.submit, [spec.model_dump() for spec in payload.specs])
+    logging.info("Submitted comparison job %s with %d comparisons", job_id, len(payload.specs))
+    return runner.store.get_job(job_id)
+
+
+@router.get("/jobs/{job_id}", response_model=ComparisonJobResponse)
+def get_job(job_id: str):
+    """This endpoint returns the progress of a bulk comparison job."""
+    job = jobs.get_runner().store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
+@router.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str):
+    """
+    This endpoint streams the finished comparisons of a job as NDJSON, one JSON object per line
+    in submission order. Each line holds the spec, its 'status' ("done" or "failed") and either
+    the 'comparison' (the same fields as a ComparisonResult) or the 'error'.
+    Results can be downloaded while the job is still running; unfinished specs are left out.
+    """
+    store = jobs.get_runner().store
+    if store.get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    lines = (json.dumps(item) + "\n" for item in store.iter_results(job_id))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
@@ -0,0 +1,40 @@
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard library encoder
+    orjson = None
+    import json
+
+"""
+Fast JSON helpers for endpoints that serve cached content.
+
+Cached responses are serialized to bytes once, when the cache entry is created, and
+served as-is on every cache hit through PreSerializedJSONResponse. This skips FastAPI's
+response_model validation and JSON encoding, which is the main cost of returning a large
+article from the cache.
+"""
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize plain Python content (dicts, lists, strings, numbers) to JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dump_model(model: BaseModel) -> bytes:
+    """Serialize a pydantic response model to JSON bytes."""
+    return dumps(model.model_dump(mode="json"))
+
+
+class PreSerializedJSONResponse(Response):
+    """A JSON response whose body has already been serialized to bytes."""
+
+    media_type = "application/json"
+
+    def __init__(self, body: bytes, **kwargs: Any):
+        super().__init__(content=body, **kwargs)
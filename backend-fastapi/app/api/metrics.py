@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+
+from app.services.metrics import REGISTRY
+
+# Metrics are served at the root, where Prometheus scrapes by default
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """
+    Exposes the service metrics (see app/services/metrics.py) in the Prometheus text format.
+    """
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,173 @@
+import asyncio
+import ipaddress
+import logging
+import re
+import uuid
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, HTTPException, Request
+from starlette.responses import FileResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.services.profiler import DEFAULT_FORMAT, FORMATS, INTERVAL, ProfileStore, SamplingProfiler
+
+"""
+On-demand request profiling.
+
+When enabled (PROFILING_ENABLED), a request from a trusted client that carries the profiling
+header (X-Symmetry-Profile: speedscope|collapsed) or query flag (?_profile=speedscope|collapsed)
+runs under the sampling profiler of app/services/profiler.py. The response carries the id of
+the stored profile in X-Symmetry-Profile-Id, and the profile is downloaded from
+/symmetry/v1/profiles/{id}. Requests from other clients are served normally, without profiling.
+
+The middleware is only installed when profiling is enabled, and requests that do not ask for
+a profile only pay for a header lookup.
+
+Trust is decided on the address of the peer, and on every address of the forwarding headers
+(X-Forwarded-For, X-Real-IP, Forwarded) when a proxy sent them: behind a reverse proxy on the
+same host, every request comes from 127.0.0.1, so the peer alone would trust every client.
+"""
+
+HEADER = "x-symmetry-profile"
+QUERY_FLAG = "_profile"
+ID_HEADER = "X-Symmetry-Profile-Id"
+DIRECTORY = "profiles"
+MAX_BYTES = 100 * 1024 * 1024  # Retention cap of the profile directory
+
+router = APIRouter(prefix="/symmetry/v1", tags=["profiling"])
+
+_trusted_networks: List = []
+_trusted_hosts: List[str] = []
+_store = ProfileStore(DIRECTORY, MAX_BYTES)
+_interval = INTERVAL
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+_HEADER = HEADER.encode()
+_FORWARDING_HEADERS = {b"x-forwarded-for", b"x-real-ip", b"forwarded"}
+_FORWARDED_FOR = re.compile(r'for="?\[?([^\]";,]+)', re.IGNORECASE)
+
+
+def configure(trusted_clients: str, directory: str = DIRECTORY, max_bytes: int = MAX_BYTES,
+              interval: float = INTERVAL) -> None:
+    """
+    'trusted_clients' is a comma-separated list of IP addresses, networks (e.g. 10.0.0.0/8)
+    or host names allowed to request profiles.
+    """
+    global _store, _interval
+    _trusted_networks.clear()
+    _trusted_hosts.clear()
+    for client in filter(None, (client.strip() for client in trusted_clients.split(","))):
+        try:
+            _trusted_networks.append(ipaddress.ip_network(client, strict=False))
+        except ValueError:
+            _trusted_hosts.append(client)
+    _store = ProfileStore(directory, max_bytes)
+    _interval = interval
+
+
+def is_trusted(host: Optional[str]) -> bool:
+    if host is None:
+        return False
+    if host in _trusted_hosts:
+        return True
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_networks)
+
+
+def _forwarded_addresses(scope: Scope) -> List[str]:
+    """The client addresses named by the forwarding headers of a proxy, if any."""
+    addresses = []
+    for name, value in scope["headers"]:
+        if name not in _FORWARDING_HEADERS:
+            continue
+        value = value.decode("latin-1")
+        if name == b"forwarded":
+            addresses.extend(_FORWARDED_FOR.findall(value))
+        else:
+            addresses.extend(address.strip() for address in value.split(","))
+    return addresses
+
+
+def is_trusted_request(scope: Scope) -> bool:
+    """Whether the peer of a request and every client it was forwarded for are trusted."""
+    client = scope.get("client")
+    return is_trusted(client[0] if client else None) and all(map(is_trusted, _forwarded_addresses(scope)))
+
+
+def _requested_format(scope: Scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == _HEADER:
+            return value.decode("latin-1").strip().lower() or DEFAULT_FORMAT
+    query_string = scope.get("query_string", b"")
+    if QUERY_FLAG.encode() in query_string:
+        values = parse_qs(query_string.decode("latin-1")).get(QUERY_FLAG)
+        if values is not None:
+            return values[0].strip().lower() or DEFAULT_FORMAT
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running requests that ask for it under the sampling profiler."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        output_format = _requested_format(scope)
+        if output_format is None:
+            await self.app(scope, receive, send)
+            return
+        if not is_trusted_request(scope):
+            logging.info("Ignoring profiling request from untrusted client %s", scope.get("client"))
+            await self.app(scope, receive, send)
+            return
+        if output_format not in FORMATS:
+            output_format = DEFAULT_FORMAT
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (ID_HEADER.lower().encode(), profile_id.encode())
+                ]
+            await send(message)
+
+        profiler = SamplingProfiler(_interval)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profiler.stop()
+            # Rendering and writing the profile takes a while: not on the event loop
+            await asyncio.to_thread(_save_profile, profiler, profile_id, output_format,
+                                    f"{scope['method']} {scope['path']}")
+
+
+def _save_profile(profiler: SamplingProfiler, profile_id: str, output_format: str, name: str) -> None:
+    # A profile that cannot be stored (e.g. disk full) must not change the request's outcome
+    try:
+        path = _store.save(profile_id, output_format, profiler.render(output_format, name))
+    except Exception:
+        logging.exception("Could not store profile %s of %s", profile_id, name)
+    else:
+        logging.info("Stored profile %s of %s (%.3f s) at %s", profile_id, name, profiler.duration, path)
+
+
+@router.get("/profiles/{profile_id}", include_in_schema=False)
+def get_profile(profile_id: str, request: Request):
+    """Download a stored profile. Only trusted clients can download profiles."""
+    if not is_trusted_request(request.scope):
+        raise HTTPException(status_code=403, detail="Profiles are only available to trusted clients.")
+    found = _store.find(profile_id) if _PROFILE_ID.match(profile_id) else None
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found.")
+    path, output_format = found
+    media_type = "application/json" if output_format == "speedscope" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=profile_id + FORMATS[output_format])
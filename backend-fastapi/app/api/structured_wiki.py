@@ -1,10 +1,12 @@
 # Standard library imports
 import logging
+from time import time
 from typing import Dict, Optional, List
 from urllib.parse import urlparse
 
 # Third-party imports
 from fastapi import APIRouter, Query, HTTPException, Request
+from starlette.responses import Response
 
 # Local imports
 from app.model.structured_response import (
@@ -13,14 +15,87 @@ from app.model.structured_response import (
     StructuredCitationResponse,
     StructuredReferenceResponse
 )
-from app.services.article_parser import article_fetcher
+from app.api.cache import TTL_SECONDS, CACHE_REQUESTS, CACHE_EVICTIONS, CACHE_ENTRIES, CACHE_BYTES
+from app.api.http_cache import make_etag, conditional_response
+from app.api.json_response import dump_model
+from app.models.compact_article import CompactArticle
+from app.services.article_parser import fetch_compact_article
 # Cache functions not needed for structured version - using local structured_cache instead
 
 # Initialize the router for structured wiki operations
 router = APIRouter(prefix="/symmetry/v1/wiki")
 
-# Enhanced cache for structured articles
+# Enhanced cache for structured articles.
+# Each entry holds the "article" in its compact form (see app/models/compact_article.py) with
+# its precomputed analytics, and the "bodies" of the JSON responses already served for it,
+# keyed by endpoint as {"body", "etag", "encoded"}, where "encoded" holds the compressed variants.
+# Cache hits on those endpoints are returned as bytes with no pydantic round trip.
+# Entries expire after the same TTL as the article cache.
 structured_cache: Dict[str, Dict] = {}
+CACHE_NAME = "structured"  # Label of the cache in the metrics
+
+
+def _entry_bytes(entry: Dict) -> int:
+    size = entry["article"].nbytes
+    for cached in list(entry["bodies"].values()):
+        size += len(cached["body"]) + sum(len(encoded) for encoded in list(cached["encoded"].values()))
+    return size
+
+
+CACHE_ENTRIES.set_function(lambda: len(structured_cache), cache=CACHE_NAME)
+CACHE_BYTES.set_function(lambda: sum(_entry_bytes(entry) for entry in list(structured_cache.values())),
+                         cache=CACHE_NAME)
+
+
+def _get_cache_entry(cache_key: str) -> Optional[Dict]:
+    entry = structured_cache.get(cache_key)
+    if entry is not None and time() - entry["timestamp"] > TTL_SECONDS:
+        # Sync endpoints use the cache from the threadpool: another request may have evicted it
+        if structured_cache.pop(cache_key, None) is not None:
+            CACHE_EVICTIONS.inc(cache=CACHE_NAME, reason="expired")
+        return None
+    return entry
+
+
+def get_structured_article_data(title: str, lang: str) -> CompactArticle:
+    """
+    Return the parsed article for (title, lang), fetching and caching it on first use.
+    """
+    cache_key = f"{lang}.{title}"
+    entry = _get_cache_entry(cache_key)
+    if entry is None:
+        CACHE_REQUESTS.inc(cache=CACHE_NAME, result="miss")
+        entry = {"article": fetch_compact_article(title, lang), "bodies": {}, "timestamp": time()}
+        structured_cache[cache_key] = entry
+    else:
+        CACHE_REQUESTS.inc(cache=CACHE_NAME, result="hit")
+    return entry["article"]
+
+
+def cached_response(request: Request, cache_key: str, endpoint: str) -> Optional[Response]:
+    """
+    Answer from the cached response of an endpoint, if there is one: 304 Not Modified when the
+    client's If-None-Match matches its ETag, the stored JSON bytes otherwise.
+    """
+    entry = _get_cache_entry(cache_key)
+    if entry is None or endpoint not in entry["bodies"]:
+        return None
+    cached = entry["bodies"][endpoint]
+    CACHE_REQUESTS.inc(cache=CACHE_NAME, result="hit")
+    return conditional_response(
+        request, cached["body"], cached["etag"], TTL_SECONDS - (time() - entry["timestamp"]), cached["encoded"]
+    )
+
+
+def cache_response(request: Request, cache_key: str, endpoint: str, response) -> Response:
+    """Serialize a response model once, keep the bytes with the cached article and send them."""
+    entry = structured_cache[cache_key]
+    body = dump_model(response)
+    etag = make_etag(endpoint, entry["article"].lang, entry["article"].revision_id, body)
+    cached = entry["bodies"][endpoint] = {"body": body, "etag": etag, "encoded": {}}
+    return conditional_response(
+        request, body, etag, TTL_SECONDS - (time() - entry["timestamp"]), cached["encoded"]
+    )
 
 
 @router.get("/structured-article", response_model=StructuredArticleResponse)
@@ -54,37 +129,33 @@ async def get_structured_article(
     
     # Check cache first
     cache_key = f"{lang}.{title}"
-    if cache_key in structured_cache:
+    cached = cached_response(request, cache_key, "structured-article")
+    if cached is not None:
         logging.info("Returning cached structured article: %s", cache_key)
-        return structured_cache[cache_key]
+        return cached
     
     try:
-        # Use the new structured parser
-        article = article_fetcher(title, lang)
-        
-        # Calculate statistics
-        total_citations = sum(len(section.citations or []) for section in article.sections)
-        total_references = len(article.references)
+        # Use the new structured parser (statistics are precomputed while parsing)
+        article = get_structured_article_data(title, lang)
+        analytics = article.analytics
+        total_citations = analytics.total_citations
         
         # Create response
         response = StructuredArticleResponse(
             title=article.title,
             lang=article.lang,
             source=article.source,
-            sections=article.sections,
-            references=article.references,
-            total_sections=len(article.sections),
+            sections=article.sections(),
+            references=article.reference_models(),
+            total_sections=article.total_sections,
             total_citations=total_citations,
-            total_references=total_references
+            total_references=analytics.total_references
         )
         
-        # Cache the result
-        structured_cache[cache_key] = response
-        
         logging.info("Successfully parsed structured article: %s (%d sections, %d citations)", 
-                    title, len(article.sections), total_citations)
+                    title, article.total_sections, total_citations)
         
-        return response
+        return cache_response(request, cache_key, "structured-article", response)
         
     except Exception as e:
         logging.error("Error parsing structured article '%s': %s", title, str(e))
@@ -115,18 +186,16 @@ async def get_structured_section(
     
     try:
         # Get the full structured article
-        article = article_fetcher(title, lang)
+        article = get_structured_article_data(title, lang)
         
         # Find the specific section
-        target_section = None
-        for section in article.sections:
-            if section.title.lower() == section_title.lower():
-                target_section = section
-                break
+        section_index = article.find_section(section_title)
         
-        if not target_section:
+        if section_index is None:
             raise HTTPException(status_code=404, detail=f"Section '{section_title}' not found.")
         
+        target_section = article.section(section_index)
+        
         # Calculate additional metadata
         word_count = len(target_section.clean_content.split())
         citation_count = len(target_section.citations or [])
@@ -152,6 +221,7 @@ async def get_structured_section(
 
 @router.get("/citation-analysis", response_model=StructuredCitationResponse)
 async def get_citation_analysis(
+    request: Request,
     query: str = Query(..., description="Wikipedia article title or URL"),
     lang: Optional[str] = Query(None, description="Article language code"),
 ):
@@ -171,40 +241,24 @@ async def get_citation_analysis(
         if not lang:
             lang = "en"
     
+    cache_key = f"{lang}.{title}"
+    cached = cached_response(request, cache_key, "citation-analysis")
+    if cached is not None:
+        return cached
+    
     try:
-        article = article_fetcher(title, lang)
-        
-        # Collect all citations
-        all_citations = []
-        for section in article.sections:
-            if section.citations:
-                all_citations.extend(section.citations)
-        
-        # Calculate analysis
-        total_citations = len(all_citations)
-        unique_targets = len(set(cit.url for cit in all_citations if cit.url))
-        
-        # Count citations per target
-        citation_counts = {}
-        for citation in all_citations:
-            if citation.url:
-                citation_counts[citation.url] = citation_counts.get(citation.url, 0) + 1
-        
-        # Get most cited articles - FIXED: Map URLs to titles
-        url_to_title = {cit.url: cit.label for cit in all_citations if cit.url}
-        most_cited = [
-            {"title": url_to_title.get(url, "Unknown"), "count": count}
-            for url, count in sorted(citation_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        ]
+        # Citation analysis is precomputed by article_fetcher while parsing
+        article = get_structured_article_data(title, lang)
+        analytics = article.analytics
         
         response = StructuredCitationResponse(
-            citations=all_citations,
-            total_citations=total_citations,
-            unique_targets=unique_targets,
-            most_cited_articles=most_cited
+            citations=article.citations(),
+            total_citations=analytics.total_citations,
+            unique_targets=analytics.unique_targets,
+            most_cited_articles=analytics.most_cited_articles
         )
         
-        return response
+        return cache_response(request, cache_key, "citation-analysis", response)
         
     except Exception as e:
         logging.error("Error analyzing citations for '%s': %s", title, str(e))
@@ -213,6 +267,7 @@ async def get_citation_analysis(
 
 @router.get("/reference-analysis", response_model=StructuredReferenceResponse)
 async def get_reference_analysis(
+    request: Request,
     query: str = Query(..., description="Wikipedia article title or URL"),
     lang: Optional[str] = Query(None, description="Article language code"),
 ):
@@ -232,25 +287,24 @@ async def get_reference_analysis(
         if not lang:
             lang = "en"
     
+    cache_key = f"{lang}.{title}"
+    cached = cached_response(request, cache_key, "reference-analysis")
+    if cached is not None:
+        return cached
+    
     try:
-        article = article_fetcher(title, lang)
-        
-        # Calculate analysis
-        total_references = len(article.references)
-        references_with_urls = sum(1 for ref in article.references if ref.url)
-        
-        # Calculate reference density (references per 1000 words)
-        total_words = sum(len(section.clean_content.split()) for section in article.sections)
-        reference_density = (total_references / total_words * 1000) if total_words > 0 else 0
+        # Reference analysis is precomputed by article_fetcher while parsing
+        article = get_structured_article_data(title, lang)
+        analytics = article.analytics
         
         response = StructuredReferenceResponse(
-            references=article.references,
-            total_references=total_references,
-            references_with_urls=references_with_urls,
-            reference_density=round(reference_density, 2)
+            references=article.reference_models(),
+            total_references=analytics.total_references,
+            references_with_urls=analytics.references_with_urls,
+            reference_density=analytics.reference_density
         )
         
-        return response
+        return cache_response(request, cache_key, "reference-analysis", response)
         
     except Exception as e:
         logging.error("Error analyzing references for '%s': %s", title, str(e))
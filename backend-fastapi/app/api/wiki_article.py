@@ -4,15 +4,23 @@ import asyncio
 import urllib.request
 from urllib.parse import urlparse
 from urllib.error import URLError
-from typing import Dict, Optional, Annotated
+from typing import Dict, List, Optional, Annotated
 
 # Third-party imports
-import wikipediaapi
 from fastapi import APIRouter, Query, HTTPException, Request
 
 # Local imports
-from app.model.response import SourceArticleResponse
-from app.api.cache import get_cached_article, set_cached_article
+from app.model.request import BatchArticleRequest
+from app.model.response import SourceArticleResponse, BatchArticleResponse
+from app.api.cache import get_cached_article, get_cached_article_entry, get_cached_article_max_age, set_cached_article, TTL_SECONDS
+from app.api.http_cache import make_etag, conditional_response
+from app.api.json_response import PreSerializedJSONResponse, dumps
+from app.services.mediawiki import query_page, query_pages, chunked
+from app.services import prefetch
+from app.services import content_source
+from app.services import dump_store
+
+logger = logging.getLogger(__name__)
 
 # Initialize the router for wiki related endpoints
 router = APIRouter(prefix="/symmetry/v1/wiki")
@@ -20,6 +28,9 @@ router = APIRouter(prefix="/symmetry/v1/wiki")
 # This caches short language codes existing on Wikipedia.
 language_cache: Dict[str, bool] = {}
 
+# Maximum number of articles accepted by the batch endpoint
+MAX_BATCH_ARTICLES = 500
+
 
 # GET request method with input validation
 @router.get("/articles", response_model=SourceArticleResponse)
@@ -66,12 +77,13 @@ async def get_article(
        that this endpoint is phased out and transformed into a helper method.
     """
 
-    logging.info("Calling get Wikipedia article endpoint (query='%s')", query)
-    logging.info("[DEBUG] Request headers: %s", dict(request.headers))
-    logging.info("[DEBUG] Request client: %s", request.client.host if request.client else "Unknown")
+    logger.info("Calling get Wikipedia article endpoint (query='%s')", query)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Request headers: %s", dict(request.headers))
+        logger.debug("Request client: %s", request.client.host if request.client else "Unknown")
 
     if not query:
-        logging.info("No query parameter provided.")
+        logger.info("No query parameter provided.")
         raise HTTPException(status_code=400, detail="Invalid Wikipedia URL provided.")
 
     title: Optional[str]
@@ -81,7 +93,7 @@ async def get_article(
         try:
             # If it's a Wikipedia URL, validate and parse it.
             lang, title = await validate_url(query)
-            logging.debug("Parsed query as URL (lang='%s'; title='%s')", lang, title)
+            logger.debug("Parsed query as URL (lang='%s'; title='%s')", lang, title)
         except HTTPException as e:
             # Re-raise the HTTPException raised during URL parsing or validation
             raise e
@@ -94,30 +106,133 @@ async def get_article(
     if not lang:
         lang = "en"
 
-    # Validate the language code *before* initializing wikipediaapi
+    # Validate the language code *before* querying Wikipedia
     await validate_language_code(lang)
 
-    # Dynamically create Wikipedia object for the selected language
-    cached_content, cached_languages = get_cached_article(lang + "." + title)
-    if cached_content:
-        return {"sourceArticle": cached_content, "articleLanguages": cached_languages}
-
-    wiki_wiki = wikipediaapi.Wikipedia(
-        user_agent="Symmetry/2.0 (contact@grey-box.ca)", language=lang
-    )
+    # Cache hits are served from the (compressed) JSON bytes stored with the article,
+    # or with 304 Not Modified when the client already holds the same revision.
+    cached = get_cached_article_entry(lang + "." + title)
+    if cached is not None and cached["body"] is not None:
+        if cached.pop("prefetched", False):
+            prefetch.record_hit()
+        schedule_prefetch(lang, cached["languages"])
+        return conditional_response(
+            request, cached["body"], cached["etag"], get_cached_article_max_age(cached), cached["encoded"]
+        )
 
-    page = wiki_wiki.page(title)
+    # A single action=query request returns the text, the language links (with the article
+    # title in each language) and the latest revision id, which is used for the ETag.
+    page = await asyncio.to_thread(query_page, lang, title)
 
     # Check if Wikipedia page exists
-    if not page.exists():
+    if page is None:
         raise HTTPException(status_code=404, detail="Article not found.")
 
-    article_content = page.text
-    languages = list(page.langlinks.keys()) if page.langlinks else []
+    cached = cache_article(lang, title, page["text"], page["langlinks"], page["lastrevid"])
+    schedule_prefetch(lang, page["langlinks"])
+
+    return conditional_response(request, cached["body"], cached["etag"], TTL_SECONDS, cached["encoded"])
+
+
+def schedule_prefetch(lang: str, languages: Dict[str, str]) -> None:
+    """
+    Record the request in the prefetch history and, if prefetching is enabled, start fetching
+    the article in the most requested of its other languages (see app/services/prefetch.py).
+    """
+    prefetch.record_request(lang)
+    prefetch.schedule_prefetch(lang, languages, prefetch_article, is_article_cached)
+
+
+def prefetch_article(lang: str, title: str) -> None:
+    """Fetch an article into the article cache in the background."""
+    page = query_page(lang, title)
+    if page is None:
+        return
+    cached = cache_article(lang, title, page["text"], page["langlinks"], page["lastrevid"])
+    cached["prefetched"] = True  # Counted as a prefetch hit when it is first served
+
+
+def is_article_cached(key: str) -> bool:
+    return get_cached_article_entry(key) is not None
+
 
-    set_cached_article(lang + "." + title, article_content, languages)
+def cache_article(lang: str, title: str, content: str, languages: Dict[str, str], revision_id: Optional[int]) -> Dict:
+    """
+    Store an article in the article cache together with its serialized response and ETag.
+    'languages' maps the language codes the article exists in to its title in that language.
+    Returns the cache entry.
+    """
+    body = dumps({
+        "sourceArticle": content,
+        "articleLanguages": list(languages),
+        "articleLanguageTitles": languages,
+    })
+    etag = make_etag("article", lang, revision_id, body)
+    return set_cached_article(lang + "." + title, content, languages, body, etag)
+
+
+@router.post("/articles:batch", response_model=BatchArticleResponse)
+async def get_articles_batch(payload: BatchArticleRequest):
+    """
+    This endpoint requests many Wikipedia articles at once, given as (lang, title) pairs.
+
+    Articles already in the cache are served from it. The others are grouped by language and
+    fetched with multi-title MediaWiki queries (up to 50 titles per action=query request),
+    with the language groups fetched concurrently. Every fetched article is added to the cache,
+    so later calls to /articles for the same article are cache hits.
+    """
+    logger.info("Calling batch Wikipedia articles endpoint (%d articles)", len(payload.articles))
 
-    return {"sourceArticle": article_content, "articleLanguages": languages}
+    if len(payload.articles) > MAX_BATCH_ARTICLES:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_BATCH_ARTICLES} articles can be requested at once."
+        )
+
+    found: Dict[tuple, Optional[tuple]] = {}  # (lang, title) -> (content, language titles), or None if missing
+    misses: Dict[str, Dict[str, None]] = {}  # lang -> titles to fetch (dict keeps request order)
+    for article in payload.articles:
+        key = (article.lang, article.title)
+        if key in found or article.title in misses.get(article.lang, {}):
+            continue
+        content, languages = get_cached_article(article.lang + "." + article.title)
+        if content:
+            found[key] = (content, languages)
+        else:
+            misses.setdefault(article.lang, {})[article.title] = None
+
+    await asyncio.gather(*(validate_language_code(lang) for lang in misses))
+    groups = await asyncio.gather(
+        *(asyncio.to_thread(_fetch_language_group, lang, list(titles)) for lang, titles in misses.items())
+    )
+    for lang, group in zip(misses, groups):
+        for title, article in group.items():
+            found[(lang, title)] = article
+
+    results = []
+    for article in payload.articles:
+        fetched = found[(article.lang, article.title)]
+        results.append({
+            "lang": article.lang,
+            "title": article.title,
+            "found": fetched is not None,
+            "sourceArticle": fetched[0] if fetched else None,
+            "articleLanguages": list(fetched[1]) if fetched else [],
+            "articleLanguageTitles": fetched[1] if fetched else {},
+        })
+    return PreSerializedJSONResponse(dumps({"articles": results}))
+
+
+def _fetch_language_group(lang: str, titles: List[str]) -> Dict[str, Optional[tuple]]:
+    """Fetch and cache the articles of one language, up to 50 titles per request."""
+    articles: Dict[str, Optional[tuple]] = {}
+    for chunk in chunked(titles):
+        for title, page in query_pages(lang, chunk).items():
+            if page is None:
+                articles[title] = None
+                continue
+            cache_article(lang, title, page["text"], page["langlinks"], page["lastrevid"])
+            articles[title] = (page["text"], page["langlinks"])
+    return articles
 
 
 async def validate_url(url):
@@ -133,7 +248,7 @@ async def validate_url(url):
 
     # Domain validation
     if not parsed_url.netloc.endswith(".wikipedia.org"):
-        logging.info(
+        logger.info(
             "Invalid domain '%s', only 'wikipedia.org' is allowed.",
             parsed_url.netloc,
         )
@@ -146,7 +261,7 @@ async def validate_url(url):
 
     # Ensure that URL matches the format '<language_code>.wikipedia.org'
     if len(split_url) != 3:
-        logging.info(
+        logger.info(
             "Invalid subdomain '%s', only '__.wikipedia.org' is allowed.",
             parsed_url.netloc,
         )
@@ -158,7 +273,7 @@ async def validate_url(url):
     # Language code syntax validation
     lang = split_url[0]
     if not lang.isalpha() or len(lang) > 2:
-        logging.info("Invalid language code '%s'", lang)
+        logger.info("Invalid language code '%s'", lang)
         raise HTTPException(status_code=400, detail="Invalid language code in URL.")
 
     # Validate language code through preflight check
@@ -166,7 +281,7 @@ async def validate_url(url):
 
     # Validate the path starts with '/wiki/'
     if not parsed_url.path.startswith("/wiki/"):
-        logging.debug("Invalid wiki article path '%s'", parsed_url.path)
+        logger.debug("Invalid wiki article path '%s'", parsed_url.path)
         raise HTTPException(
             status_code=400,
             detail="Invalid Wikipedia URL format: Invalid article path.",
@@ -176,7 +291,7 @@ async def validate_url(url):
     title = _extract_wiki_title(parsed_url.path)
 
     if len(title) == 0:
-        logging.debug("Empty wiki article title")
+        logger.debug("Empty wiki article title")
         raise HTTPException(
             status_code=400,
             detail="Invalid Wikipedia URL format: No article specified.",
@@ -203,18 +318,22 @@ def _extract_wiki_title(url: str) -> str:
 async def validate_language_code(language_code: str):
     # Check cache first
     if language_code in language_cache:
-        logging.info(f"Using cached validation for language code: {language_code}")
+        logger.debug("Using cached validation for language code: %s", language_code)
         return language_cache[language_code]
 
+    # Languages of the local dump store are served without Wikipedia
+    if dump_store.has_language(language_code):
+        return True
+
     # Ping main page for validation
-    url = f"https://{language_code}.wikipedia.org/wiki/Main_Page"
+    url = content_source.main_page_url(language_code)
 
     try:
         # Use asyncio.to_thread to run the blocking urllib request in a separate thread
         response = await asyncio.to_thread(urllib.request.urlopen, url)
 
         if response.status == 200:
-            logging.info(f"Valid language code: {language_code}")
+            logger.info("Valid language code: %s", language_code)
             language_cache[language_code] = True  # Cache the validation result
             return True
         else:
@@ -1,5 +1,6 @@
 import argparse
 import logging
+from contextlib import asynccontextmanager
 import re
 import requests
 from traceback import format_exc
@@ -15,12 +16,31 @@ import uvicorn
 import wikipediaapi
 from typing import List
 
+from app.api import cache
 from app.api import wiki_article
 from app.api import comparison
 from app.api import structured_wiki
-
-from app.ai.semantic_comparison import perform_semantic_comparison
+from app.api import metrics
+from app.api import jobs
+from app.api import compression
+from app.api import profiling
+from app.api import health
+from app.api.compression import CompressionMiddleware
+from app.api.profiling import ProfilingMiddleware
+from app.services import prefetch
+from app.services import jobs as job_runner
+from app.services import dump_store
+from app.services import content_source
+from app.services import logs
+from app.services import warmup
+from app.services import model_cache
+from app.services import shared_cache
+from app.services import comparison_store
+
+from app.ai.semantic_comparison import DEFAULT_MODEL, perform_semantic_comparison
 from app.ai.llm_comparison import llm_semantic_comparison
+from app.ai import section_comparison
+from app.ai import semantic_comparison
 
 """
 This is the API which handles backend. It handles following features
@@ -39,7 +59,60 @@ Note: You can run this API using 'python main.py' and use postman to get respons
 config = Config(".env")
 
 LOG_LEVEL = config.get("LOG_LEVEL", default="INFO")
+# Fraction of records kept for high-frequency loggers, e.g. "app.api.cache=0.01,app.api.wiki_article=0.1"
+LOG_SAMPLE_RATES = config.get("LOG_SAMPLE_RATES", default="")
 FASTAPI_DEBUG = config.get("FASTAPI_DEBUG", cast=bool, default=False)
+# Responses smaller than this many bytes are not compressed
+COMPRESSION_MINIMUM_SIZE = config.get("COMPRESSION_MINIMUM_SIZE", cast=int, default=compression.MINIMUM_SIZE)
+# Articles (and their serialized responses) kept in each worker's in-memory LRU cache: at most this
+# many, and this many MB in each worker process
+ARTICLE_CACHE_LIMIT = config.get("ARTICLE_CACHE_LIMIT", cast=int, default=cache.CACHE_LIMIT)
+ARTICLE_CACHE_MAX_MB = config.get("ARTICLE_CACHE_MAX_MB", cast=int, default=cache.CACHE_MAX_BYTES // (1024 * 1024))
+# Speculatively fetch the article in its most requested other languages (opt-in)
+PREFETCH_ENABLED = config.get("PREFETCH_ENABLED", cast=bool, default=False)
+PREFETCH_LANGUAGES = config.get("PREFETCH_LANGUAGES", cast=int, default=prefetch.TOP_LANGUAGES)
+PREFETCH_MAX_CONCURRENT = config.get("PREFETCH_MAX_CONCURRENT", cast=int, default=prefetch.MAX_CONCURRENT)
+# SQLite database of the bulk comparison jobs, and the number of threads fetching their articles
+JOBS_DATABASE = config.get("JOBS_DATABASE", default=job_runner.DATABASE)
+JOBS_FETCH_WORKERS = config.get("JOBS_FETCH_WORKERS", cast=int, default=job_runner.FETCH_WORKERS)
+# Compared article pairs kept to re-compare them incrementally when their revisions change
+JOBS_STORED_COMPARISONS = config.get("JOBS_STORED_COMPARISONS", cast=int, default=comparison_store.MAX_COMPARISONS)
+# Directory of the local article store ingested from Wikipedia dumps; empty to always use the network
+DUMP_STORE_DIR = config.get("DUMP_STORE_DIR", default="")
+# Where article content comes from: "live" (Wikipedia) or "fake" (the local fake MediaWiki server)
+CONTENT_SOURCE = config.get("CONTENT_SOURCE", default=content_source.LIVE)
+FAKE_MEDIAWIKI_URL = config.get("FAKE_MEDIAWIKI_URL", default=content_source.FAKE_MEDIAWIKI_URL)
+# On-demand profiling of single requests by trusted clients (opt-in, see app/api/profiling.py)
+PROFILING_ENABLED = config.get("PROFILING_ENABLED", cast=bool, default=False)
+# Behind a reverse proxy the peer is the proxy: forwarded requests (X-Forwarded-For, Forwarded, ...)
+# are only trusted when the clients they were forwarded for are trusted as well
+PROFILING_TRUSTED_CLIENTS = config.get("PROFILING_TRUSTED_CLIENTS", default="127.0.0.1,::1")
+PROFILING_DIR = config.get("PROFILING_DIR", default=profiling.DIRECTORY)
+PROFILING_MAX_BYTES = config.get("PROFILING_MAX_BYTES", cast=int, default=profiling.MAX_BYTES)
+# Comma-separated models and spaCy languages loaded in the background at startup; empty for none
+WARMUP_MODELS = config.get("WARMUP_MODELS", default=DEFAULT_MODEL)
+WARMUP_SPACY_LANGUAGES = config.get("WARMUP_SPACY_LANGUAGES", default="en")
+# Persistent directory of the downloaded models; empty for the default (see app/services/model_cache.py)
+MODEL_CACHE_DIR = config.get("MODEL_CACHE_DIR", default="")
+# Node-wide cache shared by the worker processes, e.g. /dev/shm/symmetry-cache; empty to disable
+SHARED_CACHE_PATH = config.get("SHARED_CACHE_PATH", default="")
+SHARED_CACHE_SIZE_MB = config.get("SHARED_CACHE_SIZE_MB", cast=int, default=shared_cache.DEFAULT_SIZE // (1024 * 1024))
+SHARED_CACHE_SLOTS = config.get("SHARED_CACHE_SLOTS", cast=int, default=shared_cache.DEFAULT_SLOTS)
+# Sentences with fewer words are not compared (e.g. the fragments left by single newlines)
+MIN_SENTENCE_TOKENS = config.get("MIN_SENTENCE_TOKENS", cast=int, default=semantic_comparison.MIN_SENTENCE_TOKENS)
+# Encoding batches: most tokens (padding included) and sentences per batch, and torch threads (0: default)
+ENCODE_BATCH_TOKENS = config.get("ENCODE_BATCH_TOKENS", cast=int, default=semantic_comparison.ENCODE_BATCH_TOKENS)
+ENCODE_BATCH_SIZE = config.get("ENCODE_BATCH_SIZE", cast=int, default=semantic_comparison.ENCODE_BATCH_SIZE)
+ENCODE_THREADS = config.get("ENCODE_THREADS", cast=int, default=semantic_comparison.ENCODE_THREADS)
+# Encode sentences longer than the model's max sequence length as overlapping windows instead of truncating them
+ENCODE_WINDOWED = config.get("ENCODE_WINDOWED", cast=bool, default=semantic_comparison.WINDOWED_ENCODING)
+ENCODE_WINDOW_OVERLAP = config.get("ENCODE_WINDOW_OVERLAP", cast=int, default=semantic_comparison.WINDOW_OVERLAP)
+# Least similarity of two sections (title and lead sentence) to compare them in section-aligned mode
+SECTION_ALIGNMENT_THRESHOLD = config.get("SECTION_ALIGNMENT_THRESHOLD", cast=float,
+                                         default=section_comparison.ALIGNMENT_THRESHOLD)
+# Address of the server when run directly (python main.py, or the frozen app)
+HOST = config.get("HOST", default="127.0.0.1")
+PORT = config.get("PORT", cast=int, default=8000)
 
 comparison_models = [
     "sentence-transformers/LaBSE",
@@ -49,16 +122,24 @@ comparison_models = [
     "multi-qa-mpnet-base-cos-v1"
 ]
 
-# Configure logging
-logging.basicConfig(
-    level=LOG_LEVEL, format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# Configure logging. Records are written out by a background thread, never in the request path
+logs.setup_logging(LOG_LEVEL, logs.parse_sample_rates(LOG_SAMPLE_RATES))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pick up bulk comparison jobs left unfinished by the previous run
+    # (in a single worker when started by the pre-fork launcher)
+    job_runner.resume_jobs()
+    # Load the comparison models without holding up startup; /healthz/ready reports the progress
+    warmup.start()
+    yield
 
 
 # Initialize FastAPI app. The 'debug' flag controls the level of error reporting.
 # When 'debug' is True, detailed error messages including stack traces will be shown, which is helpful during development.
 # When 'debug' is False, more generic error messages are returned to the client, suitable for production environments.
-app = FastAPI(debug=FASTAPI_DEBUG)
+app = FastAPI(debug=FASTAPI_DEBUG, lifespan=lifespan)
 
 
 # Custom exception handlers
@@ -101,6 +182,52 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+# Compress responses with brotli or gzip, depending on the client's Accept-Encoding.
+# Cached article responses are precompressed by their endpoints and passed through.
+compression.configure(minimum_size=COMPRESSION_MINIMUM_SIZE)
+app.add_middleware(CompressionMiddleware)
+
+# Requests carrying the profiling header or query flag run under a sampling profiler.
+# The middleware is left out entirely when profiling is disabled.
+profiling.configure(PROFILING_TRUSTED_CLIENTS, PROFILING_DIR, PROFILING_MAX_BYTES)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Articles fetched from Wikipedia are cached in memory
+cache.configure(ARTICLE_CACHE_LIMIT, ARTICLE_CACHE_MAX_MB * 1024 * 1024)
+
+# Background prefetching of target-language articles into the article cache
+prefetch.configure(PREFETCH_ENABLED, PREFETCH_LANGUAGES, PREFETCH_MAX_CONCURRENT)
+
+# Bulk comparison jobs are stored in a local SQLite database and run by a pool of worker threads
+job_runner.configure(JOBS_DATABASE, JOBS_FETCH_WORKERS)
+comparison_store.configure(JOBS_STORED_COMPARISONS)
+
+# Articles found in the local dump store are served from disk instead of Wikipedia
+dump_store.configure(DUMP_STORE_DIR)
+
+# Point every Wikipedia request at the configured content source
+content_source.configure(CONTENT_SOURCE, FAKE_MEDIAWIKI_URL)
+
+# Articles and embeddings are shared with the other worker processes through a memory-mapped file
+shared_cache.configure(SHARED_CACHE_PATH, SHARED_CACHE_SIZE_MB * 1024 * 1024, SHARED_CACHE_SLOTS)
+
+# Sentences are normalized and deduplicated before they are encoded, in length-sorted batches
+semantic_comparison.configure(MIN_SENTENCE_TOKENS, ENCODE_BATCH_TOKENS, ENCODE_BATCH_SIZE, ENCODE_THREADS,
+                              ENCODE_WINDOWED, ENCODE_WINDOW_OVERLAP)
+
+# Section-aligned comparisons (POST /symmetry/v1/articles/compare-sections)
+section_comparison.configure(SECTION_ALIGNMENT_THRESHOLD)
+
+# Models are downloaded to and loaded from a persistent cache directory
+model_cache.configure(MODEL_CACHE_DIR)
+
+# Models warmed up at startup, listed by /healthz/ready
+warmup.configure(
+    [name.strip() for name in WARMUP_MODELS.split(",") if name.strip()],
+    [lang.strip() for lang in WARMUP_SPACY_LANGUAGES.split(",") if lang.strip()],
+)
+
 # Add endpoints from other modules.
 # Note that when adding more endpoints, they should follow a similar format!
 # The current format is /symmetry/v1/<path>/<to>/<resource>
@@ -111,6 +238,10 @@ app.add_middleware(
 app.include_router(wiki_article.router)
 app.include_router(comparison.router)
 app.include_router(structured_wiki.router)
+app.include_router(metrics.router)
+app.include_router(jobs.router)
+app.include_router(profiling.router)
+app.include_router(health.router)
 
 
 # Class defines the API reponse format for source article (output)
@@ -240,10 +371,10 @@ def compare_articles(text_a: str, text_b: str, similarity_threshold: float = 0.7
     # return {"missing_info": missing_info, "extra_info": extra_info}
     output = llm_semantic_comparison(text_a, text_b)
     x = {"missing_info": output['missing_info'], "extra_info": output['extra_info']}
-    print(x)
+    logging.debug("Semantic comparison result: %s", x)
     return x
 
 
 # Defines API URL (host, port)
 if __name__ == "__main__":
-    uvicorn.run(app, host='127.0.0.1', port=8000)
+    uvicorn.run(app, host=HOST, port=PORT)
@@ -1,3 +1,4 @@
+from typing import List, Optional, Union
 from pydantic import BaseModel
 
 
@@ -5,7 +6,8 @@ from pydantic import BaseModel
 This is the schema that is used to pass data from the front end to the backend in order
 to begin a comparison of two articles. The two articles and their languages are passed, along with
 the comparison threshold (value which determines how similar the comparison should be) and the model name
-the user would like to use from the ML comparison.
+the user would like to use from the ML comparison. Several model names may be given, to compare
+the articles with each of them in one request.
 """
 
 
@@ -15,4 +17,41 @@ class CompareRequest(BaseModel):
     article_text_blob_1_language: str
     article_text_blob_2_language: str
     comparison_threshold: float
-    model_name: str
+    model_name: Union[str, List[str]]
+
+
+# Schema for a section-aligned comparison of the Wikipedia article 'source_title' with its version
+# 'target_title'. With 'global_fallback', sentences without a match in their aligned section are
+# compared with the whole other article.
+class SectionCompareRequest(BaseModel):
+    source_title: str
+    source_lang: str
+    target_title: str
+    target_lang: str
+    comparison_threshold: Optional[float] = None
+    model_name: str = "sentence-transformers/LaBSE"
+    global_fallback: bool = True
+
+
+# Schema for requesting several Wikipedia articles in one call
+class ArticleReference(BaseModel):
+    lang: str
+    title: str
+
+
+class BatchArticleRequest(BaseModel):
+    articles: List[ArticleReference]
+
+
+# Schema for one comparison of a bulk comparison job: the article 'title' in 'source_lang'
+# is compared with its version in 'target_lang'
+class ComparisonJobSpec(BaseModel):
+    title: str
+    source_lang: str
+    target_lang: str
+    model_name: str = "sentence-transformers/LaBSE"
+    comparison_threshold: Optional[float] = None
+
+
+class ComparisonJobRequest(BaseModel):
+    specs: List[ComparisonJobSpec]
@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 
@@ -28,20 +28,68 @@ class SourceArticleResponse(BaseModel):
        Currently it returns a list of available short language codes.
        The UI expects a map of short language codes to user-friendly language names, but that isn't
        enough! The UI will also need a title or (ideally) URL to query the correct page in another
-       language. This information is available through the request made in wiki_article.py, but is
-       not currently returned or expected on the UI side.
+       language. The title is now returned in 'articleLanguageTitles', but is not yet used on the UI side.
     """
     articleLanguages: List[str]
+    # Short language code -> title of the article in that language
+    articleLanguageTitles: Dict[str, str] = {}
 
 
-# Schema for a single comparison
+# Schema for one article of a batch request. 'found' is False when the article does not exist.
+class BatchArticleResult(BaseModel):
+    lang: str
+    title: str
+    found: bool
+    sourceArticle: Optional[str] = None
+    articleLanguages: List[str] = []
+    articleLanguageTitles: Dict[str, str] = {}
+
+
+# Response schema for the batch article endpoint, in the order the articles were requested
+class BatchArticleResponse(BaseModel):
+    articles: List[BatchArticleResult]
+
+
+# Schema for a single comparison. 'model_name' is the model it was computed with, when known.
 class ComparisonResult(BaseModel):
     left_article_array: List[str]
     right_article_array: List[str]
     left_article_missing_info_index: List[int]
     right_article_extra_info_index: List[int]
+    model_name: Optional[str] = None
 
 
 # Final response schema for the comparison endpoint
 class CompareResponse(BaseModel):
     comparisons: List[ComparisonResult]
+
+
+# Result of a pair of aligned sections in a section-aligned comparison. A section without a
+# counterpart has no 'target_section' (or 'source_section') and no 'alignment_similarity'.
+# Ranges are [start, end) in the sentence arrays of the comparison, and indices refer to them too.
+class SectionComparisonResult(BaseModel):
+    source_section: Optional[str] = None
+    target_section: Optional[str] = None
+    alignment_similarity: Optional[float] = None
+    source_range: List[int]
+    target_range: List[int]
+    missing_info_index: List[int]
+    extra_info_index: List[int]
+
+
+# Response schema for the section-aligned comparison endpoint
+class SectionCompareResponse(BaseModel):
+    comparisons: List[ComparisonResult]
+    sections: List[SectionComparisonResult]
+
+
+# Progress of a bulk comparison job. 'status' is "running" until every spec is done or failed.
+class ComparisonJobResponse(BaseModel):
+    job_id: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    pending: int
+    created_at: float
+    updated_at: float
@@ -0,0 +1,257 @@
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from app.models.wiki_structure import Citation, Reference, Section, Article, ArticleAnalytics
+
+"""
+Compact in-memory form of a parsed Wikipedia article, used for cached articles.
+
+Instead of storing every section's text twice (raw and clean) plus a pydantic object and a
+"label:position" string per link, a CompactArticle keeps:
+
+- one text buffer holding the clean text of every section back to back
+- array-backed tables of (start, end, target-id) offsets for the internal links (citations)
+- an interned table of link URLs, referenced by target-id
+- a table of (offset, label-id) for the in-text reference markers (e.g. "[1]")
+
+The raw content, the Citation objects and the citation positions are rebuilt from these tables.
+The pydantic models in wiki_structure.py are only created at the API boundary.
+"""
+
+# Type code for offset tables. 'I' is an unsigned int (at least 4 bytes).
+_OFFSET_TYPE = "I"
+
+
+class CompactArticle:
+    __slots__ = (
+        "title",
+        "lang",
+        "source",
+        "revision_id",  # Wikipedia revision the article was parsed from, if known
+        "text",  # Clean text of all sections (unstripped), back to back
+        "section_titles",
+        "section_bounds",  # [start, end) of each section in text, flattened
+        "section_citations",  # Index of each section's first citation, plus a final end index
+        "section_markers",  # Index of each section's first reference marker, plus a final end index
+        "cite_start",  # Absolute offset in text where the citation label starts
+        "cite_end",
+        "cite_target",  # Index into urls
+        "urls",
+        "marker_offset",  # Absolute offset in text where the marker was written in the raw content
+        "marker_label",  # Index into marker_labels
+        "marker_labels",
+        "references",  # Full reference list as (label, id, url) tuples
+        "analytics",
+    )
+
+    def __init__(self, title: str, lang: str, source: str, revision_id: Optional[int] = None):
+        self.title = title
+        self.lang = lang
+        self.source = source
+        self.revision_id = revision_id
+        self.text = ""
+        self.section_titles: List[str] = []
+        self.section_bounds = array(_OFFSET_TYPE)
+        self.section_citations = array(_OFFSET_TYPE, [0])
+        self.section_markers = array(_OFFSET_TYPE, [0])
+        self.cite_start = array(_OFFSET_TYPE)
+        self.cite_end = array(_OFFSET_TYPE)
+        self.cite_target = array(_OFFSET_TYPE)
+        self.urls: List[str] = []
+        self.marker_offset = array(_OFFSET_TYPE)
+        self.marker_label = array(_OFFSET_TYPE)
+        self.marker_labels: List[str] = []
+        self.references: List[Tuple[str, Optional[str], Optional[str]]] = []
+        self.analytics: Optional[ArticleAnalytics] = None
+
+    @property
+    def total_sections(self) -> int:
+        return len(self.section_titles)
+
+    @property
+    def total_citations(self) -> int:
+        return len(self.cite_start)
+
+    def find_section(self, title: str) -> Optional[int]:
+        """Return the index of the first section whose title matches (case-insensitive)."""
+        wanted = title.lower()
+        for index, section_title in enumerate(self.section_titles):
+            if section_title.lower() == wanted:
+                return index
+        return None
+
+    def clean_content(self, index: int) -> str:
+        start, end = self.section_bounds[2 * index], self.section_bounds[2 * index + 1]
+        return self.text[start:end].strip()
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory held by the article's text, strings and offset tables, in bytes."""
+        size = sys.getsizeof(self.text)
+        for table in (self.section_bounds, self.section_citations, self.section_markers, self.cite_start,
+                      self.cite_end, self.cite_target, self.marker_offset, self.marker_label):
+            size += table.itemsize * len(table)
+        for strings in (self.section_titles, self.urls, self.marker_labels):
+            size += sum(sys.getsizeof(string) for string in strings)
+        for reference in self.references:
+            size += sum(sys.getsizeof(field) for field in reference if field is not None)
+        return size
+
+    def word_count(self, index: int) -> int:
+        return len(self.clean_content(index).split())
+
+    def citation_count(self, index: int) -> int:
+        return self.section_citations[index + 1] - self.section_citations[index]
+
+    def citation(self, cite: int) -> Citation:
+        return Citation(
+            label=self.text[self.cite_start[cite]:self.cite_end[cite]],
+            url=self.urls[self.cite_target[cite]],
+        )
+
+    def citations(self) -> List[Citation]:
+        """All citations of the article, in document order."""
+        return [self.citation(cite) for cite in range(self.total_citations)]
+
+    def section(self, index: int) -> Section:
+        """Rebuild the pydantic Section for the section at the given index."""
+        start, end = self.section_bounds[2 * index], self.section_bounds[2 * index + 1]
+        text = self.text[start:end]
+        lead = len(text) - len(text.lstrip())
+        first_cite, last_cite = self.section_citations[index], self.section_citations[index + 1]
+        first_marker, last_marker = self.section_markers[index], self.section_markers[index + 1]
+
+        citations = []
+        citation_position = []
+        # Raw content is the clean text with link details and reference markers inserted.
+        # Markers sort before links at the same offset since they were written first.
+        insertions = []
+        for marker in range(first_marker, last_marker):
+            insertions.append((self.marker_offset[marker] - start, 0, f" {self.marker_labels[self.marker_label[marker]]}"))
+        for cite in range(first_cite, last_cite):
+            label = self.text[self.cite_start[cite]:self.cite_end[cite]]
+            url = self.urls[self.cite_target[cite]]
+            relative_start = self.cite_start[cite] - start
+            citations.append(Citation(label=label, url=url))
+            citation_position.append(f"{label}:{relative_start - lead}")
+            # The link details go in front of the space that precedes the label
+            insertions.append((relative_start - 1, 1, f" ({url}, {len(label.split())})"))
+        insertions.sort(key=lambda item: (item[0], item[1]))
+
+        raw_parts = []
+        previous = 0
+        for offset, _, value in insertions:
+            raw_parts.append(text[previous:offset])
+            raw_parts.append(value)
+            previous = offset
+        raw_parts.append(text[previous:])
+
+        return Section(
+            title=self.section_titles[index],
+            raw_content="".join(raw_parts).strip(),
+            clean_content=text.strip(),
+            citations=citations,
+            citation_position=citation_position,
+        )
+
+    def sections(self) -> List[Section]:
+        return [self.section(index) for index in range(self.total_sections)]
+
+    def reference_models(self) -> List[Reference]:
+        return [Reference(label=label, id=ref_id, url=url) for label, ref_id, url in self.references]
+
+    def to_article(self) -> Article:
+        """Convert to the pydantic Article used by the API responses."""
+        return Article(
+            title=self.title,
+            lang=self.lang,
+            source=self.source,
+            sections=self.sections(),
+            references=self.reference_models(),
+            analytics=self.analytics,
+        )
+
+
+class CompactArticleBuilder:
+    """
+    Accumulates a CompactArticle section by section while article_fetcher walks the page.
+
+    Offsets are recorded against the section text as it is built, so pending citations and
+    markers are only committed when their section turns out to have content.
+    """
+
+    def __init__(self, title: str, lang: str, source: str, revision_id: Optional[int] = None):
+        self.article = CompactArticle(title, lang, source, revision_id)
+        self._buffer: List[str] = []
+        self._length = 0  # Length of the committed text buffer
+        self._url_ids: Dict[str, int] = {}
+        self._marker_ids: Dict[str, int] = {}
+        self._reset_section()
+
+    def _reset_section(self) -> None:
+        self._parts: List[str] = []
+        self._section_length = 0
+        self._citations: List[Tuple[int, str, str]] = []  # (start, label, url), start section-relative
+        self._markers: List[Tuple[int, str]] = []  # (offset, label), section-relative
+
+    def add_text(self, text: str) -> None:
+        """Append a space-separated piece of text to the current section."""
+        self._parts.append(" " + text)
+        self._section_length += 1 + len(text)
+
+    def add_citation(self, text: str, url: str) -> None:
+        self._citations.append((self._section_length + 1, text, url))
+        self.add_text(text)
+
+    def add_marker(self, label: str) -> None:
+        self._markers.append((self._section_length, label))
+
+    def end_section(self, title: str) -> List[Tuple[str, str]]:
+        """
+        Close the current section under the given title.
+        Sections without any text are dropped. Returns the committed citations as (label, url).
+        """
+        text = "".join(self._parts)
+        citations = self._citations
+        markers = self._markers
+        self._reset_section()
+        if not text.strip():
+            return []
+
+        article = self.article
+        base = self._length
+        self._buffer.append(text)
+        self._length += len(text)
+        article.section_titles.append(title)
+        article.section_bounds.extend((base, self._length))
+
+        committed = []
+        for start, label, url in citations:
+            target = self._url_ids.get(url)
+            if target is None:
+                target = self._url_ids[url] = len(article.urls)
+                article.urls.append(url)
+            article.cite_start.append(base + start)
+            article.cite_end.append(base + start + len(label))
+            article.cite_target.append(target)
+            committed.append((label, url))
+        article.section_citations.append(len(article.cite_start))
+
+        for offset, label in markers:
+            label_id = self._marker_ids.get(label)
+            if label_id is None:
+                label_id = self._marker_ids[label] = len(article.marker_labels)
+                article.marker_labels.append(label)
+            article.marker_offset.append(base + offset)
+            article.marker_label.append(label_id)
+        article.section_markers.append(len(article.marker_offset))
+        return committed
+
+    def add_reference(self, label: str, ref_id: Optional[str], url: Optional[str]) -> None:
+        self.article.references.append((label, ref_id, url))
+
+    def build(self) -> CompactArticle:
+        self.article.text = "".join(self._buffer)
+        self._buffer = [self.article.text]
+        return self.article
@@ -19,6 +19,16 @@ class Section(BaseModel):
     citations: Optional[List[Citation]] = None # Citation objects (Internal Wikipedia links)
     citation_position: Optional[List[str]] = None # Positional data: formatted as "link_label:start_index"
 
+# Aggregates computed during parsing so the analysis endpoints don't rescan the sections
+class ArticleAnalytics(BaseModel):
+    total_citations: int = 0
+    unique_targets: int = 0 # Number of distinct citation URLs
+    most_cited_articles: List[dict] = [] # Top citation targets: {title: str, count: int}
+    total_references: int = 0
+    references_with_urls: int = 0
+    total_words: int = 0 # Word count over every section's clean_content
+    reference_density: float = 0.0 # References per 1000 words
+
 # Head of Article
 class Article(BaseModel):
     title: str
@@ -26,3 +36,4 @@ class Article(BaseModel):
     source: str
     sections: List[Section]
     references: List[Reference] # Full list of footnotes/sources
+    analytics: Optional[ArticleAnalytics] = None # Filled in by article_fetcher
@@ -1,14 +1,28 @@
+import heapq
 import requests
 from bs4 import BeautifulSoup
-from typing import List, Optional
+from collections import Counter
 
 # Import Pydantic models from centralized location
-from app.models.wiki_structure import Citation, Reference, Section, Article
+from app.models.wiki_structure import ArticleAnalytics
+from app.models.compact_article import CompactArticle, CompactArticleBuilder
+from app.services import content_source
+from app.services.metrics import timed
+
+MOST_CITED_LIMIT = 10  # Number of top citation targets kept in the article analytics
 
 
 # --- article_fetcher
 def article_fetcher(title, lang):
-    url = f"https://{lang}.wikipedia.org/w/api.php"  # Base URL for MediaWiki Action API
+    """
+    Fetch and parse an article into the pydantic Article model.
+    Cached code paths should use fetch_compact_article and convert at the API boundary.
+    """
+    return fetch_compact_article(title, lang).to_article()
+
+
+def fetch_compact_article(title, lang) -> CompactArticle:
+    url = content_source.api_url(lang)  # Base URL for MediaWiki Action API
     params = {
         "action": "parse",
         "page": title,
@@ -17,48 +31,47 @@ def article_fetcher(title, lang):
         "disableeditsection": True,
         "disabletoc": True
     }
-    r = requests.get(url, params=params, headers={"User-Agent": "SymmetryFetcher/1.0"})
+    with timed("upstream_fetch"):
+        r = requests.get(url, params=params, headers={"User-Agent": "SymmetryFetcher/1.0"})
     r.raise_for_status()
     data = r.json()
 
     html = data.get("parse", {}).get("text", {}).get("*", "")
+    return parse_compact_article(html, title, lang, revision_id=data.get("parse", {}).get("revid"))
+
+
+@timed("html_parse")
+def parse_compact_article(html, title, lang, revision_id=None) -> CompactArticle:
+    """
+    Parse the HTML returned by action=parse into a CompactArticle, collecting the
+    citation and reference analytics in the same pass.
+    """
     soup = BeautifulSoup(html, "html.parser")
 
-    sections = []
+    builder = CompactArticleBuilder(title, lang, source="action_api", revision_id=revision_id)
     current_title = "Lead section"
-    rich_current = ""
-    clean_current = ""
-    current_citations = []  # List of Citation objects (internal links)
-    current_citation_positions = [] # List of strings for positional data
-    current_references = [] # List of Reference objects (in-text reference markers)
+
+    # Running aggregates for ArticleAnalytics, updated as the page is walked
+    citation_counts = Counter()  # Citation URL -> number of links to it
+    url_to_title = {}  # Citation URL -> label of the latest link to it
+    total_words = 0
+
+    def end_section():
+        # Only citations of sections that have content are kept, so count them on commit
+        for label, hyperlink in builder.end_section(current_title):
+            citation_counts[hyperlink] += 1
+            url_to_title[hyperlink] = label
 
     content_tags = soup.find_all(["h2", "h3", "p"])
 
     # --- Step 1: Parse Sections and Capture Citations/References/Positions ---
     for tag in content_tags:
         if tag.name in ["h2", "h3"]:
-            # Save previous section
-            if clean_current.strip():
-                section = Section(
-                    title=current_title,
-                    raw_content=rich_current.strip(),
-                    clean_content=clean_current.strip(),
-                    citations=current_citations,
-                    citation_position=current_citation_positions
-                )
-                sections.append(section)
-
-            # Start a new section
+            # Save previous section and start a new one
+            end_section()
             current_title = tag.get_text(strip=True)
-            rich_current = ""
-            clean_current = ""
-            current_citations = []
-            current_citation_positions = []
-            current_references = [] # Clear references for the new section
 
         elif tag.name == "p":
-            char_count = len(clean_current.strip()) # Starting position for elements in this paragraph
-            
             # The paragraph content must be parsed element by element
             for element in tag.contents:
                 
@@ -67,73 +80,41 @@ def article_fetcher(title, lang):
                     
                     # A. Handle Reference Markers (e.g., [1])
                     if element.name == "sup" and element.has_attr("class") and "reference" in element["class"]:
-                        label = element.get_text(strip=True)
-                        link = element.find("a", href=True)
-                        ref_id = link["href"].replace("#", "") if link else None
-                        
-                        # Store the in-text reference marker data
-                        current_references.append(Reference(label=label, id=ref_id))
-                        
-                        # Add the label to rich_current but NOT clean_content
-                        rich_current += f" {label}"
+                        # The label goes into the raw content but NOT the clean content
+                        builder.add_marker(element.get_text(strip=True))
                         continue 
 
                     # B. Handle Internal Hyperlinks (Citations in this model structure)
                     elif element.name == "a" and element.get('href', '').startswith('/wiki/'):
                         text = element.get_text(strip=True)
                         
-                        # Determine position before appending the text to clean_content
-                        # Add 1 space if char_count > 0, otherwise start at 0
-                        position = char_count + 1 if char_count > 0 else char_count
-                        
-                        # Store the link data (Citation object)
+                        # Store the link text along with its offsets and target URL
                         hyperlink = f"https://{lang}.wikipedia.org{element.get('href', '')}"
-                        current_citations.append(Citation(label=text, url=hyperlink))
-                        
-                        # Store positional data
-                        current_citation_positions.append(f"{text}:{position}")
-                        
-                        # Append text to content strings
-                        clean_current += " " + text
-                        rich_current += f" ({hyperlink}, {len(text.split())})" # Rich content gets link details
-                        rich_current += " " + text
-                        
-                        # Update char_count based on what was added to clean_content
-                        char_count += (1 + len(text))
+                        builder.add_citation(text, hyperlink)
+                        total_words += len(text.split())
                         continue
                         
                     # C. Handle Other Elements (like <b>, <i>, etc.)
                     else:
                         text = element.get_text(strip=True)
                         if text:
-                            clean_current += " " + text
-                            rich_current += " " + text
-                            char_count += (1 + len(text))
+                            builder.add_text(text)
+                            total_words += len(text.split())
 
                 # Element is a NavigableString (simple text)
                 else:
                     text = str(element).strip()
                     if text:
-                        clean_current += " " + text
-                        rich_current += " " + text
-                        char_count += (1 + len(text))
+                        builder.add_text(text)
+                        total_words += len(text.split())
 
 
     # Append last section if any
-    if clean_current.strip():
-        section = Section(
-            title=current_title,
-            raw_content=rich_current.strip(),
-            clean_content=clean_current.strip(),
-            citations=current_citations,
-            citation_position=current_citation_positions
-        )
-        sections.append(section)
+    end_section()
 
     # --- Step 2: Parse Full Reference Data ---
-    full_references_data = []
-    reference_map = {} 
     references_list = soup.select("ol.references > li")
+    references_with_urls = 0
 
     for ref in references_list:
         ref_id = ref.get("id", None)
@@ -148,20 +129,31 @@ def article_fetcher(title, lang):
         # Try to find the external URL
         link_tag = ref.find("a", href=lambda href: href and href.startswith("http"))
         link = link_tag["href"] if link_tag else None
+        if link:
+            references_with_urls += 1
         
-        # The Reference model for the Article list will store the full citation text
-        reference = Reference(label=ref_text, id=ref_id, url=link)
-        full_references_data.append(reference)
-        if ref_id:
-            reference_map[ref_id] = reference # Store map for optional future use
-
-
-    article = Article(
-        title=title,
-        lang=lang,
-        source="action_api",
-        sections=sections,
-        references=full_references_data
+        # The reference list stores the full citation text
+        builder.add_reference(ref_text, ref_id, link)
+
+    article = builder.build()
+
+    # --- Step 3: Finalize the analytics gathered during the passes above ---
+    # heapq.nlargest keeps the same tie order as a stable sort, without sorting every URL
+    most_cited = [
+        {"title": url_to_title.get(url, "Unknown"), "count": count}
+        for url, count in heapq.nlargest(MOST_CITED_LIMIT, citation_counts.items(), key=lambda x: x[1])
+    ]
+    total_references = len(article.references)
+    reference_density = (total_references / total_words * 1000) if total_words > 0 else 0
+
+    article.analytics = ArticleAnalytics(
+        total_citations=article.total_citations,
+        unique_targets=len(citation_counts),
+        most_cited_articles=most_cited,
+        total_references=total_references,
+        references_with_urls=references_with_urls,
+        total_words=total_words,
+        reference_density=round(reference_density, 2)
     )
     return article
 
@@ -0,0 +1,223 @@
+import threading
+from collections import OrderedDict, defaultdict, deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.ai.semantic_comparison import encode_sentences
+from app.services.metrics import counter
+
+"""
+Revision-aware store of comparisons, for re-checking the same article pairs as they change
+(e.g. a bulk job re-submitted to watch a list of articles, see app/services/jobs.py).
+
+For each compared pair it keeps the revision ids, the sentences, their normalized embeddings and,
+for every sentence, the best similarity with the other article (and which sentence it was).
+Re-comparing a pair then costs:
+
+- nothing but a threshold check when neither revision changed (not even segmentation);
+- after an edit, encoding only the added or changed sentences (sentences are matched to the
+  previous version by their content) and recomputing only the affected similarity maxima:
+  kept sentences are compared with the added sentences of the other article, and compared
+  with the whole other article again only when their best match was removed.
+
+A sentence is missing (or extra) when its best cosine similarity with the other article is
+below the threshold, as in semantic_compare.
+"""
+
+MAX_COMPARISONS = 64  # Stored pairs, least recently used dropped first
+
+INCREMENTAL_COMPARISONS = counter("symmetry_incremental_comparisons_total",
+                                  "Stored comparisons re-checked, by result (new, unchanged, updated).",
+                                  ["result"])
+INCREMENTAL_SENTENCES = counter("symmetry_incremental_sentences_total",
+                                "Sentences of re-checked comparisons, by whether they were encoded or reused.",
+                                ["kind"])
+
+Revisions = Tuple[Optional[int], Optional[int]]
+
+
+class StoredComparison:
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.revisions: Revisions = (None, None)
+        self.source_sentences: List[str] = []
+        self.target_sentences: List[str] = []
+        self.source_embeddings = np.zeros((0, 0), dtype=np.float32)
+        self.target_embeddings = np.zeros((0, 0), dtype=np.float32)
+        # Best similarity of each sentence with the other article, and the index of that sentence
+        self.source_max = np.zeros(0, dtype=np.float32)
+        self.source_best = np.zeros(0, dtype=np.int64)
+        self.target_max = np.zeros(0, dtype=np.float32)
+        self.target_best = np.zeros(0, dtype=np.int64)
+
+    def differences(self, sim_threshold: float) -> Tuple[List[int], List[int]]:
+        """(missing_info_index, extra_info_index) at a threshold."""
+        # Fragments too short to be encoded have zero embeddings and are never reported
+        return (np.flatnonzero((self.source_max < sim_threshold) & self.source_embeddings.any(axis=1)).tolist(),
+                np.flatnonzero((self.target_max < sim_threshold) & self.target_embeddings.any(axis=1)).tolist())
+
+
+def match_sentences(previous: List[str], current: List[str]) -> np.ndarray:
+    """For each current sentence, the index of the same sentence in the previous version, or -1."""
+    positions: Dict[str, deque] = defaultdict(deque)
+    for index, sentence in enumerate(previous):
+        positions[sentence].append(index)
+    return np.array([positions[sentence].popleft() if positions.get(sentence) else -1 for sentence in current],
+                    dtype=np.int64)
+
+
+def _normalize(embeddings) -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / np.maximum(norms, 1e-12)
+
+
+def _best(similarities: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    best = similarities.argmax(axis=1)
+    return similarities[np.arange(similarities.shape[0]), best], best
+
+
+class ComparisonStore:
+    def __init__(self, max_comparisons: int = MAX_COMPARISONS,
+                 encode: Callable[[str, List[str]], np.ndarray] = encode_sentences):
+        self.max_comparisons = max_comparisons
+        self.encode = encode
+        self._comparisons: "OrderedDict[str, StoredComparison]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def unchanged(self, key: str, model_name: str, revisions: Revisions) -> Optional[StoredComparison]:
+        """The stored comparison of a pair if neither article changed since, else None."""
+        with self._lock:
+            stored = self._comparisons.get(key)
+            if (stored is None or stored.model_name != model_name or None in revisions
+                    or stored.revisions != revisions):
+                return None
+            self._comparisons.move_to_end(key)
+            return stored
+
+    def compare(self, key: str, model_name: str, revisions: Revisions, source_sentences: List[str],
+                target_sentences: List[str], sim_threshold: float) -> Tuple[List[int], List[int]]:
+        """
+        Compare two sentence lists, reusing what was computed for the previous revisions of the
+        pair stored under 'key'. Returns (missing_info_index, extra_info_index).
+        """
+        if sim_threshold is None:
+            sim_threshold = 0.75
+        stored = self.unchanged(key, model_name, revisions)
+        if stored is not None and stored.source_sentences == source_sentences \
+                and stored.target_sentences == target_sentences:
+            INCREMENTAL_COMPARISONS.inc(result="unchanged")
+            return stored.differences(sim_threshold)
+
+        with self._lock:
+            previous = self._comparisons.get(key)
+        if previous is None or previous.model_name != model_name:
+            previous = StoredComparison(model_name)
+            INCREMENTAL_COMPARISONS.inc(result="new")
+        else:
+            INCREMENTAL_COMPARISONS.inc(result="updated")
+
+        updated = self._update(previous, source_sentences, target_sentences)
+        updated.revisions = revisions
+        with self._lock:
+            self._comparisons[key] = updated
+            self._comparisons.move_to_end(key)
+            while len(self._comparisons) > self.max_comparisons:
+                self._comparisons.popitem(last=False)
+        return updated.differences(sim_threshold)
+
+    def _embed(self, model_name: str, previous: np.ndarray, matches: np.ndarray, sentences: List[str]) -> np.ndarray:
+        added = np.flatnonzero(matches < 0)
+        INCREMENTAL_SENTENCES.inc(len(added), kind="encoded")
+        INCREMENTAL_SENTENCES.inc(len(sentences) - len(added), kind="reused")
+        new = _normalize(self.encode(model_name, [sentences[i] for i in added])) if len(added) else None
+        dimension = new.shape[1] if new is not None else previous.shape[1]
+        embeddings = np.empty((len(sentences), dimension), dtype=np.float32)
+        kept = np.flatnonzero(matches >= 0)
+        if len(kept):
+            embeddings[kept] = previous[matches[kept]]
+        if new is not None:
+            embeddings[added] = new
+        return embeddings
+
+    def _update(self, previous: StoredComparison, source_sentences: List[str],
+                target_sentences: List[str]) -> StoredComparison:
+        source_matches = match_sentences(previous.source_sentences, source_sentences)
+        target_matches = match_sentences(previous.target_sentences, target_sentences)
+
+        updated = StoredComparison(previous.model_name)
+        updated.source_sentences = list(source_sentences)
+        updated.target_sentences = list(target_sentences)
+        updated.source_embeddings = self._embed(previous.model_name, previous.source_embeddings,
+                                                source_matches, source_sentences)
+        updated.target_embeddings = self._embed(previous.model_name, previous.target_embeddings,
+                                                target_matches, target_sentences)
+
+        updated.source_max, updated.source_best = _update_maxima(
+            previous.source_max, previous.source_best, source_matches, target_matches,
+            len(previous.target_sentences), updated.source_embeddings, updated.target_embeddings,
+        )
+        updated.target_max, updated.target_best = _update_maxima(
+            previous.target_max, previous.target_best, target_matches, source_matches,
+            len(previous.source_sentences), updated.target_embeddings, updated.source_embeddings,
+        )
+        return updated
+
+
+def _update_maxima(previous_max: np.ndarray, previous_best: np.ndarray, matches: np.ndarray,
+                   other_matches: np.ndarray, previous_other_count: int, embeddings: np.ndarray,
+                   other_embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The best similarity of each sentence with the other article, and the other sentence it is
+    with, after an update. 'matches' maps the current sentences (and 'other_matches' the other
+    article's) to the previous ones.
+    """
+    count = len(matches)
+    best_max = np.full(count, -np.inf, dtype=np.float32)
+    best = np.full(count, -1, dtype=np.int64)
+
+    # Where each previous sentence of the other article is now, -1 if it was removed or changed
+    other_now = np.full(previous_other_count, -1, dtype=np.int64)
+    kept_other = np.flatnonzero(other_matches >= 0)
+    other_now[other_matches[kept_other]] = kept_other
+
+    kept = np.flatnonzero(matches >= 0)
+    previous_best_now = np.full(len(kept), -1, dtype=np.int64)
+    has_best = previous_best[matches[kept]] >= 0
+    previous_best_now[has_best] = other_now[previous_best[matches[kept]][has_best]]
+
+    # Kept sentences whose best match is still there: compare with the added sentences only
+    still = kept[previous_best_now >= 0]
+    best_max[still] = previous_max[matches[still]]
+    best[still] = previous_best_now[previous_best_now >= 0]
+    added_other = np.flatnonzero(other_matches < 0)
+    if len(still) and len(added_other):
+        candidate_max, candidate = _best(embeddings[still] @ other_embeddings[added_other].T)
+        better = candidate_max > best_max[still]
+        best_max[still[better]] = candidate_max[better]
+        best[still[better]] = added_other[candidate[better]]
+
+    # Added sentences, and kept ones whose best match was removed: compare with the whole article
+    full = np.concatenate([np.flatnonzero(matches < 0), kept[previous_best_now < 0]])
+    if len(full) and len(other_embeddings):
+        best_max[full], best[full] = _best(embeddings[full] @ other_embeddings.T)
+    return best_max, best
+
+
+# Instantiate global comparison store object
+_store = ComparisonStore()
+
+
+# For external use
+def configure(max_comparisons: int = MAX_COMPARISONS) -> None:
+    _store.max_comparisons = max_comparisons
+
+
+def unchanged(key: str, model_name: str, revisions: Revisions) -> Optional[StoredComparison]:
+    return _store.unchanged(key, model_name, revisions)
+
+
+def compare(key: str, model_name: str, revisions: Revisions, source_sentences: List[str],
+            target_sentences: List[str], sim_threshold: float) -> Tuple[List[int], List[int]]:
+    return _store.compare(key, model_name, revisions, source_sentences, target_sentences, sim_threshold)
@@ -0,0 +1,74 @@
+"""
+Content sources: where article content is fetched from.
+
+Every request for Wikipedia content (article text, parsed HTML, language validation) builds its
+URLs through the configured source, so the whole service can be pointed at something other than
+the live Wikipedia with one config switch (CONTENT_SOURCE):
+
+- "live": https://{lang}.wikipedia.org, the default
+- "fake": the local fake MediaWiki server (app/services/fake_mediawiki.py) serving recorded
+  fixtures, for load tests and benchmarks that must run offline and repeatably
+"""
+import abc
+
+LIVE = "live"
+FAKE = "fake"
+FAKE_MEDIAWIKI_URL = "http://127.0.0.1:8765"
+
+
+class ContentSource(abc.ABC):
+    name = ""
+
+    @abc.abstractmethod
+    def site_url(self, lang: str) -> str:
+        """The base URL of the wiki of a language, without a trailing slash."""
+
+    def api_url(self, lang: str) -> str:
+        return f"{self.site_url(lang)}/w/api.php"
+
+    def main_page_url(self, lang: str) -> str:
+        return f"{self.site_url(lang)}/wiki/Main_Page"
+
+
+class LiveWikipediaSource(ContentSource):
+    name = LIVE
+
+    def site_url(self, lang: str) -> str:
+        return f"https://{lang}.wikipedia.org"
+
+
+class FakeMediaWikiSource(ContentSource):
+    """The fake MediaWiki server, which serves each language under /{lang}."""
+
+    name = FAKE
+
+    def __init__(self, base_url: str = FAKE_MEDIAWIKI_URL):
+        self.base_url = base_url.rstrip("/")
+
+    def site_url(self, lang: str) -> str:
+        return f"{self.base_url}/{lang}"
+
+
+_source: ContentSource = LiveWikipediaSource()
+
+
+def configure(name: str, fake_url: str = FAKE_MEDIAWIKI_URL) -> None:
+    global _source
+    if name == LIVE:
+        _source = LiveWikipediaSource()
+    elif name == FAKE:
+        _source = FakeMediaWikiSource(fake_url)
+    else:
+        raise ValueError(f"Unknown content source '{name}', expected '{LIVE}' or '{FAKE}'.")
+
+
+def get_source() -> ContentSource:
+    return _source
+
+
+def api_url(lang: str) -> str:
+    return _source.api_url(lang)
+
+
+def main_page_url(lang: str) -> str:
+    return _source.main_page_url(lang)
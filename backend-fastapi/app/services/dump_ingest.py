@@ -0,0 +1,280 @@
+import argparse
+import bz2
+import gzip
+import heapq
+import json
+import logging
+import os
+import re
+import struct
+import tempfile
+import xml.etree.ElementTree as ET
+from typing import Dict, IO, Iterator, List, Optional, Set, Tuple
+
+from app.services.dump_store import RECORD, normalize_title
+from app.services.mediawiki import render_extract
+
+try:
+    import mwparserfromhell
+except ImportError:  # Only needed to ingest dumps, not to serve articles from the store
+    mwparserfromhell = None
+
+"""
+Ingestion CLI for the local dump store (see app/services/dump_store.py).
+
+Loads a Wikipedia XML dump (pages-articles, optionally bz2 or gzip compressed) of one language
+into the store. Language links are not part of the XML dump; pass the langlinks SQL dump of the
+same wiki to include them, optionally restricted to the languages you compare against:
+
+    python -m app.services.dump_ingest --store ./dumps --lang en \\
+        --dump enwiki-latest-pages-articles.xml.bz2 \\
+        --langlinks enwiki-latest-langlinks.sql.gz --link-languages fr,de,es
+
+Wikitext is rendered to plain text with mwparserfromhell, in the same format as the text served
+by the MediaWiki API. Running the CLI again replaces the language's store.
+
+Memory use does not grow with the size of the dump: pages are parsed one at a time, language
+links are read alongside them (both dumps are ordered by page id), and the title index is sorted
+in runs of RUN_ENTRIES titles spilled to temporary files, then merged.
+"""
+
+# Tags whose content is not part of the article prose
+_SKIPPED_TAGS = {"ref", "table", "gallery", "math", "references"}
+# Links into other namespaces (File:, Category:, interlanguage links, ...), unlike titles with a colon
+_NAMESPACED_LINK = re.compile(r"^:?[^\s:]+:\S")
+# One row of the langlinks table: (ll_from, 'll_lang', 'll_title')
+_LANGLINK_ROW = re.compile(r"\((\d+),'((?:[^'\\]|\\.)*)','((?:[^'\\]|\\.)*)'\)")
+_SQL_ESCAPE = re.compile(r"\\(.)")
+PROGRESS_INTERVAL = 100000  # Pages between progress messages
+RUN_ENTRIES = 1000000  # Index entries sorted in memory before being spilled to a run file
+# Index entry of a run file, followed by the title: title length, data offset, data length
+_RUN_RECORD = struct.Struct("<IQI")
+
+
+def open_dump(path: str) -> IO[bytes]:
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_pages(file: IO[bytes]) -> Iterator[Dict]:
+    """The article namespace pages of an XML dump: {"id", "title", "redirect", "revision_id", "text"}."""
+    root = None
+    for event, element in ET.iterparse(file, events=("start", "end")):
+        if root is None:
+            root = element
+        if event != "end" or _local_name(element.tag) != "page":
+            continue
+        if element.findtext("{*}ns") == "0":
+            redirect = element.find("{*}redirect")
+            revision = element.find("{*}revision")
+            yield {
+                "id": int(element.findtext("{*}id")),
+                "title": element.findtext("{*}title"),
+                "redirect": redirect.get("title") if redirect is not None else None,
+                "revision_id": int(revision.findtext("{*}id")) if revision is not None else None,
+                "text": (revision.findtext("{*}text") if revision is not None else None) or "",
+            }
+        # Parsed pages are dropped, so memory use stays flat however large the dump is
+        element.clear()
+        root.clear()
+
+
+def iter_langlinks(path: str, languages: Optional[Set[str]] = None) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """
+    The (page id, {lang: title}) of a langlinks SQL dump, one page at a time in the order of the
+    dump (by page id), optionally for some languages only.
+    """
+    page, links = None, {}
+    with open_dump(path) as file:
+        for line in file:
+            if not line.startswith(b"INSERT INTO"):
+                continue
+            for page_id, lang, title in _LANGLINK_ROW.findall(line.decode("utf-8", errors="replace")):
+                page_id = int(page_id)
+                if page_id != page:
+                    if links:
+                        yield page, links
+                    page, links = page_id, {}
+                lang = _SQL_ESCAPE.sub(r"\1", lang)
+                if languages is not None and lang not in languages:
+                    continue
+                title = _SQL_ESCAPE.sub(r"\1", title)
+                if title:
+                    links[lang] = title
+    if links:
+        yield page, links
+
+
+class LanglinksReader:
+    """
+    Looks up the language links of pages in increasing id order, reading the langlinks dump
+    alongside, so only the links of the current page are held in memory.
+    """
+
+    def __init__(self, links: Iterator[Tuple[int, Dict[str, str]]]):
+        self._links = links
+        self._current: Optional[Tuple[int, Dict[str, str]]] = next(self._links, None)
+
+    def get(self, page_id: int) -> Dict[str, str]:
+        while self._current is not None and self._current[0] < page_id:
+            self._current = next(self._links, None)
+        if self._current is not None and self._current[0] == page_id:
+            return self._current[1]
+        return {}
+
+
+def _clean_wikicode(code) -> str:
+    for template in code.filter_templates(recursive=False):
+        code.remove(template)
+    for tag in code.filter_tags(recursive=False):
+        if str(tag.tag).strip().lower() in _SKIPPED_TAGS:
+            code.remove(tag)
+    for link in code.filter_wikilinks(recursive=False):
+        if _NAMESPACED_LINK.match(str(link.title).strip()):
+            code.remove(link)
+    text = re.sub(r"[ \t]+", " ", code.strip_code())
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def wikitext_to_text(wikitext: str) -> str:
+    """Render wikitext as plain text, formatted like the MediaWiki API's plain text extracts."""
+    extract = []
+    for section in mwparserfromhell.parse(wikitext).get_sections(flat=True, include_lead=True):
+        headings = section.filter_headings(recursive=False)
+        if headings and section.nodes and section.nodes[0] is headings[0]:
+            heading = headings[0]
+            section.remove(heading)
+            marks = "=" * heading.level
+            extract.append(f"\n\n{marks} {heading.title.strip_code().strip()} {marks}\n{_clean_wikicode(section)}")
+        else:
+            extract.append(_clean_wikicode(section))
+    return render_extract("".join(extract))
+
+
+class DumpStoreWriter:
+    """Writes the store files of one language. Files are swapped in atomically on close()."""
+
+    def __init__(self, directory: str, lang: str, run_entries: int = RUN_ENTRIES):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.base = os.path.join(directory, lang)
+        self.run_entries = run_entries
+        self._data = open(self.base + ".data.tmp", "wb")
+        self._offset = 0
+        self._entries: List[Tuple[bytes, int, int]] = []  # (title, data offset, data length)
+        self._runs: List[str] = []  # Sorted run files of entries spilled to disk
+
+    def add(self, document: Dict) -> None:
+        data = json.dumps(document, ensure_ascii=False).encode("utf-8")
+        self._data.write(data)
+        self._entries.append((normalize_title(document["title"]).encode("utf-8"), self._offset, len(data)))
+        self._offset += len(data)
+        if len(self._entries) >= self.run_entries:
+            self._spill()
+
+    def _spill(self) -> None:
+        self._entries.sort()
+        descriptor, path = tempfile.mkstemp(prefix=os.path.basename(self.base) + ".", suffix=".run",
+                                            dir=self.directory)
+        with open(descriptor, "wb") as run:
+            for title, data_offset, data_length in self._entries:
+                run.write(_RUN_RECORD.pack(len(title), data_offset, data_length))
+                run.write(title)
+        self._runs.append(path)
+        self._entries = []
+
+    @staticmethod
+    def _read_run(file: IO[bytes]) -> Iterator[Tuple[bytes, int, int]]:
+        while True:
+            header = file.read(_RUN_RECORD.size)
+            if not header:
+                return
+            title_length, data_offset, data_length = _RUN_RECORD.unpack(header)
+            yield file.read(title_length), data_offset, data_length
+
+    def close(self) -> int:
+        """Write the title index and replace the language's previous store. Returns the title count."""
+        self._data.close()
+        self._entries.sort()
+        runs = [open(path, "rb", buffering=1 << 20) for path in self._runs]
+        try:
+            title_offset = 0
+            count = 0  # Titles written, duplicates excluded
+            with open(self.base + ".titles.tmp", "wb") as titles, open(self.base + ".index.tmp", "wb") as index:
+                previous = None
+                # Entries are (title, data offset, ...), so equal titles come out in the order they were added
+                merged = heapq.merge(self._entries, *(self._read_run(run) for run in runs))
+                for title, data_offset, data_length in merged:
+                    if title == previous:
+                        continue  # Duplicate titles keep their first occurrence
+                    previous = title
+                    count += 1
+                    titles.write(title)
+                    index.write(RECORD.pack(title_offset, len(title), data_offset, data_length))
+                    title_offset += len(title)
+        finally:
+            for run in runs:
+                run.close()
+            for path in self._runs:
+                os.remove(path)
+            self._runs = []
+            self._entries = []
+        for suffix in (".data", ".titles", ".index"):
+            os.replace(self.base + suffix + ".tmp", self.base + suffix)
+        return count
+
+
+def ingest(store: str, lang: str, dump: str, langlinks: Optional[str] = None,
+           link_languages: Optional[Set[str]] = None) -> int:
+    """Load an XML dump into the store. Returns the number of titles stored (pages and redirects)."""
+    if mwparserfromhell is None:
+        raise RuntimeError("Ingesting dumps requires mwparserfromhell (pip install mwparserfromhell).")
+
+    links = LanglinksReader(iter_langlinks(langlinks, link_languages) if langlinks else iter(()))
+
+    writer = DumpStoreWriter(store, lang)
+    count = 0
+    with open_dump(dump) as file:
+        for page in iter_pages(file):
+            if page["redirect"]:
+                writer.add({"title": page["title"], "redirect": page["redirect"]})
+            else:
+                writer.add({
+                    "title": page["title"],
+                    "text": wikitext_to_text(page["text"]),
+                    "langlinks": links.get(page["id"]),
+                    "lastrevid": page["revision_id"],
+                })
+            count += 1
+            if count % PROGRESS_INTERVAL == 0:
+                logging.info("Ingested %d pages", count)
+    stored = writer.close()
+    logging.info("Ingested %d pages of '%s' into %s: %d titles (%d duplicates dropped)",
+                 count, lang, store, stored, count - stored)
+    return stored
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Load a Wikipedia XML dump into the local article store.")
+    parser.add_argument("--store", required=True, help="Store directory (DUMP_STORE_DIR)")
+    parser.add_argument("--lang", required=True, help="Language code of the dump, e.g. 'en'")
+    parser.add_argument("--dump", required=True, help="pages-articles XML dump (.xml, .xml.bz2 or .xml.gz)")
+    parser.add_argument("--langlinks", help="langlinks SQL dump of the same wiki (.sql or .sql.gz)")
+    parser.add_argument("--link-languages", help="Comma-separated languages to keep language links for")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    link_languages = set(args.link_languages.split(",")) if args.link_languages else None
+    ingest(args.store, args.lang, args.dump, args.langlinks, link_languages)
+
+
+if __name__ == "__main__":
+    main()
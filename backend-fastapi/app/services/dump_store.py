@@ -0,0 +1,151 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Optional
+
+from app.services.metrics import counter
+
+"""
+Local, read-only article store built from Wikipedia dumps (see app/services/dump_ingest.py).
+
+When a store directory is configured, mediawiki.query_pages() looks articles up here before
+going to the network, so articles present in the store need no request to Wikipedia at all.
+
+Each language is stored in three files, all memory-mapped:
+
+    <lang>.data    the articles, one JSON document each ({"title", "text", "langlinks", "lastrevid"},
+                   or {"title", "redirect"} for redirects), concatenated
+    <lang>.titles  the UTF-8 titles, concatenated in sorted order
+    <lang>.index   one fixed-size record per title, in the same order:
+                   (title offset, title length, data offset, data length)
+
+A lookup is a binary search over the index records, comparing titles straight from the mapped
+file, followed by one read of the article's JSON, so nothing but the page cache is held in memory
+no matter how large the store is.
+"""
+
+RECORD = struct.Struct("<QIQI")  # Title offset, title length, data offset, data length
+MAX_REDIRECTS = 5
+
+DUMP_STORE_LOOKUPS = counter(
+    "symmetry_dump_store_lookups_total", "Article lookups in the local dump store, by result.", ["result"]
+)
+
+
+def normalize_title(title: str) -> str:
+    """Normalize a title like MediaWiki does: spaces for underscores and an uppercase first letter."""
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+def _map(path: str) -> Optional[mmap.mmap]:
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None  # Empty files cannot be mapped
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LanguageStore:
+    """The store files of one language."""
+
+    def __init__(self, directory: str, lang: str):
+        base = os.path.join(directory, lang)
+        self.data = _map(base + ".data")
+        self.titles = _map(base + ".titles")
+        self.index = _map(base + ".index")
+        self.count = len(self.index) // RECORD.size if self.index is not None else 0
+
+    def find(self, title: str) -> Optional[bytes]:
+        """The JSON document stored for a normalized title, or None."""
+        key = title.encode("utf-8")
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            title_offset, title_length, data_offset, data_length = RECORD.unpack_from(self.index, middle * RECORD.size)
+            candidate = self.titles[title_offset:title_offset + title_length]
+            if candidate < key:
+                low = middle + 1
+            elif candidate > key:
+                high = middle
+            else:
+                return self.data[data_offset:data_offset + data_length]
+        return None
+
+    def close(self) -> None:
+        for mapped in (self.data, self.titles, self.index):
+            if mapped is not None:
+                mapped.close()
+
+
+class DumpStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._languages: Dict[str, Optional[LanguageStore]] = {}
+        self._lock = threading.Lock()
+
+    def _language(self, lang: str) -> Optional[LanguageStore]:
+        # Languages are opened on first use; languages without store files are remembered as None
+        store = self._languages.get(lang)
+        if store is None and lang not in self._languages:
+            with self._lock:
+                if lang not in self._languages:
+                    index_path = os.path.join(self.directory, lang + ".index")
+                    self._languages[lang] = LanguageStore(self.directory, lang) if os.path.exists(index_path) else None
+                store = self._languages[lang]
+        return store
+
+    def has_language(self, lang: str) -> bool:
+        return self._language(lang) is not None
+
+    def get(self, lang: str, title: str) -> Optional[Dict]:
+        """
+        The article stored for (lang, title), following redirects, in the format of
+        mediawiki.query_pages(), or None when the store does not have it.
+        """
+        store = self._language(lang)
+        if store is None:
+            return None
+        title = normalize_title(title)
+        for _ in range(MAX_REDIRECTS + 1):
+            document = store.find(title)
+            if document is None:
+                return None
+            page = json.loads(document)
+            if "redirect" not in page:
+                return page
+            title = normalize_title(page["redirect"])
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            for store in self._languages.values():
+                if store is not None:
+                    store.close()
+            self._languages = {}
+
+
+_store: Optional[DumpStore] = None
+
+
+def configure(directory: Optional[str]) -> None:
+    """Use the store in 'directory', or no store when it is empty."""
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = DumpStore(directory) if directory else None
+
+
+def has_language(lang: str) -> bool:
+    """Whether the configured store has articles in 'lang'. False without a store."""
+    return _store is not None and _store.has_language(lang)
+
+
+def lookup(lang: str, title: str) -> Optional[Dict]:
+    """Look an article up in the configured store. Returns None without a store."""
+    if _store is None:
+        return None
+    page = _store.get(lang, title)
+    DUMP_STORE_LOOKUPS.inc(result="hit" if page is not None else "miss")
+    return page
@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+from typing import Dict, List, Optional
+from urllib.parse import quote
+
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse, Response
+
+"""
+A small fake MediaWiki server for load tests and benchmarks.
+
+It answers the two Action API requests the service makes, action=parse (rendered HTML) and
+action=query (plain text extracts, language links and revision ids), from recorded fixtures,
+after a configurable latency. Each language is served under /{lang}, so with CONTENT_SOURCE=fake
+and FAKE_MEDIAWIKI_URL=http://127.0.0.1:8765 the service requests
+http://127.0.0.1:8765/en/w/api.php instead of https://en.wikipedia.org/w/api.php.
+
+Fixtures are JSON files, one per article, at <fixtures>/<lang>/<quoted title>.json:
+
+    {"title": ..., "revid": ..., "html": <action=parse HTML>,
+     "extract": <plain text extract with wiki section headings>, "langlinks": {lang: title}}
+
+Record them from the live Wikipedia, then serve them:
+
+    python -m app.services.fake_mediawiki record --fixtures ./fixtures --lang en --title "Cat" --with-languages fr,de
+    python -m app.services.fake_mediawiki serve --fixtures ./fixtures --port 8765 --latency-ms 80 --jitter-ms 20
+"""
+
+USER_AGENT = "Symmetry/2.0 (contact@grey-box.ca)"
+
+
+def fixture_path(directory: str, lang: str, title: str) -> str:
+    return os.path.join(directory, lang, quote(title, safe="") + ".json")
+
+
+def write_fixture(directory: str, lang: str, title: str, html: str, extract: str,
+                  langlinks: Dict[str, str], revid: int) -> None:
+    os.makedirs(os.path.join(directory, lang), exist_ok=True)
+    fixture = {"title": title, "revid": revid, "html": html, "extract": extract, "langlinks": langlinks}
+    with open(fixture_path(directory, lang, title), "w", encoding="utf-8") as file:
+        json.dump(fixture, file, ensure_ascii=False)
+
+
+def _normalize(title: str) -> str:
+    title = " ".join(title.replace("_", " ").split())
+    return title[:1].upper() + title[1:]
+
+
+class FixtureStore:
+    """The fixtures of a directory, read once and kept in memory."""
+
+    def __init__(self, directory: str):
+        self.pages: Dict[str, Dict[str, Dict]] = {}  # lang -> title -> fixture
+        if not os.path.isdir(directory):
+            return
+        for lang in os.listdir(directory):
+            language_dir = os.path.join(directory, lang)
+            if not os.path.isdir(language_dir):
+                continue
+            pages = self.pages.setdefault(lang, {})
+            for name in os.listdir(language_dir):
+                if name.endswith(".json"):
+                    with open(os.path.join(language_dir, name), encoding="utf-8") as file:
+                        fixture = json.load(file)
+                    pages[fixture["title"]] = fixture
+
+    def get(self, lang: str, title: str) -> Optional[Dict]:
+        return self.pages.get(lang, {}).get(_normalize(title))
+
+
+def _parse_response(store: FixtureStore, lang: str, params) -> Dict:
+    fixture = store.get(lang, params.get("page", ""))
+    if fixture is None:
+        return {"error": {"code": "missingtitle", "info": "The page you specified doesn't exist."}}
+    return {"parse": {"title": fixture["title"], "revid": fixture["revid"], "text": {"*": fixture["html"]}}}
+
+
+def _query_response(store: FixtureStore, lang: str, params) -> Dict:
+    pages: List[Dict] = []
+    normalized = []
+    for title in params.get("titles", "").split("|"):
+        if not title:
+            continue
+        if _normalize(title) != title:
+            normalized.append({"from": title, "to": _normalize(title)})
+        fixture = store.get(lang, title)
+        if fixture is None:
+            pages.append({"title": _normalize(title), "missing": True})
+            continue
+        pages.append({
+            "title": fixture["title"],
+            "lastrevid": fixture["revid"],
+            "extract": fixture["extract"],
+            "langlinks": [{"lang": link_lang, "title": link_title}
+                          for link_lang, link_title in fixture["langlinks"].items()],
+        })
+    query: Dict = {"pages": pages}
+    if normalized:
+        query["normalized"] = normalized
+    return {"batchcomplete": True, "query": query}
+
+
+def create_app(fixtures: str, latency: float = 0.0, jitter: float = 0.0) -> FastAPI:
+    """
+    The fake server as an ASGI app. Every response is delayed by 'latency' seconds,
+    plus a uniformly random amount up to 'jitter' seconds.
+    """
+    store = FixtureStore(fixtures)
+    app = FastAPI(title="Fake MediaWiki")
+
+    async def delay() -> None:
+        if latency or jitter:
+            await asyncio.sleep(latency + random.uniform(0, jitter))
+
+    @app.get("/{lang}/w/api.php")
+    async def api(lang: str, request: Request):
+        await delay()
+        params = request.query_params
+        if lang not in store.pages:
+            return Response(status_code=404)
+        action = params.get("action")
+        if action == "parse":
+            return JSONResponse(_parse_response(store, lang, params))
+        if action == "query":
+            return JSONResponse(_query_response(store, lang, params))
+        return JSONResponse({"error": {"code": "badvalue", "info": f"Unsupported action '{action}'."}})
+
+    @app.get("/{lang}/wiki/Main_Page")
+    async def main_page(lang: str):
+        await delay()
+        return Response(status_code=200 if lang in store.pages else 404)
+
+    return app
+
+
+def record_fixture(directory: str, lang: str, title: str, session=None) -> Optional[Dict]:
+    """Record a fixture from the live Wikipedia. Returns the fixture, or None if the page is missing."""
+    import requests
+
+    session = session or requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    url = f"https://{lang}.wikipedia.org/w/api.php"
+    query = session.get(url, params={
+        "action": "query", "format": "json", "formatversion": 2, "prop": "extracts|langlinks|info",
+        "explaintext": 1, "exsectionformat": "wiki", "lllimit": "max", "redirects": 1, "titles": title,
+    }, timeout=30)
+    query.raise_for_status()
+    page = query.json()["query"]["pages"][0]
+    if page.get("missing"):
+        return None
+    parse = session.get(url, params={
+        "action": "parse", "page": page["title"], "prop": "text", "format": "json",
+        "disableeditsection": True, "disabletoc": True,
+    }, timeout=30)
+    parse.raise_for_status()
+    langlinks = {link["lang"]: link["title"] for link in page.get("langlinks", [])}
+    write_fixture(directory, lang, page["title"], parse.json()["parse"]["text"]["*"],
+                  page.get("extract", ""), langlinks, page["lastrevid"])
+    return {"title": page["title"], "langlinks": langlinks}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Fake MediaWiki server serving recorded fixtures.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serve the fixtures of a directory")
+    serve.add_argument("--fixtures", required=True)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency-ms", type=float, default=0.0)
+    serve.add_argument("--jitter-ms", type=float, default=0.0)
+
+    record = commands.add_parser("record", help="Record fixtures from the live Wikipedia")
+    record.add_argument("--fixtures", required=True)
+    record.add_argument("--lang", required=True)
+    record.add_argument("--title", action="append", required=True)
+    record.add_argument("--with-languages", help="Also record the articles in these comma-separated languages")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        import uvicorn
+
+        app = create_app(args.fixtures, args.latency_ms / 1000, args.jitter_ms / 1000)
+        uvicorn.run(app, host=args.host, port=args.port)
+        return
+
+    languages = args.with_languages.split(",") if args.with_languages else []
+    for title in args.title:
+        recorded = record_fixture(args.fixtures, args.lang, title)
+        if recorded is None:
+            print(f"{args.lang}: '{title}' not found")
+            continue
+        print(f"{args.lang}: recorded '{recorded['title']}'")
+        for lang in languages:
+            if lang in recorded["langlinks"] and record_fixture(args.fixtures, lang, recorded["langlinks"][lang]):
+                print(f"{lang}: recorded '{recorded['langlinks'][lang]}'")
+
+
+if __name__ == "__main__":
+    main()
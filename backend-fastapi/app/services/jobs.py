@@ -0,0 +1,436 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import uuid
+from time import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from app.ai.semantic_comparison import preprocess_input
+from app.services import comparison_store
+from app.services import prefork
+from app.services.mediawiki import query_page
+from app.services.metrics import counter, gauge
+
+"""
+Bulk comparison jobs.
+
+A job is a list of comparison specs (title, source language, target language, model, threshold).
+Jobs and their items are stored in a local SQLite database, so a job survives restarts of the
+server: on start, every item that has not finished yet is queued again.
+
+Several processes may share the database (the workers of app/services/prefork.py). A runner
+claims items before processing them, in a single UPDATE that marks them running and records
+the claiming process as their owner (its pid and start time, as pids are reused), so an item is
+never taken by two processes. Only one process resumes the unfinished items at startup, taking
+back those of owners that are gone; so does a worker restarted after another one died.
+
+Items are processed by a pipeline of worker threads, one stage per resource they wait on:
+
+    fetch (several threads, network) -> segment (spaCy, CPU) -> encode and compare (model, CPU)
+
+Stages are connected by bounded queues, so while one item is being encoded the next ones are
+already being segmented and fetched, and a slow stage holds back the ones before it instead of
+letting fetched articles pile up in memory.
+
+Comparisons go through the revision-aware store of app/services/comparison_store.py: when a job
+re-checks a pair whose articles did not change since it was last compared, neither segmentation
+nor encoding runs again, and after an edit only the changed sentences are encoded.
+"""
+
+DATABASE = "symmetry_jobs.sqlite3"
+FETCH_WORKERS = 4  # Articles are fetched in parallel, the CPU-bound stages run one item at a time
+STAGE_QUEUE_SIZE = 8  # Items held between two stages
+RESULTS_PAGE_SIZE = 100  # Rows read at once when streaming results
+
+# Item and job statuses (items are pending, running once claimed by a runner, then done or failed)
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+RUNNING = "running"
+COMPLETED = "completed"
+
+QUEUE_DEPTH = gauge("symmetry_queue_depth", "Items waiting in each worker queue.", ["queue"])
+JOB_ITEMS = counter("symmetry_job_items_total", "Bulk comparison job items finished, by status.", ["status"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    idx INTEGER NOT NULL,
+    spec TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+CREATE INDEX IF NOT EXISTS job_items_status ON job_items (status);
+"""
+
+
+class JobStore:
+    """The job table, shared by the API and the worker threads."""
+
+    def __init__(self, path: str = DATABASE):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = [row["name"] for row in self._conn.execute("PRAGMA table_info(job_items)")]
+            if "owner" not in columns:  # Databases created before items were claimed
+                self._conn.execute("ALTER TABLE job_items ADD COLUMN owner TEXT")
+
+    def create_job(self, specs: List[Dict]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, RUNNING, len(specs), now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_items (job_id, idx, spec, status) VALUES (?, ?, ?, ?)",
+                [(job_id, index, json.dumps(spec), PENDING) for index, spec in enumerate(specs)],
+            )
+        return job_id
+
+    def claim_items(self, owner: str, job_id: Optional[str] = None) -> List[tuple]:
+        """
+        Claim the pending items (of one job, or of all jobs) for 'owner' and return their
+        (job id, index, spec), in submission order. Items claimed by another owner are left out.
+        """
+        claim = "UPDATE job_items SET status = ?, owner = ? WHERE status = ?"
+        query = ("SELECT job_items.job_id, idx, spec FROM job_items JOIN jobs ON jobs.id = job_items.job_id "
+                 "WHERE job_items.status = ? AND owner = ?")
+        params: tuple = ()
+        if job_id is not None:
+            claim += " AND job_id = ?"
+            query += " AND job_items.job_id = ?"
+            params = (job_id,)
+        with self._lock, self._conn:
+            # A single statement: SQLite runs it atomically, also against other processes
+            self._conn.execute(claim, (RUNNING, owner, PENDING) + params)
+            rows = self._conn.execute(query + " ORDER BY jobs.created_at, idx", (RUNNING, owner) + params).fetchall()
+        return [(row["job_id"], row["idx"], json.loads(row["spec"])) for row in rows]
+
+    def release_items(self, keep_owners: Iterable[str]) -> int:
+        """Make the running items of every owner but 'keep_owners' pending again; returns how many."""
+        keep_owners = list(keep_owners)
+        placeholders = ", ".join("?" * len(keep_owners))
+        with self._lock, self._conn:
+            return self._conn.execute(
+                f"UPDATE job_items SET status = ?, owner = NULL WHERE status = ? AND owner NOT IN ({placeholders})",
+                (PENDING, RUNNING, *keep_owners),
+            ).rowcount
+
+    def owners(self) -> List[str]:
+        """The owners of running items."""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT owner FROM job_items WHERE status = ?", (RUNNING,)).fetchall()
+        return [row["owner"] for row in rows]
+
+    def finish_item(self, job_id: str, index: int, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        status = FAILED if error is not None else DONE
+        JOB_ITEMS.inc(status=status)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE job_items SET status = ?, result = ?, error = ? WHERE job_id = ? AND idx = ?",
+                (status, json.dumps(result) if result is not None else None, error, job_id, index),
+            )
+            remaining = self._conn.execute(
+                "SELECT COUNT(*) FROM job_items WHERE job_id = ? AND status IN (?, ?)", (job_id, PENDING, RUNNING)
+            ).fetchone()[0]
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                (COMPLETED if remaining == 0 else RUNNING, time(), job_id),
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """The status of a job with its progress, or None if it does not exist."""
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM job_items WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall())
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "total": job["total"],
+            "completed": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "pending": counts.get(PENDING, 0) + counts.get(RUNNING, 0),
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+        }
+
+    def iter_results(self, job_id: str) -> Iterator[Dict]:
+        """The finished items of a job in submission order, read a page at a time."""
+        last_index = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, spec, status, result, error FROM job_items "
+                    "WHERE job_id = ? AND idx > ? AND status IN (?, ?) ORDER BY idx LIMIT ?",
+                    (job_id, last_index, DONE, FAILED, RESULTS_PAGE_SIZE),
+                ).fetchall()
+            for row in rows:
+                item = {"index": row["idx"], **json.loads(row["spec"]), "status": row["status"]}
+                if row["status"] == DONE:
+                    item["comparison"] = json.loads(row["result"])
+                else:
+                    item["error"] = row["error"]
+                yield item
+            if len(rows) < RESULTS_PAGE_SIZE:
+                return
+            last_index = rows[-1]["idx"]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class _ItemError(Exception):
+    """An item that cannot be compared; recorded as failed without stopping the job."""
+
+
+class JobRunner:
+    """The worker threads processing job items, in pipelined stages."""
+
+    def __init__(self, store: JobStore, fetch_workers: int = FETCH_WORKERS, queue_size: int = STAGE_QUEUE_SIZE,
+                 owner: Optional[str] = None):
+        self.store = store
+        self.owner = owner or process_token()  # Recorded on the items this runner claims
+        self.fetch_workers = fetch_workers
+        # The input queue only holds item references, so it is unbounded and submitting never blocks
+        self._fetch_queue: "queue.Queue" = queue.Queue()
+        self._segment_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._encode_queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+        self._stopped_fetchers = 0
+        self._lock = threading.Lock()
+        QUEUE_DEPTH.set_function(self._fetch_queue.qsize, queue="job_fetch")
+        QUEUE_DEPTH.set_function(self._segment_queue.qsize, queue="job_segment")
+        QUEUE_DEPTH.set_function(self._encode_queue.qsize, queue="job_encode")
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        stages = [("job-fetch", self._fetch_stage)] * self.fetch_workers
+        stages += [("job-segment", self._segment_stage), ("job-encode", self._encode_stage)]
+        for index, (name, target) in enumerate(stages):
+            thread = threading.Thread(target=target, name=f"{name}-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def resume(self) -> None:
+        """
+        Queue the items left unfinished: those never claimed, and those claimed by processes
+        that no longer run (e.g. before a restart).
+        """
+        released = self.store.release_items(
+            owner for owner in self.store.owners() if owner == self.owner or _alive(owner)
+        )
+        pending = self.store.claim_items(self.owner)
+        if pending:
+            logging.info("Resuming %d unfinished job items (%d from stopped processes)", len(pending), released)
+        for item in pending:
+            self._fetch_queue.put(item)
+
+    def submit(self, specs: List[Dict]) -> str:
+        job_id = self.store.create_job(specs)
+        for item in self.store.claim_items(self.owner, job_id):
+            self._fetch_queue.put(item)
+        return job_id
+
+    def stop(self) -> None:
+        """Stop the worker threads once the items queued so far are processed."""
+        for _ in range(self.fetch_workers):
+            self._fetch_queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def _fail(self, item: tuple, error: Exception) -> None:
+        # Never raises: the stage threads must survive any item
+        job_id, index, spec = item
+        if not isinstance(error, _ItemError):
+            logging.error("Job %s item %d failed: %s", job_id, index, error)
+        try:
+            self.store.finish_item(job_id, index, error=str(error))
+        except Exception:
+            logging.exception("Could not record the failure of job %s item %d", job_id, index)
+
+    def _fetch_stage(self) -> None:
+        while True:
+            item = self._fetch_queue.get()
+            if item is None:
+                # The last fetch worker to stop passes the sentinel down the pipeline
+                with self._lock:
+                    self._stopped_fetchers += 1
+                    last = self._stopped_fetchers == self.fetch_workers
+                if last:
+                    self._segment_queue.put(None)
+                return
+            try:
+                articles = fetch_articles(item[2])
+            except Exception as e:
+                self._fail(item, e)
+                continue
+            self._segment_queue.put((item, articles))
+
+    def _segment_stage(self) -> None:
+        while True:
+            work = self._segment_queue.get()
+            if work is None:
+                self._encode_queue.put(None)
+                return
+            item = work[0]
+            try:
+                sentences, revisions = self._segment(*work)
+            except Exception as e:
+                self._fail(item, e)
+                continue
+            self._encode_queue.put((item, sentences, revisions))
+
+    def _segment(self, item: tuple, articles: tuple) -> tuple:
+        source_text, target_text, revisions = articles
+        spec = item[2]
+        stored = comparison_store.unchanged(_comparison_key(spec), spec["model_name"], revisions)
+        if stored is not None:
+            return (stored.source_sentences, stored.target_sentences), revisions
+        sentences = (
+            preprocess_input(source_text, spec["source_lang"]),
+            preprocess_input(target_text, spec["target_lang"]),
+        )
+        return sentences, revisions
+
+    def _encode_stage(self) -> None:
+        while True:
+            work = self._encode_queue.get()
+            if work is None:
+                return
+            try:
+                self._compare(*work)
+            except Exception as e:
+                self._fail(work[0], e)
+
+    def _compare(self, item: tuple, sentences: tuple, revisions: tuple) -> None:
+        job_id, index, spec = item
+        source_sentences, target_sentences = sentences
+        missing_info_index, extra_info_index = comparison_store.compare(
+            _comparison_key(spec), spec["model_name"], revisions,
+            source_sentences, target_sentences, spec["comparison_threshold"]
+        )
+        self.store.finish_item(job_id, index, result={
+            "left_article_array": source_sentences,
+            "right_article_array": target_sentences,
+            "left_article_missing_info_index": missing_info_index,
+            "right_article_extra_info_index": extra_info_index,
+        })
+
+
+def _comparison_key(spec: Dict) -> str:
+    return f"{spec['source_lang']}.{spec['title']}.{spec['target_lang']}"
+
+
+def fetch_articles(spec: Dict) -> tuple:
+    """
+    Fetch the text of the source article and of its version in the target language, with their
+    revision ids.
+    """
+    source = query_page(spec["source_lang"], spec["title"])
+    if source is None:
+        raise _ItemError(f"Article '{spec['title']}' not found in '{spec['source_lang']}'.")
+    target_title = source["langlinks"].get(spec["target_lang"])
+    if target_title is None:
+        raise _ItemError(f"Article '{spec['title']}' is not available in '{spec['target_lang']}'.")
+    target = query_page(spec["target_lang"], target_title)
+    if target is None:
+        raise _ItemError(f"Article '{target_title}' not found in '{spec['target_lang']}'.")
+    return source["text"], target["text"], (source.get("lastrevid"), target.get("lastrevid"))
+
+
+def _process_start(pid: int) -> Optional[str]:
+    """The start time of a process (in clock ticks since boot), or None where /proc is unavailable."""
+    try:
+        with open(f"/proc/{pid}/stat") as file:
+            return file.read().rsplit(")", 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+_token: Optional[tuple] = None  # (pid, token) of this process
+
+
+def process_token() -> str:
+    """
+    Identifies this process among those that ever ran: its pid and start time (or a random id
+    where the start time is unknown), since pids are reused, e.g. after a container restart.
+    """
+    global _token
+    pid = os.getpid()
+    if _token is None or _token[0] != pid:  # Computed again in forked children
+        _token = (pid, f"{pid}-{_process_start(pid) or uuid.uuid4().hex}")
+    return _token[1]
+
+
+def _alive(owner: Optional[str]) -> bool:
+    """Whether the process that claimed items (see process_token) is still running."""
+    try:
+        pid, _, start = owner.partition("-")
+        os.kill(int(pid), 0)
+    except PermissionError:
+        pass  # Exists, run by another user
+    except (ProcessLookupError, ValueError, TypeError, AttributeError, OverflowError):
+        return False
+    if int(pid) == os.getpid():
+        return owner == process_token()
+    current = _process_start(int(pid))
+    # A different start time means the pid was reused by another process
+    return current is None or current == start
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def configure(database: str, fetch_workers: int = FETCH_WORKERS) -> None:
+    global DATABASE, FETCH_WORKERS
+    DATABASE = database
+    FETCH_WORKERS = fetch_workers
+
+
+def get_runner() -> JobRunner:
+    """
+    The job runner of this process, started on first use. It only processes the jobs submitted
+    to this process; see resume_jobs for the unfinished ones.
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(JobStore(DATABASE), FETCH_WORKERS)
+            _runner.start()
+        return _runner
+
+
+def resume_jobs() -> None:
+    """
+    Start the job runner at startup if a job database exists, resuming unfinished jobs. Only
+    done in the process that resumes jobs (the first worker of the pre-fork launcher, and the
+    workers it restarts).
+    """
+    if prefork.resumes_jobs() and os.path.exists(DATABASE):
+        get_runner().resume()
@@ -0,0 +1,113 @@
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.services.metrics import counter
+
+"""
+Logging setup of the API.
+
+Records are not written in the request path: the root logger only puts them on a queue
+(QueueHandler), and a background thread (QueueListener) formats them and writes them out.
+
+High-frequency loggers, such as the article cache's, can be sampled: with a rate of 0.1 only
+every tenth record below WARNING is kept. Warnings and errors are never sampled out. Rates
+are configured per logger name, e.g. LOG_SAMPLE_RATES="app.api.cache=0.01,app.api.wiki_article=0.1".
+"""
+
+FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+SAMPLED_OUT = counter("symmetry_log_records_sampled_out_total", "Log records dropped by sampling, by logger.",
+                      ["logger"])
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every round(1 / rate) records below WARNING."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.every = max(round(1 / rate), 1) if rate > 0 else 0
+        self._seen = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        self._seen += 1  # Unlocked: an occasional miscount only shifts which record is kept
+        if self.every and (self._seen - 1) % self.every == 0:
+            return True
+        SAMPLED_OUT.inc(logger=record.name)
+        return False
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parses "logger=rate,logger=rate" into a dict."""
+    rates = {}
+    for entry in filter(None, (entry.strip() for entry in value.split(","))):
+        name, _, rate = entry.partition("=")
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(level: str, sample_rates: Optional[Dict[str, float]] = None,
+                  handler: Optional[logging.Handler] = None) -> QueueListener:
+    """
+    Route every log record through a queue to a background thread writing to 'handler'
+    (stderr by default). Replaces the handlers of the root logger; calling it again
+    reconfigures the level and sampling.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        _listener.stop()
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(FORMAT))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    _queue_handler = QueueHandler(records)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    for name, rate in (sample_rates or {}).items():
+        logger = logging.getLogger(name)
+        for existing in [f for f in logger.filters if isinstance(f, SamplingFilter)]:
+            logger.removeFilter(existing)
+        if rate < 1:
+            logger.addFilter(SamplingFilter(rate))
+
+    _listener = QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """Write out the records still queued. Registered to run at exit."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def _restart_after_fork() -> None:
+    # The listener thread does not survive a fork (e.g. the pre-fork launcher,
+    # app/services/prefork.py): give the child its own queue and listener
+    global _listener
+    if _listener is None:
+        return
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _queue_handler.queue = records
+    _listener = QueueListener(records, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+atexit.register(stop_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
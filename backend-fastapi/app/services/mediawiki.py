@@ -0,0 +1,161 @@
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+import requests
+
+from app.services import content_source, dump_store
+from app.services.metrics import timed
+
+"""
+Client for the MediaWiki Action API (action=query), used to fetch article text, language links
+and revision info for one or many titles in as few round trips as possible.
+
+Results are rendered the same way as wikipediaapi's page.text, so they can be served
+interchangeably with articles fetched through wikipediaapi.
+
+When a local dump store is configured (see app/services/dump_store.py), titles found there
+are served from disk and only the others are requested from Wikipedia.
+"""
+
+USER_AGENT = "Symmetry/2.0 (contact@grey-box.ca)"
+MAX_TITLES_PER_QUERY = 50  # MediaWiki's limit on 'titles' for regular clients
+REQUEST_TIMEOUT = 30  # Seconds
+
+# Section headings in a plain text extract with exsectionformat=wiki, e.g. "\n\n== History ==\n"
+_SECTION_HEADING = re.compile(r"\n\n *(==+) (.*?) (==+) *\n")
+
+_sessions = threading.local()
+
+
+def _session() -> requests.Session:
+    # One keep-alive session per thread, since requests sessions are not thread safe
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        session = _sessions.session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def api_url(lang: str) -> str:
+    return content_source.api_url(lang)
+
+
+def query_pages(lang: str, titles: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Fetch the plain text extract, language links and latest revision id of up to
+    MAX_TITLES_PER_QUERY titles with one action=query request, following continuations.
+
+    Returns a dict mapping each requested title to
+    {"title", "text", "langlinks": {lang: title}, "lastrevid"}, or to None if the page is missing.
+    Normalized titles and redirects are resolved to the page they point to.
+    """
+    if len(titles) > MAX_TITLES_PER_QUERY:
+        raise ValueError(f"At most {MAX_TITLES_PER_QUERY} titles can be queried at once.")
+
+    local: Dict[str, Dict] = {}
+    for title in titles:
+        page = dump_store.lookup(lang, title)
+        if page is not None:
+            local[title] = page
+    remote = [title for title in titles if title not in local]
+    if not remote:
+        return local
+    results = _query_remote_pages(lang, remote)
+    return {title: local[title] if title in local else results[title] for title in titles}
+
+
+def _query_remote_pages(lang: str, titles: List[str]) -> Dict[str, Optional[Dict]]:
+    params = {
+        "action": "query",
+        "format": "json",
+        "formatversion": 2,
+        "prop": "extracts|langlinks|info",
+        "explaintext": 1,
+        "exsectionformat": "wiki",
+        "exlimit": "max",
+        "lllimit": "max",
+        "redirects": 1,
+        "titles": "|".join(titles),
+    }
+
+    pages: Dict[str, Dict] = {}
+    aliases: Dict[str, str] = {}  # Requested or normalized title -> resolved title
+    continuation: Dict[str, str] = {}
+    while True:
+        with timed("upstream_fetch"):
+            response = _session().get(api_url(lang), params={**params, **continuation}, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        data = response.json()
+        query = data.get("query", {})
+
+        for mapping in query.get("normalized", []) + query.get("redirects", []):
+            aliases[mapping["from"]] = mapping["to"]
+
+        # Each continuation returns more extracts or language links for the same pages
+        for page in query.get("pages", []):
+            merged = pages.setdefault(page["title"], {"title": page["title"], "langlinks": {}})
+            if page.get("missing") or page.get("invalid"):
+                merged["missing"] = True
+            if "extract" in page:
+                merged["extract"] = page["extract"]
+            if "lastrevid" in page:
+                merged["lastrevid"] = page["lastrevid"]
+            for link in page.get("langlinks", []):
+                merged["langlinks"][link["lang"]] = link["title"]
+
+        if "continue" not in data:
+            break
+        continuation = data["continue"]
+
+    results: Dict[str, Optional[Dict]] = {}
+    for title in titles:
+        resolved = title
+        seen = set()
+        while resolved in aliases and resolved not in seen:
+            seen.add(resolved)
+            resolved = aliases[resolved]
+        page = pages.get(resolved)
+        if page is None or page.get("missing"):
+            results[title] = None
+            continue
+        results[title] = {
+            "title": page["title"],
+            "text": render_extract(page.get("extract", "")),
+            "langlinks": page["langlinks"],
+            "lastrevid": page.get("lastrevid"),
+        }
+    return results
+
+
+def query_page(lang: str, title: str) -> Optional[Dict]:
+    """Fetch a single page with query_pages."""
+    return query_pages(lang, [title])[title]
+
+
+def chunked(items: List, size: int = MAX_TITLES_PER_QUERY) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def render_extract(extract: str) -> str:
+    """
+    Render a plain text extract (exsectionformat=wiki) like wikipediaapi's page.text:
+    the summary, then every section as its title, a newline and its text.
+    """
+    matches = list(_SECTION_HEADING.finditer(extract))
+    if not matches:
+        return extract.strip()
+
+    text = extract[:matches[0].start()].strip()
+    if text:
+        text += "\n\n"
+    for index, match in enumerate(matches):
+        if index + 1 < len(matches):
+            body = extract[match.end():matches[index + 1].start()].strip()
+        else:
+            body = extract[match.end():]
+        text += match.group(2).strip() + "\n" + body
+        if body:
+            text += "\n\n"
+    return text.strip()
@@ -0,0 +1,57 @@
+"""
+Persistent directory of the downloaded models.
+
+The frozen desktop build (main.spec) does not bundle any model: sentence transformers are
+downloaded from Hugging Face on first use and spaCy pipelines are read from disk, both from this
+directory, which survives between launches and app updates. When running from source the
+Hugging Face defaults (~/.cache/huggingface) and installed spaCy packages are used unless
+MODEL_CACHE_DIR is set.
+
+Layout:
+    <directory>/huggingface/         Hugging Face hub cache (HF_HOME)
+    <directory>/spacy/<model name>/  spaCy pipelines, e.g. spacy/en_core_web_sm/
+"""
+import logging
+import os
+import sys
+from typing import Optional
+
+APP_NAME = "symmetry"
+
+_directory: Optional[str] = None
+
+
+def default_directory() -> Optional[str]:
+    """The per-user cache directory of the frozen app, or None when running from source."""
+    if not getattr(sys, "frozen", False):
+        return None
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~\\AppData\\Local"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, APP_NAME, "models")
+
+
+def configure(directory: str = "") -> None:
+    """
+    Use 'directory' (or the default of the frozen app) for the models. Must run before
+    sentence_transformers is first imported, as Hugging Face reads HF_HOME at import time.
+    """
+    global _directory
+    _directory = directory or default_directory()
+    if _directory is None:
+        return
+    os.makedirs(os.path.join(_directory, "spacy"), exist_ok=True)
+    os.environ.setdefault("HF_HOME", os.path.join(_directory, "huggingface"))
+    logging.info("Model cache directory: %s", _directory)
+
+
+def spacy_model(model_name: str) -> str:
+    """What to pass to spacy.load: the pipeline's path in the cache if it is there, else its package name."""
+    if _directory is not None:
+        path = os.path.join(_directory, "spacy", model_name)
+        if os.path.isdir(path):
+            return path
+    return model_name
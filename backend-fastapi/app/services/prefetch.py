@@ -0,0 +1,153 @@
+import logging
+import os
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.metrics import counter, gauge
+
+"""
+Speculative prefetching of target-language articles.
+
+After a user loads a source article, the next request is almost always for the same article in
+one of its other languages. When enabled, the prefetcher fetches the most likely ones into the
+article cache in the background, so that second request is a cache hit.
+
+Languages are ranked by how often they were requested from this server (our own request history),
+and only languages that have been requested before are prefetched. Prefetches run on a small,
+low-priority thread pool under a global budget: when the budget is used up, new prefetches are
+dropped rather than queued, so speculative work never piles up behind real requests.
+"""
+
+TOP_LANGUAGES = 2  # Target languages prefetched per source article
+MAX_CONCURRENT = 2  # Global budget of prefetches in flight
+THREAD_NICENESS = 10  # Added to the niceness of prefetch threads, where the OS supports it
+
+PREFETCHES = counter(
+    "symmetry_prefetch_total",
+    "Target-language prefetches, by result (scheduled, cached, dropped, fetched, failed, hit).",
+    ["result"],
+)
+QUEUE_DEPTH = gauge("symmetry_queue_depth", "Items waiting in each worker queue.", ["queue"])
+
+
+def _lower_thread_priority() -> None:
+    # Linux applies setpriority to a single thread when given its native id
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), THREAD_NICENESS)
+    except (AttributeError, OSError):
+        pass
+
+
+class Prefetcher:
+    def __init__(self, top_languages: int = TOP_LANGUAGES, max_concurrent: int = MAX_CONCURRENT):
+        self.enabled = False
+        self.top_languages = top_languages
+        self.max_concurrent = max_concurrent
+        self.history: Counter = Counter()  # Language code -> number of article requests
+        self.in_flight: Dict[str, Future] = {}  # Cache key -> running prefetch
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, top_languages: int, max_concurrent: int) -> None:
+        self.enabled = enabled
+        self.top_languages = top_languages
+        self.max_concurrent = max_concurrent
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrent,
+                thread_name_prefix="prefetch",
+                initializer=_lower_thread_priority,
+            )
+        return self._executor
+
+    # Records a served article request in the history used for ranking
+    def record_request(self, lang: str) -> None:
+        with self._lock:
+            self.history[lang] += 1
+
+    def rank(self, source_lang: str, languages: Dict[str, str]) -> List[Tuple[str, str]]:
+        """
+        The (lang, title) pairs worth prefetching for an article available in 'languages',
+        most requested language first.
+        """
+        with self._lock:
+            candidates = [
+                (self.history[lang], lang, title)
+                for lang, title in languages.items()
+                if lang != source_lang and self.history[lang] > 0
+            ]
+        candidates.sort(key=lambda candidate: -candidate[0])
+        return [(lang, title) for _, lang, title in candidates[:self.top_languages]]
+
+    def schedule(self, source_lang: str, languages: Dict[str, str],
+                 fetch: Callable[[str, str], None], is_cached: Callable[[str], bool]) -> List[Future]:
+        """
+        Start background fetches of the top target languages of an article.
+        'fetch(lang, title)' fetches and caches one article; 'is_cached(key)' checks the cache.
+        """
+        if not self.enabled:
+            return []
+        futures = []
+        for lang, title in self.rank(source_lang, languages):
+            key = lang + "." + title
+            if is_cached(key):
+                PREFETCHES.inc(result="cached")
+                continue
+            with self._lock:
+                if key in self.in_flight:
+                    continue
+                if len(self.in_flight) >= self.max_concurrent:
+                    PREFETCHES.inc(result="dropped")
+                    continue
+                future = self._get_executor().submit(self._run, fetch, lang, title)
+                self.in_flight[key] = future
+            future.add_done_callback(lambda _, key=key: self._done(key))
+            PREFETCHES.inc(result="scheduled")
+            futures.append(future)
+        return futures
+
+    def _run(self, fetch: Callable[[str, str], None], lang: str, title: str) -> None:
+        try:
+            fetch(lang, title)
+            PREFETCHES.inc(result="fetched")
+        except Exception as e:
+            # A failed prefetch only costs us the cache hit
+            PREFETCHES.inc(result="failed")
+            logging.info("Prefetch of '%s' (%s) failed: %s", title, lang, e)
+
+    def _done(self, key: str) -> None:
+        with self._lock:
+            self.in_flight.pop(key, None)
+
+    # Blocks until the prefetches in flight have finished
+    def wait(self, timeout: Optional[float] = None) -> None:
+        with self._lock:
+            futures = list(self.in_flight.values())
+        wait(futures, timeout=timeout)
+
+
+# Instantiate global prefetcher object
+_prefetcher = Prefetcher()
+QUEUE_DEPTH.set_function(lambda: len(_prefetcher.in_flight), queue="prefetch")
+
+
+# For external use
+def configure(enabled: bool, top_languages: int = TOP_LANGUAGES, max_concurrent: int = MAX_CONCURRENT) -> None:
+    _prefetcher.configure(enabled, top_languages, max_concurrent)
+
+
+def record_request(lang: str) -> None:
+    _prefetcher.record_request(lang)
+
+
+def schedule_prefetch(source_lang: str, languages: Dict[str, str],
+                      fetch: Callable[[str, str], None], is_cached: Callable[[str], bool]) -> List[Future]:
+    return _prefetcher.schedule(source_lang, languages, fetch, is_cached)
+
+
+def record_hit() -> None:
+    PREFETCHES.inc(result="hit")
@@ -0,0 +1,167 @@
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+from typing import Dict, Optional
+
+from app.services import logs
+
+"""
+Pre-fork multi-worker launcher.
+
+Running uvicorn with --workers N starts N independent processes, and each loads its own copy of
+the sentence transformer and spaCy pipelines. This launcher loads them once in a parent process
+(the warmup of app/services/warmup.py), then forks the workers, which share the model weights
+copy-on-write and only pay for what they write to.
+
+    python -m app.services.prefork --workers 4 [--host 127.0.0.1] [--port 8000]
+
+What it does about the usual pitfalls of forking after loading torch:
+- The parent runs with one torch/OpenMP thread, so no OpenMP thread pool exists at fork time
+  (GNU OpenMP's pool does not survive a fork and hangs the child's first parallel op). Each
+  worker then sets its own thread count (--threads-per-worker, by default the CPUs divided by
+  the workers, so the workers do not oversubscribe the machine).
+- TOKENIZERS_PARALLELISM is turned off: the Rust thread pool of Hugging Face tokenizers is not
+  fork-safe either.
+- The garbage collector is disabled while loading and everything loaded is moved to the
+  permanent generation (gc.freeze) before forking, so collections in the workers do not write
+  to, and thereby copy, the shared objects.
+- Only the first worker resumes unfinished bulk comparison jobs, so they do not run N times.
+  A worker restarted after a crash resumes them too, taking back the items the dead worker had
+  claimed (the items of the live workers are left to them).
+
+The parent binds the listening socket, which all workers accept on, and restarts workers that
+die. SIGTERM or SIGINT stops the workers and then the parent. POSIX only; each worker keeps its
+own caches and /metrics.
+"""
+
+DEFAULT_WORKERS = 4
+
+_resume_jobs = True  # Whether this process resumes unfinished jobs at startup
+
+
+def resumes_jobs() -> bool:
+    """False in the workers of the launcher, except the first one started and restarted ones."""
+    return _resume_jobs
+
+
+def _set_torch_threads(threads: int) -> None:
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["MKL_NUM_THREADS"] = str(threads)
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(threads)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, sock: socket.socket, threads: int, resume_jobs: bool) -> None:
+    global _resume_jobs
+    import uvicorn
+
+    _resume_jobs = resume_jobs
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    gc.enable()
+    _set_torch_threads(threads)
+    server = uvicorn.Server(uvicorn.Config(app, log_config=None))
+    server.run(sockets=[sock])
+
+
+class Launcher:
+    def __init__(self, app, sock: socket.socket, workers: int, threads: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.children: Dict[int, int] = {}  # Pid -> worker index
+        self.stopping = False
+
+    def spawn(self, index: int, resume_jobs: bool) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                _run_worker(self.app, self.sock, self.threads, resume_jobs)
+            except BaseException:
+                logging.exception("Worker %d crashed", index)
+                code = 1
+            finally:
+                logs.stop_logging()
+                os._exit(code)
+        self.children[pid] = index
+
+    def stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for index in range(self.workers):
+            self.spawn(index, resume_jobs=index == 0)
+        logging.info("Started %d workers (pids %s)", self.workers, ", ".join(map(str, self.children)))
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            index = self.children.pop(pid, None)
+            if index is None or self.stopping:
+                continue
+            logging.warning("Worker %d (pid %d) exited with status %d; restarting it",
+                            index, pid, os.waitstatus_to_exitcode(status))
+            self.spawn(index, resume_jobs=True)
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve the API from pre-forked workers sharing the loaded models.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--host", help="Defaults to HOST of the config")
+    parser.add_argument("--port", type=int, help="Defaults to PORT of the config")
+    parser.add_argument("--threads-per-worker", type=int,
+                        help="torch/OpenMP threads of each worker (default: CPUs / workers, at least 1)")
+    parser.add_argument("--no-preload", action="store_true",
+                        help="Let every worker load its own models (to measure what pre-loading saves)")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        parser.error("the pre-fork launcher needs os.fork (Linux or macOS)")
+    threads = args.threads_per_worker or max((os.cpu_count() or 1) // args.workers, 1)
+
+    # Before anything imports tokenizers or starts an OpenMP thread pool
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    _set_torch_threads(1)
+    gc.disable()
+
+    from app import main as app_main
+    from app.services import warmup
+
+    if not args.no_preload:
+        warmup.run()
+    gc.collect()
+    gc.freeze()
+
+    sock = _bind(args.host or app_main.HOST, args.port or app_main.PORT)
+    logging.info("Listening on %s:%d", *sock.getsockname()[:2])
+    Launcher(app_main.app, sock, args.workers, threads).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+"""
+A small sampling profiler and the store of its results, used by the on-demand request
+profiling hook (see app/api/profiling.py).
+
+The profiler samples the stacks of every thread at a fixed interval, so work the request hands
+to the thread pool (sync endpoints, asyncio.to_thread) is captured along with the event loop.
+Threads that are idle (waiting on a lock, a queue or the event loop's selector) are not sampled.
+Other requests running at the same time show up too, so profile on a quiet instance when you can.
+
+Results are written as speedscope JSON (open them at https://www.speedscope.app for a flame
+graph and call tree) or as collapsed stacks (one "frame;frame;frame count" line per stack, the
+input of flamegraph.pl).
+"""
+
+INTERVAL = 0.005  # Seconds between samples
+FORMATS = {"speedscope": ".speedscope.json", "collapsed": ".collapsed.txt"}
+DEFAULT_FORMAT = "speedscope"
+# Names of the files of a ProfileStore: a hex id and the extension of a format
+PROFILE_FILE = re.compile(r"^[0-9a-f]+(" + "|".join(re.escape(extension) for extension in FORMATS.values()) + r")$")
+
+# A thread whose innermost frame is in one of these modules is waiting, not working
+_IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+Frame = Tuple[str, str, int]  # Function name, file, first line
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = INTERVAL):
+        self.interval = interval
+        self.samples: Dict[str, List[Tuple[Frame, ...]]] = {}  # Thread name -> stacks, outermost frame first
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or frame.f_code.co_filename.endswith(_IDLE_MODULES):
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.setdefault(names.get(thread_id, str(thread_id)), []).append(tuple(stack))
+
+    def speedscope(self, name: str) -> bytes:
+        frames: List[Frame] = []
+        frame_index: Dict[Frame, int] = {}
+        profiles = []
+        for thread_name, stacks in self.samples.items():
+            indexed = []
+            for stack in stacks:
+                for frame in stack:
+                    if frame not in frame_index:
+                        frame_index[frame] = len(frames)
+                        frames.append(frame)
+                indexed.append([frame_index[frame] for frame in stack])
+            profiles.append({
+                "type": "sampled",
+                "name": thread_name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": len(stacks) * self.interval,
+                "samples": indexed,
+                "weights": [self.interval] * len(stacks),
+            })
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "symmetry-profiler",
+            "shared": {"frames": [{"name": func, "file": file, "line": line} for func, file, line in frames]},
+            "profiles": profiles,
+        }
+        return json.dumps(document).encode("utf-8")
+
+    def collapsed(self) -> bytes:
+        counts: Dict[str, int] = {}
+        for thread_name, stacks in self.samples.items():
+            for stack in stacks:
+                key = ";".join([thread_name] + [f"{func} ({os.path.basename(file)}:{line})" for func, file, line in stack])
+                counts[key] = counts.get(key, 0) + 1
+        return "".join(f"{stack} {count}\n" for stack, count in sorted(counts.items())).encode("utf-8")
+
+    def render(self, output_format: str, name: str) -> bytes:
+        if output_format == "collapsed":
+            return self.collapsed()
+        return self.speedscope(name)
+
+
+class ProfileStore:
+    """A directory of profiles, pruned oldest first to stay under max_bytes."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, profile_id: str, output_format: str, data: bytes) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, profile_id + FORMATS[output_format])
+        with self._lock:
+            with open(path, "wb") as file:
+                file.write(data)
+            self._prune()
+        return path
+
+    def _prune(self) -> None:
+        # Only the store's own profiles count and are removed: the directory may hold other files
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if PROFILE_FILE.match(entry.name) and entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def find(self, profile_id: str) -> Optional[Tuple[str, str]]:
+        """The (path, format) of a stored profile, or None."""
+        for output_format, extension in FORMATS.items():
+            path = os.path.join(self.directory, profile_id + extension)
+            if os.path.exists(path):
+                return path, output_format
+        return None
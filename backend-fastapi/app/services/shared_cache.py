@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import threading
+from time import time
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the shared cache is unavailable, and only ever opt-in
+    fcntl = None
+
+from app.services.metrics import counter
+
+"""
+Node-wide cache shared by every worker process (see app/services/prefork.py), in a memory-mapped
+file. It holds article text (the article cache's second tier, app/api/cache.py) and embedding
+matrices (app/ai/semantic_comparison.py), so an article fetched or encoded by one worker is a
+hit in all the others. No external service is needed; put the file on a RAM-backed file system
+such as /dev/shm.
+
+File layout:
+
+    header    magic, number of index slots, size of the data ring, write position, reclaimed position
+    index     open-addressed hash table of slots: seq | key hash | offset | length | timestamp
+    data      ring buffer of entries: key length | key | value
+
+Values are appended to the data ring, wrapping around and overwriting the oldest entries. The
+write and reclaimed positions are logical (they only grow), so an entry at logical offset L is
+valid as long as L >= reclaimed; a slot pointing below it is a miss.
+
+Writers are serialized by an flock on the file. Reads take no lock:
+- each slot is a seqlock: the writer makes 'seq' odd while it updates the slot, and readers retry
+  when 'seq' was odd or changed while they read it;
+- the writer advances 'reclaimed' before overwriting any data, and readers check it again after
+  copying a value out, so a value overwritten during the copy is discarded;
+- the key is stored with the value and compared, so hash collisions are misses, not wrong values.
+"""
+
+MAGIC = b"SYMCACH1"
+HEADER = struct.Struct("<8sIIQQQ")  # magic, slots, padding, data size, write position, reclaimed position
+HEADER_SIZE = 64
+SLOT = struct.Struct("<IIQQIId")  # seq, padding, key hash, offset, length, padding, timestamp
+ENTRY_KEY = struct.Struct("<H")
+WRITE_POSITION = 24  # Offsets of the positions in the header
+RECLAIMED_POSITION = 32
+PROBES = 8  # Slots examined per key
+READ_RETRIES = 4
+
+DEFAULT_SIZE = 256 * 1024 * 1024
+DEFAULT_SLOTS = 65536
+TTL_SECONDS = 4000  # Same as the article cache
+
+SHARED_CACHE_REQUESTS = counter("symmetry_shared_cache_requests_total",
+                                "Shared cache lookups, by namespace and result (hit or miss).",
+                                ["namespace", "result"])
+SHARED_CACHE_BYTES = counter("symmetry_shared_cache_written_bytes_total", "Bytes written to the shared cache ring.")
+
+
+def _hash(key: bytes) -> int:
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") or 1
+
+
+def _same_file(fd: int, path: str) -> bool:
+    try:
+        return os.fstat(fd).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+
+def _create(path: str, total: int, slots: int, size: int) -> None:
+    """Replace the file at 'path' with an empty cache, without touching the file it replaces."""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(temporary, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+    try:
+        os.ftruncate(fd, total)
+        os.pwrite(fd, HEADER.pack(MAGIC, slots, 0, size, 0, 0), 0)
+    finally:
+        os.close(fd)
+    os.replace(temporary, path)
+
+
+class SharedCache:
+    def __init__(self, path: str, size: int = DEFAULT_SIZE, slots: int = DEFAULT_SLOTS, ttl: float = TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()  # Writers of this process; flock covers the other processes
+        self._lock_pid = 0
+        self._lock_fd = -1
+        total = HEADER_SIZE + slots * SLOT.size + size
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                if not _same_file(fd, path):
+                    continue  # Replaced by another process while we waited for the lock
+                file_size = os.fstat(fd).st_size
+                header = os.pread(fd, HEADER.size, 0)
+                existing = HEADER.unpack(header) if len(header) == HEADER.size else None
+                if file_size == 0:
+                    # New file: nobody has it mapped yet
+                    os.ftruncate(fd, total)
+                    os.pwrite(fd, HEADER.pack(MAGIC, slots, 0, size, 0, 0), 0)
+                elif (existing is None or existing[0] != MAGIC or existing[1] != slots or existing[3] != size
+                      or file_size < total):
+                    # A file made with other dimensions. Other processes may have it mapped, and
+                    # resizing it would crash them (SIGBUS): start empty in a new file instead,
+                    # and they keep the old one until they exit
+                    logging.warning("The shared cache at %s has other dimensions; replacing it", path)
+                    _create(path, total, slots, size)
+                    continue
+                self._map = mmap.mmap(fd, total, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+                break
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+        self.slots = slots
+        self.size = size
+        self._data = HEADER_SIZE + slots * SLOT.size
+
+    def _position(self, offset: int) -> int:
+        return struct.unpack_from("<Q", self._map, offset)[0]
+
+    def _slot_offset(self, index: int) -> int:
+        return HEADER_SIZE + index * SLOT.size
+
+    def _read_slot(self, index: int) -> Optional[Tuple[int, int, int, float]]:
+        """(key hash, offset, length, timestamp) of a slot, or None while it is being written."""
+        offset = self._slot_offset(index)
+        for _ in range(READ_RETRIES):
+            seq, _, key_hash, position, length, _, timestamp = SLOT.unpack_from(self._map, offset)
+            if seq % 2 == 0 and struct.unpack_from("<I", self._map, offset)[0] == seq:
+                return key_hash, position, length, timestamp
+        return None
+
+    def get(self, key: str) -> Optional[Tuple[bytes, float]]:
+        """The value stored under a key and the time it was stored, or None."""
+        encoded = key.encode("utf-8")
+        key_hash = _hash(encoded)
+        for probe in range(PROBES):
+            slot = self._read_slot((key_hash + probe) % self.slots)
+            if slot is None or slot[0] != key_hash:
+                continue
+            _, position, length, timestamp = slot
+            if time() - timestamp > self.ttl or position < self._position(RECLAIMED_POSITION):
+                return None
+            start = self._data + position % self.size
+            entry = self._map[start:start + length]
+            if position < self._position(RECLAIMED_POSITION):
+                return None  # Overwritten while we copied it
+            key_length = ENTRY_KEY.unpack_from(entry)[0]
+            if entry[ENTRY_KEY.size:ENTRY_KEY.size + key_length] != encoded:
+                continue
+            return entry[ENTRY_KEY.size + key_length:], timestamp
+        return None
+
+    def _acquire(self) -> int:
+        # flock locks belong to an open file description, which forked workers would share:
+        # each process opens its own
+        if self._lock_pid != os.getpid():
+            self._lock_fd = os.open(self.path, os.O_RDWR)
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+        return self._lock_fd
+
+    def put(self, key: str, value: bytes) -> bool:
+        """Store a value; False when it does not fit in the cache."""
+        encoded = key.encode("utf-8")
+        length = ENTRY_KEY.size + len(encoded) + len(value)
+        if length > self.size:
+            return False
+        key_hash = _hash(encoded)
+        with self._lock:
+            fd = self._acquire()
+            try:
+                position = self._position(WRITE_POSITION)
+                if position % self.size + length > self.size:
+                    position += self.size - position % self.size  # Entries do not wrap around the end
+                end = position + length
+                # Invalidate what is about to be overwritten before writing
+                if end - self.size > self._position(RECLAIMED_POSITION):
+                    struct.pack_into("<Q", self._map, RECLAIMED_POSITION, end - self.size)
+                start = self._data + position % self.size
+                self._map[start:start + length] = ENTRY_KEY.pack(len(encoded)) + encoded + value
+                struct.pack_into("<Q", self._map, WRITE_POSITION, end)
+
+                index = self._choose_slot(key_hash)
+                offset = self._slot_offset(index)
+                seq = struct.unpack_from("<I", self._map, offset)[0]
+                struct.pack_into("<I", self._map, offset, seq + 1)
+                SLOT.pack_into(self._map, offset, seq + 1, 0, key_hash, position, length, 0, time())
+                struct.pack_into("<I", self._map, offset, seq + 2)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        SHARED_CACHE_BYTES.inc(length)
+        return True
+
+    def _choose_slot(self, key_hash: int) -> int:
+        # The key's own slot, else a free or stale one, else the oldest in the probe window
+        reclaimed = self._position(RECLAIMED_POSITION)
+        oldest, oldest_position = None, None
+        for probe in range(PROBES):
+            index = (key_hash + probe) % self.slots
+            _, _, slot_hash, position, _, _, _ = SLOT.unpack_from(self._map, self._slot_offset(index))
+            if slot_hash == key_hash or slot_hash == 0 or position < reclaimed:
+                return index
+            if oldest_position is None or position < oldest_position:
+                oldest, oldest_position = index, position
+        return oldest
+
+    def close(self) -> None:
+        self._map.close()
+        if self._lock_pid == os.getpid():
+            os.close(self._lock_fd)
+
+
+def pack_array(array: np.ndarray) -> bytes:
+    array = np.ascontiguousarray(array)
+    dtype = array.dtype.str.encode()
+    header = struct.pack(f"<B{len(dtype)}sB{array.ndim}I", len(dtype), dtype, array.ndim, *array.shape)
+    return header + array.tobytes()
+
+
+def unpack_array(data: bytes) -> np.ndarray:
+    dtype_length = data[0]
+    dtype = data[1:1 + dtype_length].decode()
+    ndim = data[1 + dtype_length]
+    shape_start = 2 + dtype_length
+    shape = struct.unpack_from(f"<{ndim}I", data, shape_start)
+    return np.frombuffer(data, dtype=dtype, offset=shape_start + 4 * ndim).reshape(shape)
+
+
+# Instantiate global shared cache object (None while disabled)
+_shared_cache: Optional[SharedCache] = None
+
+
+# For external use
+def configure(path: str, size: int = DEFAULT_SIZE, slots: int = DEFAULT_SLOTS, ttl: float = TTL_SECONDS) -> None:
+    """Use the shared cache file at 'path' (created if needed); an empty path disables the cache."""
+    global _shared_cache
+    if _shared_cache is not None:
+        _shared_cache.close()
+        _shared_cache = None
+    if path and fcntl is None:
+        logging.warning("The shared cache needs fcntl (Linux or macOS); not using %s", path)
+    elif path:
+        _shared_cache = SharedCache(path, size, slots, ttl)
+        logging.info("Shared cache at %s (%d MB, %d slots)", path, size // (1024 * 1024), slots)
+
+
+def enabled() -> bool:
+    return _shared_cache is not None
+
+
+def get(namespace: str, key: str) -> Optional[Tuple[bytes, float]]:
+    if _shared_cache is None:
+        return None
+    found = _shared_cache.get(namespace + ":" + key)
+    SHARED_CACHE_REQUESTS.inc(namespace=namespace, result="miss" if found is None else "hit")
+    return found
+
+
+def put(namespace: str, key: str, value: bytes) -> None:
+    if _shared_cache is not None:
+        _shared_cache.put(namespace + ":" + key, value)
+
+
+def get_array(namespace: str, key: str) -> Optional[np.ndarray]:
+    found = get(namespace, key)
+    return unpack_array(found[0]) if found is not None else None
+
+
+def put_array(namespace: str, key: str, array: np.ndarray) -> None:
+    if _shared_cache is not None:
+        put(namespace, key, pack_array(array))
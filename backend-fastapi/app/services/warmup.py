@@ -0,0 +1,104 @@
+import logging
+import threading
+from time import time
+from typing import Callable, Dict, List, Optional
+
+from app.ai import semantic_comparison
+
+"""
+Background warmup of the comparison models.
+
+The sentence transformers and spaCy pipelines are imported and loaded on first use (see
+app/ai/semantic_comparison.py), which takes seconds to minutes. At startup the configured
+models are loaded on a background thread instead, so the server answers liveness probes
+right away and the first comparison does not pay for the load. /healthz/ready reports the
+progress and only succeeds once every configured model is loaded.
+"""
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class Warmup:
+    def __init__(self):
+        self.components: Dict[str, Dict] = {}  # Component name -> status, error, seconds
+        self._steps: List = []  # (component name, load function)
+        self._thread: Optional[threading.Thread] = None
+        self._finished = False  # Already warmed up, e.g. by the pre-fork launcher before forking
+        self._lock = threading.Lock()
+
+    def configure(self, models: List[str], spacy_languages: List[str]) -> None:
+        steps = [(f"model:{name}", lambda name=name: semantic_comparison.load_model(name)) for name in models]
+        for lang in spacy_languages:
+            model_name = semantic_comparison.language_model_map.get(lang)
+            if model_name is None:
+                logging.warning("No spaCy pipeline for language '%s'; skipping its warmup", lang)
+                continue
+            steps.append((f"spacy:{model_name}", lambda model_name=model_name: semantic_comparison.load_spacy(model_name)))
+        with self._lock:
+            self._steps = steps
+            self.components = {name: {"status": PENDING} for name, _ in steps}
+
+    def start(self) -> None:
+        """Start loading the configured components on a background thread."""
+        if self._thread is not None or self._finished:
+            return
+        self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+        self._thread.start()
+
+    def run(self) -> None:
+        """Load the configured components in the calling thread."""
+        for name, load in self._steps:
+            self._set(name, status=LOADING)
+            started = time()
+            try:
+                load()
+            except Exception as e:
+                # The model is loaded again on first use, which fails the request instead
+                logging.error("Warmup of %s failed: %s", name, e)
+                self._set(name, status=FAILED, error=str(e), seconds=round(time() - started, 3))
+                continue
+            self._set(name, status=READY, seconds=round(time() - started, 3))
+            logging.info("Warmed up %s in %.1f s", name, time() - started)
+        self._finished = True
+
+    def _set(self, name: str, **fields) -> None:
+        with self._lock:
+            self.components[name] = fields
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def status(self) -> Dict:
+        with self._lock:
+            components = {name: dict(state) for name, state in self.components.items()}
+        done = sum(state["status"] in (READY, FAILED) for state in components.values())
+        return {
+            "ready": all(state["status"] == READY for state in components.values()),
+            "progress": f"{done}/{len(components)}",
+            "components": components,
+        }
+
+
+# Instantiate global warmup object
+_warmup = Warmup()
+
+
+# For external use
+def configure(models: List[str], spacy_languages: List[str]) -> None:
+    _warmup.configure(models, spacy_languages)
+
+
+def start() -> None:
+    _warmup.start()
+
+
+def run() -> None:
+    _warmup.run()
+
+
+def status() -> Dict:
+    return _warmup.status()
@@ -0,0 +1,70 @@
+import pytest
+
+from app.services import article_parser
+from app.services.article_parser import article_fetcher, fetch_compact_article
+
+SAMPLE_HTML = """
+<p>The <a href="/wiki/Fonda_Theatre">Fonda Theatre</a> is a venue in
+<a href="/wiki/Los_Angeles">Los Angeles</a>.<sup class="reference"><a href="#cite_note-1">[1]</a></sup></p>
+<h2>History</h2>
+<p>It opened in 1926 near <a href="/wiki/Hollywood">Hollywood</a> and
+<a href="/wiki/Los_Angeles">the city</a> centre.<sup class="reference"><a href="#cite_note-2">[2]</a></sup></p>
+<p>Later it was renamed after <b>Henry Fonda</b>.</p>
+<ol class="references">
+<li id="cite_note-1"><span class="mw-cite-backlink">^</span> <a href="https://example.org/a">Source A</a></li>
+<li id="cite_note-2"><span class="mw-cite-backlink">^</span> Book without a link</li>
+</ol>
+"""
+
+
+class _FakeResponse:
+    def __init__(self, html):
+        self._html = html
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"parse": {"text": {"*": self._html}}}
+
+
+@pytest.fixture
+def sample_article(monkeypatch):
+    monkeypatch.setattr(article_parser.requests, "get", lambda *args, **kwargs: _FakeResponse(SAMPLE_HTML))
+    return article_fetcher("Fonda Theatre", "en")
+
+
+def test_analytics_match_sections(sample_article):
+    """The precomputed analytics agree with a full rescan of the parsed sections"""
+    analytics = sample_article.analytics
+    all_citations = [c for section in sample_article.sections for c in section.citations]
+    total_words = sum(len(section.clean_content.split()) for section in sample_article.sections)
+
+    assert analytics.total_citations == len(all_citations)
+    assert analytics.total_citations == 4
+    assert analytics.unique_targets == 3
+    assert analytics.total_words == total_words
+    assert analytics.total_references == 2
+    assert analytics.references_with_urls == 1
+    assert analytics.reference_density == round(2 / total_words * 1000, 2)
+
+
+def test_most_cited_articles(sample_article):
+    """Most cited targets are ordered by count and labelled with the latest link text"""
+    most_cited = sample_article.analytics.most_cited_articles
+    assert most_cited[0] == {"title": "the city", "count": 2}
+    assert [entry["count"] for entry in most_cited] == [2, 1, 1]
+
+
+def test_compact_article_round_trip(sample_article):
+    """The compact form rebuilds the same sections, with positions pointing at each label"""
+    compact = fetch_compact_article("Fonda Theatre", "en")
+    assert compact.sections() == sample_article.sections
+    assert compact.citations() == [c for section in sample_article.sections for c in section.citations]
+    assert compact.urls.count("https://en.wikipedia.org/wiki/Los_Angeles") == 1
+
+    for section in sample_article.sections:
+        for citation, position in zip(section.citations, section.citation_position):
+            label, start = position.rsplit(":", 1)
+            assert label == citation.label
+            assert section.clean_content[int(start):].startswith(citation.label)
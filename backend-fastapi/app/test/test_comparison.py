@@ -0,0 +1,82 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.ai import semantic_comparison
+from app.api import comparison
+from app.main import app
+
+MODELS = ["sentence-transformers/LaBSE", "xlm-roberta-base", "multi-qa-MiniLM-L6-cos-v1"]
+REQUEST = {"article_text_blob_1": "One. Two. Three.", "article_text_blob_2": "Un. Deux.",
+           "article_text_blob_1_language": "xx", "article_text_blob_2_language": "yy", "comparison_threshold": 0.5}
+
+
+def test_compare_with_several_models(monkeypatch):
+    """Articles are segmented once and compared with every model concurrently"""
+    segmented = []
+    # Every model's comparison waits for the others to start: the request only completes when
+    # they all run at the same time (the barrier breaks after its timeout otherwise)
+    barrier = threading.Barrier(len(MODELS), timeout=10)
+
+    def fake_preprocess(text, language):
+        segmented.append(language)
+        return [s.strip() for s in text.split(".") if s.strip()]
+
+    def fake_compare(model_name, source_sentences, target_sentences, sim_threshold, deduped):
+        assert deduped[0][0] == source_sentences
+        barrier.wait()
+        return [MODELS.index(model_name)], []
+
+    monkeypatch.setattr(comparison, "preprocess_input", fake_preprocess)
+    monkeypatch.setattr(comparison, "compare_sentences", fake_compare)
+    client = TestClient(app)
+
+    response = client.post("/symmetry/v1/articles/compare", json={**REQUEST, "model_name": MODELS + [MODELS[0]]})
+    assert response.status_code == 200
+    assert not barrier.broken  # Not one model after the other
+    assert sorted(segmented) == ["xx", "yy"]
+
+    comparisons = response.json()["comparisons"]
+    assert [c["model_name"] for c in comparisons] == MODELS
+    assert [c["left_article_missing_info_index"] for c in comparisons] == [[0], [1], [2]]
+    assert comparisons[0]["left_article_array"] == ["One", "Two", "Three"]
+
+
+def test_compare_rejects_invalid_requests():
+    client = TestClient(app)
+    assert client.post("/symmetry/v1/articles/compare", json={**REQUEST, "model_name": "default"}).status_code == 404
+    assert client.post("/symmetry/v1/articles/compare",
+                       json={**REQUEST, "model_name": [MODELS[0], "unknown"]}).status_code == 404
+    assert client.post("/symmetry/v1/articles/compare", json={**REQUEST, "model_name": []}).status_code == 400
+    assert client.post("/symmetry/v1/articles/compare",
+                       json={**REQUEST, "model_name": MODELS[0], "comparison_threshold": 1.5}).status_code == 400
+
+    # Checked before any article is fetched
+    sections = {"source_title": "Alpha", "source_lang": "en", "target_title": "Alpha", "target_lang": "fr"}
+    assert client.post("/symmetry/v1/articles/compare-sections",
+                       json={**sections, "model_name": "unknown"}).status_code == 404
+    assert client.post("/symmetry/v1/articles/compare-sections",
+                       json={**sections, "comparison_threshold": -0.1}).status_code == 400
+
+
+def test_model_loaded_once_under_concurrent_first_use(monkeypatch):
+    loads = []
+    release = threading.Event()
+
+    def fake_load(model_name):
+        loads.append(model_name)
+        release.wait(10)
+        return object()
+
+    monkeypatch.setattr(semantic_comparison, "_models", {})
+    monkeypatch.setattr(semantic_comparison, "_load_sentence_transformer", fake_load)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(semantic_comparison.load_model(MODELS[1])))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert loads == [MODELS[1]]
+    assert len(results) == 4 and all(result is results[0] for result in results)
@@ -0,0 +1,69 @@
+import zlib
+
+import numpy as np
+
+from app.services.comparison_store import ComparisonStore
+
+MODEL = "sentence-transformers/LaBSE"
+
+
+class FakeEncoder:
+    """Deterministic random embeddings per sentence; records what it was asked to encode."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, model_name, sentences):
+        self.encoded.extend(sentences)
+        return np.stack([np.random.default_rng(zlib.crc32(s.encode())).standard_normal(16) for s in sentences])
+
+
+def _brute_force(encode, source, target, threshold):
+    a, b = encode(MODEL, source), encode(MODEL, target)
+    a /= np.linalg.norm(a, axis=1, keepdims=True)
+    b /= np.linalg.norm(b, axis=1, keepdims=True)
+    similarities = a @ b.T
+    return (np.flatnonzero(similarities.max(axis=1) < threshold).tolist(),
+            np.flatnonzero(similarities.max(axis=0) < threshold).tolist())
+
+
+def test_incremental_comparison():
+    """Re-comparisons after edits match a full comparison while only encoding what changed"""
+    encoder = FakeEncoder()
+    store = ComparisonStore(encode=encoder)
+    source = [f"source {index}" for index in range(30)]
+    target = [f"target {index}" for index in range(25)]
+    threshold = 0.3
+
+    assert store.compare("en.A.fr", MODEL, (1, 1), source, target, threshold) == \
+        _brute_force(FakeEncoder(), source, target, threshold)
+    assert len(encoder.encoded) == 55
+
+    # Neither revision changed: nothing is encoded, whatever the threshold
+    encoder.encoded.clear()
+    assert store.unchanged("en.A.fr", MODEL, (1, 1)) is not None
+    assert store.compare("en.A.fr", MODEL, (1, 1), source, target, 0.1) == \
+        _brute_force(FakeEncoder(), source, target, 0.1)
+    assert encoder.encoded == []
+    assert store.unchanged("en.A.fr", MODEL, (2, 1)) is None
+
+    # Edits on both sides, removing best matches too: only new sentences are encoded
+    rng = np.random.default_rng(0)
+    for revision in range(2, 8):
+        source = [s for s in source if rng.random() > 0.15] + [f"source {revision}.{i}" for i in range(3)]
+        target = [f"target {revision}.0"] + [s for s in target if rng.random() > 0.15]
+        rng.shuffle(source)
+        encoder.encoded.clear()
+        assert store.compare("en.A.fr", MODEL, (revision, revision), source, target, threshold) == \
+            _brute_force(FakeEncoder(), source, target, threshold)
+        added = [f"source {revision}.{i}" for i in range(3)] + [f"target {revision}.0"]
+        assert sorted(encoder.encoded) == sorted(added)
+
+
+def test_least_recently_used_comparisons_dropped():
+    store = ComparisonStore(max_comparisons=2, encode=FakeEncoder())
+    for title in ["A", "B", "C"]:
+        store.compare(f"en.{title}.fr", MODEL, (1, 1), ["one", "two"], ["un"], 0.5)
+    assert store.unchanged("en.A.fr", MODEL, (1, 1)) is None
+    assert store.unchanged("en.C.fr", MODEL, (1, 1)) is not None
+    assert store.unchanged("en.C.fr", "other-model", (1, 1)) is None
@@ -0,0 +1,101 @@
+import gzip
+
+import pytest
+
+from app.services import dump_store, mediawiki
+from app.services.dump_ingest import DumpStoreWriter, LanglinksReader, ingest, iter_langlinks
+
+pytest.importorskip("mwparserfromhell")
+
+DUMP = """<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.11/">
+  <siteinfo><sitename>Wikipedia</sitename></siteinfo>
+  <page>
+    <title>Alpha</title><ns>0</ns><id>10</id>
+    <revision><id>555</id><text>'''Alpha''' is a [[Greek alphabet|letter]].&lt;ref&gt;A source.&lt;/ref&gt; {{Infobox}}
+[[File:Alpha.svg|thumb|Caption]]
+
+== History ==
+It was [[used]] a lot.
+
+=== Early use ===
+Early text.
+
+[[Category:Letters]]</text></revision>
+  </page>
+  <page>
+    <title>Talk:Alpha</title><ns>1</ns><id>11</id>
+    <revision><id>556</id><text>Discussion</text></revision>
+  </page>
+  <page>
+    <title>Alfa</title><ns>0</ns><id>12</id><redirect title="Alpha" />
+    <revision><id>557</id><text>#REDIRECT [[Alpha]]</text></revision>
+  </page>
+</mediawiki>
+"""
+
+LANGLINKS = (
+    "INSERT INTO `langlinks` VALUES (10,'fr','Alpha (lettre)'),(10,'de','Alpha'),(10,'it','L\\'alfa');\n"
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    (tmp_path / "enwiki.xml").write_text(DUMP, encoding="utf-8")
+    with gzip.open(tmp_path / "langlinks.sql.gz", "wt", encoding="utf-8") as file:
+        file.write(LANGLINKS)
+    count = ingest(str(tmp_path / "store"), "en", str(tmp_path / "enwiki.xml"),
+                   str(tmp_path / "langlinks.sql.gz"), {"fr", "it"})
+    assert count == 2
+    dump_store.configure(str(tmp_path / "store"))
+    yield
+    dump_store.configure(None)
+
+
+def test_lookup(store):
+    """Articles are rendered as plain text and redirects and title normalization are followed"""
+    page = dump_store.lookup("en", "alfa")
+    assert page == {
+        "title": "Alpha",
+        "text": "Alpha is a letter.\n\nHistory\nIt was used a lot.\n\nEarly use\nEarly text.",
+        "langlinks": {"fr": "Alpha (lettre)", "it": "L'alfa"},
+        "lastrevid": 555,
+    }
+    assert dump_store.lookup("en", "Talk:Alpha") is None
+    assert dump_store.lookup("en", "Beta") is None
+    assert dump_store.lookup("fr", "Alpha") is None
+
+
+def test_query_pages_prefers_store(store, monkeypatch):
+    """Titles found in the store are not requested from Wikipedia"""
+    requested = []
+
+    def remote(lang, titles):
+        requested.extend(titles)
+        return {title: None for title in titles}
+
+    monkeypatch.setattr(mediawiki, "_query_remote_pages", remote)
+    pages = mediawiki.query_pages("en", ["Alpha", "Missing"])
+    assert pages["Alpha"]["lastrevid"] == 555
+    assert pages["Missing"] is None
+    assert requested == ["Missing"]
+
+
+def test_index_sorted_in_runs(tmp_path):
+    """Titles spilled to several sorted runs are merged, duplicates keeping their first occurrence"""
+    writer = DumpStoreWriter(str(tmp_path), "en", run_entries=2)
+    for index, title in enumerate(["Delta", "Alpha", "Charlie", "Alpha", "Bravo"]):
+        writer.add({"title": title, "text": str(index), "langlinks": {}, "lastrevid": index})
+    assert writer.close() == 4  # Titles stored
+    assert not list(tmp_path.glob("*.run"))
+
+    store = dump_store.DumpStore(str(tmp_path))
+    assert [store.get("en", title)["text"] for title in ["Alpha", "Bravo", "Charlie", "Delta"]] == ["1", "4", "2", "0"]
+    store.close()
+
+
+def test_langlinks_read_per_page(tmp_path):
+    path = tmp_path / "langlinks.sql"
+    path.write_text("INSERT INTO `langlinks` VALUES (3,'fr','Trois'),(5,'de','Fünf');\n"
+                    "INSERT INTO `langlinks` VALUES (5,'fr','Cinq'),(8,'de','Acht');\n", encoding="utf-8")
+    links = LanglinksReader(iter_langlinks(str(path), {"fr", "de"}))
+    assert [links.get(page) for page in (1, 5, 6, 8, 9)] == [{}, {"de": "Fünf", "fr": "Cinq"}, {}, {"de": "Acht"}, {}]
@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import content_source, mediawiki
+from app.services.article_parser import fetch_compact_article
+from app.services.fake_mediawiki import create_app, write_fixture
+
+HTML = '<p>Alpha is a letter.<sup class="reference"><a href="#cite_note-1">[1]</a></sup></p>' \
+       '<ol class="references"><li id="cite_note-1">A source.</li></ol>'
+
+
+@pytest.fixture
+def fake_wiki(tmp_path, monkeypatch):
+    write_fixture(str(tmp_path), "en", "Alpha", HTML, "Alpha is a letter.\n\n== History ==\nOld.",
+                  {"fr": "Alpha (lettre)"}, revid=42)
+    client = TestClient(create_app(str(tmp_path)))
+    content_source.configure(content_source.FAKE, "http://fake-wiki")
+    monkeypatch.setattr(mediawiki, "_session", lambda: client)
+    yield client
+    content_source.configure(content_source.LIVE)
+
+
+def test_query_pages_against_fake_server(fake_wiki):
+    """action=query fixtures are served in the MediaWiki format, with title normalization"""
+    pages = mediawiki.query_pages("en", ["alpha", "Missing"])
+    assert pages["alpha"] == {
+        "title": "Alpha",
+        "text": "Alpha is a letter.\n\nHistory\nOld.",
+        "langlinks": {"fr": "Alpha (lettre)"},
+        "lastrevid": 42,
+    }
+    assert pages["Missing"] is None
+    assert fake_wiki.get(content_source.main_page_url("en")).status_code == 200
+    assert fake_wiki.get(content_source.main_page_url("de")).status_code == 404
+
+
+def test_parse_against_fake_server(fake_wiki, monkeypatch):
+    """action=parse fixtures feed the structured article parser"""
+    monkeypatch.setattr("app.services.article_parser.requests.get", fake_wiki.get)
+    article = fetch_compact_article("Alpha", "en")
+    assert article.revision_id == 42
+    assert article.clean_content(0) == "Alpha is a letter."
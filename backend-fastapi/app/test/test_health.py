@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+from app.ai import semantic_comparison
+from app.main import app
+from app.services import warmup
+
+client = TestClient(app)
+
+
+def test_readiness_follows_warmup(monkeypatch):
+    """/healthz/live answers right away; /healthz/ready only once every model is loaded"""
+    loaded = []
+    monkeypatch.setattr(semantic_comparison, "load_model", loaded.append)
+    monkeypatch.setattr(warmup, "_warmup", warmup.Warmup())
+    warmup.configure(["test-model"], [])
+
+    assert client.get("/healthz/live").json() == {"status": "ok"}
+    response = client.get("/healthz/ready")
+    assert response.status_code == 503
+    assert response.json()["components"] == {"model:test-model": {"status": "pending"}}
+
+    warmup.start()
+    warmup._warmup.wait()
+    response = client.get("/healthz/ready")
+    assert response.status_code == 200
+    assert response.json()["progress"] == "1/1"
+    assert loaded == ["test-model"]
@@ -0,0 +1,149 @@
+import json
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import jobs
+
+SPEC = {"title": "Alpha", "source_lang": "en", "target_lang": "fr",
+        "model_name": "sentence-transformers/LaBSE", "comparison_threshold": 0.5}
+
+
+def _fake_fetch(spec):
+    if spec["title"] == "Missing":
+        raise jobs._ItemError("Article 'Missing' not found in 'en'.")
+    return f"{spec['title']}. Second.", f"{spec['title']} (fr).", (None, None)
+
+
+def _fake_compare(key, model_name, revisions, source_sentences, target_sentences, sim_threshold):
+    return [1], []
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    monkeypatch.setattr(jobs, "fetch_articles", _fake_fetch)
+    monkeypatch.setattr(jobs, "preprocess_input", lambda text, lang: [s.strip() for s in text.split(".") if s.strip()])
+    monkeypatch.setattr(jobs.comparison_store, "compare", _fake_compare)
+
+
+@pytest.fixture
+def runner(stages, tmp_path, monkeypatch):
+    runner = jobs.JobRunner(jobs.JobStore(str(tmp_path / "jobs.sqlite3")), fetch_workers=2)
+    runner.start()
+    monkeypatch.setattr(jobs, "_runner", runner)
+    yield runner
+    runner.stop()
+    runner.store.close()
+
+
+def _wait_until_completed(store, job_id):
+    deadline = time.time() + 5
+    while store.get_job(job_id)["status"] != jobs.COMPLETED:
+        assert time.time() < deadline, "job did not complete"
+        time.sleep(0.01)
+
+
+def test_job_api(runner):
+    """Jobs are processed in the background, with progress polling and NDJSON results"""
+    client = TestClient(app)
+    specs = [{**SPEC, "title": f"Article {index}"} for index in range(20)] + [{**SPEC, "title": "Missing"}]
+    response = client.post("/symmetry/v1/jobs", json={"specs": specs})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    _wait_until_completed(runner.store, job_id)
+
+    status = client.get(f"/symmetry/v1/jobs/{job_id}").json()
+    assert (status["total"], status["completed"], status["failed"], status["pending"]) == (21, 20, 1, 0)
+
+    response = client.get(f"/symmetry/v1/jobs/{job_id}/results")
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [result["index"] for result in results] == list(range(21))
+    assert results[0]["comparison"] == {
+        "left_article_array": ["Article 0", "Second"],
+        "right_article_array": ["Article 0 (fr)"],
+        "left_article_missing_info_index": [1],
+        "right_article_extra_info_index": [],
+    }
+    assert results[-1]["status"] == jobs.FAILED and "not found" in results[-1]["error"]
+
+    assert client.get("/symmetry/v1/jobs/unknown").status_code == 404
+
+
+def test_job_resumes_after_restart(stages, tmp_path):
+    """Items left pending by a previous process are picked up by a new runner"""
+    path = str(tmp_path / "jobs.sqlite3")
+    store = jobs.JobStore(path)
+    job_id = store.create_job([SPEC, {**SPEC, "title": "Beta"}])
+    store.finish_item(job_id, 0, result={"done": "before restart"})
+    store.close()
+
+    runner = jobs.JobRunner(jobs.JobStore(path), fetch_workers=1)
+    runner.start()
+    runner.resume()
+    try:
+        _wait_until_completed(runner.store, job_id)
+        results = list(runner.store.iter_results(job_id))
+        assert results[0]["comparison"] == {"done": "before restart"}
+        assert results[1]["comparison"]["left_article_array"] == ["Beta", "Second"]
+    finally:
+        runner.stop()
+        runner.store.close()
+
+
+def test_items_claimed_by_one_process(tmp_path):
+    """Two processes sharing the database never take the same item; items of stopped ones are taken back"""
+    path = str(tmp_path / "jobs.sqlite3")
+    first, second = jobs.JobStore(path), jobs.JobStore(path)
+    job_id = first.create_job([SPEC, {**SPEC, "title": "Beta"}])
+    try:
+        stopped = "999999999-1"  # The pid of no running process
+        assert [index for _, index, _ in first.claim_items(stopped)] == [0, 1]
+        assert second.claim_items(jobs.process_token()) == []
+        assert second.get_job(job_id)["pending"] == 2
+
+        # The owner of the items is gone: a resuming runner takes them back
+        runner = jobs.JobRunner(second, fetch_workers=1)
+        runner.resume()
+        assert second.owners() == [runner.owner]
+        assert first.claim_items(stopped) == []
+
+        # A previous process whose pid was reused by this one is gone too
+        previous = f"{os.getpid()}-previous run"
+        second.release_items([])
+        assert len(first.claim_items(previous)) == 2
+        assert not jobs._alive(previous) and jobs._alive(runner.owner)
+        runner.resume()
+        assert second.owners() == [runner.owner]
+    finally:
+        first.close()
+        second.close()
+
+
+def test_stage_errors_fail_the_item_only(runner, monkeypatch):
+    """Errors outside the comparison itself (e.g. the database) fail the item, not the stage threads"""
+    def unchanged(key, model_name, revisions):
+        if key.startswith("en.Broken."):
+            raise KeyError("model_name")
+        return None
+
+    finish_item = runner.store.finish_item
+    recorded = []
+
+    def flaky_finish_item(job_id, index, result=None, error=None):
+        if index == 1 and not recorded:
+            recorded.append(index)
+            raise jobs.sqlite3.OperationalError("database is locked")
+        finish_item(job_id, index, result=result, error=error)
+
+    monkeypatch.setattr(jobs.comparison_store, "unchanged", unchanged)
+    monkeypatch.setattr(runner.store, "finish_item", flaky_finish_item)
+    job_id = runner.submit([{**SPEC, "title": "Broken"}, SPEC, {**SPEC, "title": "Beta"}])
+    _wait_until_completed(runner.store, job_id)
+
+    results = list(runner.store.iter_results(job_id))
+    assert [result["status"] for result in results] == [jobs.FAILED, jobs.FAILED, jobs.DONE]
+    assert "database is locked" in results[1]["error"]
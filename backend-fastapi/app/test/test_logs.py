@@ -0,0 +1,35 @@
+import logging
+
+from app.services import logs
+from app.services.logs import SAMPLED_OUT, SamplingFilter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_sampled_queue_logging():
+    """Records go through the queue listener, and sampled loggers keep one record in N below WARNING"""
+    handler = ListHandler()
+    logs.setup_logging("INFO", {"test.sampled": 0.25}, handler=handler)
+    sampled = logging.getLogger("test.sampled")
+    before = SAMPLED_OUT.value(logger="test.sampled")
+    try:
+        for index in range(8):
+            sampled.info("event %d", index)
+        sampled.warning("never sampled")
+        logging.getLogger("test.other").info("kept")
+        logging.getLogger("test.other").debug("below the level")
+    finally:
+        logs.stop_logging()  # Drains the queue
+        logs.setup_logging("INFO", {"test.sampled": 1.0})
+
+    messages = [record.getMessage() for record in handler.records]
+    assert messages == ["event 0", "event 4", "never sampled", "kept"]
+    assert SAMPLED_OUT.value(logger="test.sampled") == before + 6
+    assert not any(isinstance(f, SamplingFilter) for f in sampled.filters)
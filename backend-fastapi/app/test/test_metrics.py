@@ -0,0 +1,64 @@
+from fastapi.testclient import TestClient
+
+from app.api.cache import ArticleCache, CACHE_EVICTIONS, CACHE_REQUESTS
+from app.main import app
+from app.services.metrics import Histogram, MetricsRegistry, STAGE_SECONDS, timed
+
+
+def test_histogram_rendering():
+    """Histograms render cumulative buckets with their sum and count"""
+    registry = MetricsRegistry()
+    latency = registry.register(Histogram("test_seconds", "Test latency.", ["stage"], buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, stage="parse")
+    lines = registry.render().splitlines()
+    assert 'test_seconds_bucket{stage="parse",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="parse",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+    assert 'test_seconds_sum{stage="parse"} 4.05' in lines
+    assert 'test_seconds_count{stage="parse"} 4' in lines
+
+
+def test_timed_stage():
+    """timed() records a stage duration as a context manager and as a decorator"""
+    before = STAGE_SECONDS.count(stage="test_stage")
+
+    @timed("test_stage")
+    def work():
+        return 42
+
+    assert work() == 42
+    with timed("test_stage"):
+        pass
+    assert STAGE_SECONDS.count(stage="test_stage") == before + 2
+
+
+def test_cache_bounded_by_bytes():
+    """Entries are evicted once their bodies and compressed variants exceed the size limit"""
+    cache = ArticleCache(max_size=10, name="test_bytes", max_bytes=10000)
+    first = cache.set("en.Alpha", "Alpha", {}, b"a" * 3000)
+    first["encoded"]["gzip"] = b"z" * 3000  # Compressed while it was served
+    cache.set("en.Beta", "Beta", {}, b"b" * 3000)
+    assert cache.get("en.Alpha")[0] == "Alpha"
+    cache.set("en.Gamma", "Gamma", {}, b"c" * 3000)
+    assert cache.get("en.Beta") == (None, None)  # Least recently used
+    assert [cache.get(key)[0] for key in ("en.Alpha", "en.Gamma")] == ["Alpha", "Gamma"]
+    assert cache.current_size <= 10000
+
+
+def test_cache_metrics():
+    """Cache hits, misses and evictions are counted and exported"""
+    cache = ArticleCache(max_size=1, name="test")
+    cache.get("en.Missing")
+    cache.set("en.Alpha", "Alpha text", {})
+    cache.get("en.Alpha")
+    cache.set("en.Beta", "Beta text", {})
+    assert CACHE_REQUESTS.value(cache="test", result="miss") == 1
+    assert CACHE_REQUESTS.value(cache="test", result="hit") == 1
+    assert CACHE_EVICTIONS.value(cache="test", reason="lru") == 1
+
+    metrics = TestClient(app).get("/metrics").text
+    assert 'symmetry_cache_requests_total{cache="test",result="hit"} 1' in metrics
+    assert 'symmetry_cache_bytes{cache="article"}' in metrics
+    assert 'symmetry_queue_depth{queue="prefetch"} 0' in metrics
+    assert "# TYPE symmetry_stage_duration_seconds histogram" in metrics
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import profiling
+from app.api.profiling import ID_HEADER, ProfilingMiddleware
+from app.services.profiler import ProfileStore
+
+
+def _profiled_app():
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+    app.include_router(profiling.router)
+
+    @app.get("/work")
+    def work():
+        deadline = time.perf_counter() + 0.05
+        while time.perf_counter() < deadline:
+            pass
+        return {"done": True}
+
+    return app
+
+
+def test_profile_trusted_request(tmp_path):
+    """Trusted requests carrying the header are profiled, others are served untouched"""
+    profiling.configure("testclient", str(tmp_path), interval=0.001)
+    client = TestClient(_profiled_app())
+
+    assert ID_HEADER not in client.get("/work").headers
+    response = client.get("/work", headers={"X-Symmetry-Profile": "speedscope"})
+    assert response.json() == {"done": True}
+    profile_id = response.headers[ID_HEADER]
+
+    profile = client.get(f"/symmetry/v1/profiles/{profile_id}").json()
+    assert profile["profiles"]
+    names = {frame["name"] for frame in profile["shared"]["frames"]}
+    assert "work" in names
+
+    collapsed = client.get("/work?_profile=collapsed").headers[ID_HEADER]
+    assert "work (" in client.get(f"/symmetry/v1/profiles/{collapsed}").text
+
+    # Forwarded by a proxy for an untrusted client
+    for header in ({"X-Forwarded-For": "203.0.113.7, testclient"}, {"Forwarded": 'for="[2001:db8::1]:4711"'}):
+        assert ID_HEADER not in client.get("/work", headers={"X-Symmetry-Profile": "speedscope", **header}).headers
+        assert client.get(f"/symmetry/v1/profiles/{profile_id}", headers=header).status_code == 403
+    assert ID_HEADER in client.get("/work?_profile=collapsed", headers={"X-Forwarded-For": "testclient"}).headers
+
+    profiling.configure("10.0.0.0/8", str(tmp_path))
+    assert ID_HEADER not in client.get("/work", headers={"X-Symmetry-Profile": "speedscope"}).headers
+    assert client.get(f"/symmetry/v1/profiles/{profile_id}").status_code == 403
+    profiling.configure("127.0.0.1,::1")
+
+
+def test_profile_retention(tmp_path):
+    """The profile directory is pruned oldest first to stay under its size cap, leaving other files alone"""
+    (tmp_path / "unrelated.txt").write_bytes(b"x" * 1000)
+    os.utime(tmp_path / "unrelated.txt", (0, 0))
+    (tmp_path / "subdirectory").mkdir()
+    store = ProfileStore(str(tmp_path), max_bytes=250)
+    for index in range(3):
+        store.save(f"{index:032x}", "speedscope", json.dumps({"pad": "x" * 90}).encode())
+        os.utime(os.path.join(str(tmp_path), f"{index:032x}.speedscope.json"), (index, index))
+    assert store.find(f"{0:032x}") is None
+    assert store.find(f"{2:032x}") is not None
+    assert (tmp_path / "unrelated.txt").exists() and (tmp_path / "subdirectory").is_dir()
+
+
+def test_profile_save_failure_keeps_response(tmp_path, monkeypatch):
+    """A profile that cannot be stored is logged; the request is answered as usual"""
+    profiling.configure("testclient", str(tmp_path), interval=0.001)
+
+    def fail(*args):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(profiling._store, "save", fail)
+    try:
+        response = TestClient(_profiled_app()).get("/work", headers={"X-Symmetry-Profile": "speedscope"})
+        assert response.status_code == 200 and response.json() == {"done": True}
+    finally:
+        profiling.configure("127.0.0.1,::1")
@@ -0,0 +1,57 @@
+import zlib
+
+import numpy as np
+
+from app.ai import section_comparison
+from app.models.wiki_structure import Section
+
+
+def _fake_encode(model_name, sentences):
+    # Bag of random word vectors, ignoring case: a sentence and its lowercased "translation" match
+    def word(text):
+        return np.random.default_rng(zlib.crc32(text.encode())).standard_normal(32)
+    return np.stack([sum(word(w) for w in s.lower().replace(".", " ").split()) for s in sentences])
+
+
+def _sections(*sections):
+    return [Section(title=title, raw_content=content, clean_content=content) for title, content in sections]
+
+
+SOURCE = _sections(("Lead section", "Alpha one. Beta two."),
+                   ("History", "Gamma three. Delta four. Moved five."),
+                   ("Legacy", "Zeta six."),
+                   ("Trivia", "Eta eight."))
+TARGET = _sections(("Lead section", "alpha one. beta two."),
+                   ("history", "gamma three. new seven."),
+                   ("legacy", "zeta six. moved five."))
+
+
+def test_section_aligned_comparison(monkeypatch):
+    """Sentences are compared within aligned sections, with moved sentences found by the fallback"""
+    monkeypatch.setattr(section_comparison, "encode_sentences", _fake_encode)
+    source, target, missing, extra, sections = section_comparison.section_compare(
+        "model", SOURCE, TARGET, "xx", "yy", 0.9)
+    assert source[4] == "Moved five" and target[5] == "moved five"
+    assert missing == [3, 6]  # Delta four, Eta eight
+    assert extra == [3]  # new seven
+
+    assert [(s["source_section"], s["target_section"]) for s in sections] == [
+        ("Lead section", "Lead section"), ("History", "history"), ("Legacy", "legacy"), ("Trivia", None)]
+    history = sections[1]
+    assert (history["source_range"], history["target_range"]) == ([2, 5], [2, 4])
+    assert (history["missing_info_index"], history["extra_info_index"]) == ([3], [3])
+    assert sections[3]["missing_info_index"] == [6] and sections[3]["alignment_similarity"] is None
+
+    # Without the global fallback, the moved sentence is missing from its section on both sides
+    _, _, missing, extra, _ = section_comparison.section_compare(
+        "model", SOURCE, TARGET, "xx", "yy", 0.9, global_fallback=False)
+    assert missing == [3, 4, 6]
+    assert extra == [3, 5]
+
+
+def test_align_sections_one_to_one():
+    similarities = np.array([[0.9, 0.8, 0.1],
+                             [0.95, 0.7, 0.2],
+                             [0.1, 0.2, 0.3]])
+    pairs = section_comparison.align_sections(similarities, 0.5)
+    assert [(source, target) for source, target, _ in pairs] == [(0, 1), (1, 0)]
@@ -0,0 +1,103 @@
+import numpy as np
+
+from app.ai import semantic_comparison
+
+
+def test_encode_sentences_dedupes(monkeypatch):
+    """Each distinct sentence is encoded once; embeddings are scattered back to every position"""
+    encoded = []
+
+    def fake_encode(model_name, sentences):
+        encoded.extend(sentences)
+        return np.array([[len(s), 1.0] for s in sentences], dtype=np.float32)
+
+    monkeypatch.setattr(semantic_comparison, "_encode_unique", fake_encode)
+    sentences = ["One  sentence.", "", "One sentence.", " . ", "Two\nwords", "One sentence."]
+    embeddings = semantic_comparison.encode_sentences("model", sentences)
+
+    assert encoded == ["One sentence.", "Two words"]
+    assert embeddings.shape == (6, 2)
+    assert np.array_equal(embeddings[0], embeddings[2]) and np.array_equal(embeddings[0], embeddings[5])
+    assert not embeddings[1].any() and not embeddings[3].any()
+
+    # Dropped fragments are never reported as differences
+    other = np.array([[0.0, 1.0]], dtype=np.float32)
+    assert semantic_comparison.sentences_diff(sentences, embeddings, other, 0.9)[1] == [0, 2, 4, 5]
+
+
+def test_length_batches():
+    """Batches hold sentences of similar length, under the token budget once padded"""
+    lengths = np.array([5, 40, 6, 38, 100, 7, 39, 5])
+    batches = semantic_comparison.length_batches(lengths, batch_tokens=80, batch_size=3)
+    assert [lengths[batch].tolist() for batch in batches] == [[100], [40, 39], [38, 7], [6, 5, 5]]
+    assert sorted(np.concatenate(batches).tolist()) == list(range(8))
+
+
+class FakeTokenizer:
+    """A tokenizer of words, adding [CLS] and [SEP]."""
+    vocabulary = ["[PAD]", "[CLS]", "[SEP]", "a"] + [f"w{index}" for index in range(10)]
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def __call__(self, sentences, add_special_tokens, verbose):
+        ids = [[self.vocabulary.index(word) for word in s.split()] for s in sentences]
+        return {"input_ids": [[1] + i + [2] if add_special_tokens else i for i in ids]}
+
+    def pad(self, encoded, return_tensors):
+        import torch
+        width = max(len(ids) for ids in encoded["input_ids"])
+        input_ids = torch.tensor([ids + [0] * (width - len(ids)) for ids in encoded["input_ids"]])
+        return {"input_ids": input_ids, "attention_mask": (input_ids != 0).long()}
+
+
+class FakeModel:
+    """An encoder counting words, with a max sequence length of 6, taking text or token ids."""
+    device = "cpu"
+
+    def __init__(self):
+        self.tokenizer = FakeTokenizer()
+        self.inputs = []
+
+    def get_max_seq_length(self):
+        return 6
+
+    def encode(self, sentences, batch_size, convert_to_numpy):
+        self.inputs.extend(sentences)
+        vocabulary = self.tokenizer.vocabulary
+        return np.array([[s.split().count(word) for word in vocabulary] for s in sentences], dtype=np.float32)
+
+    def __call__(self, features):
+        import torch
+        # Inputs longer than the max length would be truncated
+        assert features["input_ids"].shape[1] <= self.get_max_seq_length()
+        self.inputs.extend(" ".join(self.tokenizer.vocabulary[i] for i in ids if i > 2)
+                           for ids in features["input_ids"].tolist())
+        counts = torch.nn.functional.one_hot(features["input_ids"], len(self.tokenizer.vocabulary)).sum(dim=1)
+        counts[:, :3] = 0  # Special and padding tokens
+        return {"sentence_embedding": counts.float()}
+
+
+def test_batched_encode_windows_long_sentences(monkeypatch):
+    """Over-length sentences are encoded as overlapping windows whose embeddings are pooled"""
+    monkeypatch.setattr(semantic_comparison, "WINDOW_OVERLAP", 1)
+    model = FakeModel()
+    long_sentence = " ".join(f"w{index}" for index in range(10))
+    embeddings = semantic_comparison.batched_encode(model, ["w1 w2", long_sentence, "w3"])
+
+    # 4 tokens fit with the special tokens: the long sentence is split in 3 windows
+    assert sorted(model.inputs) == sorted(["w1 w2", "w3", "w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"])
+    assert np.array_equal(embeddings[0], model.encode(["w1 w2"], 1, True)[0])
+    windows = model.encode(["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"], 3, True)
+    assert np.allclose(embeddings[1], windows.mean(axis=0))
+
+    # Overlaps of half a window or more are clamped, instead of windows advancing one token at a time
+    monkeypatch.setattr(semantic_comparison, "WINDOW_OVERLAP", 32)
+    model = FakeModel()
+    semantic_comparison.batched_encode(model, [long_sentence])
+    assert sorted(model.inputs) == ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"]
+
+    monkeypatch.setattr(semantic_comparison, "WINDOWED_ENCODING", False)
+    model = FakeModel()
+    semantic_comparison.batched_encode(model, [long_sentence])
+    assert model.inputs == [long_sentence]  # Truncated by the model
@@ -0,0 +1,65 @@
+import multiprocessing
+
+import numpy as np
+
+from app.api import cache
+from app.services import shared_cache
+from app.services.shared_cache import SharedCache
+
+
+def _write_from_child(path):
+    SharedCache(path, size=4096, slots=64).put("child:key", b"written by the child")
+
+
+def test_shared_cache_across_processes(tmp_path):
+    """Values written by one process are read by another; overwritten values become misses"""
+    path = str(tmp_path / "cache")
+    store = SharedCache(path, size=4096, slots=64)
+    process = multiprocessing.get_context("fork").Process(target=_write_from_child, args=(path,))
+    process.start()
+    process.join()
+    assert store.get("child:key")[0] == b"written by the child"
+    assert store.get("missing") is None
+
+    store.put("first", b"x" * 1000)
+    for index in range(10):
+        store.put(f"filler {index}", b"y" * 1000)
+    assert store.get("first") is None  # The ring wrapped around it
+    assert store.get("filler 9")[0] == b"y" * 1000
+
+    embeddings = np.arange(12, dtype=np.float32).reshape(3, 4)
+    assert np.array_equal(shared_cache.unpack_array(shared_cache.pack_array(embeddings)), embeddings)
+    store.close()
+
+
+def test_article_cache_second_tier(tmp_path):
+    """An article cached by another worker is served from the shared cache"""
+    shared_cache.configure(str(tmp_path / "cache"), size=1024 * 1024, slots=64)
+    try:
+        cache.set_cached_article("en.Shared", "Shared text", {"fr": "Partagé"}, b'{"sourceArticle": 1}', '"etag"')
+        cache._article_cache.cache.clear()  # As seen from a worker that never fetched it
+
+        entry = cache.get_cached_article_entry("en.Shared")
+        assert entry["content"] == "Shared text"
+        assert entry["languages"] == {"fr": "Partagé"}
+        assert entry["body"] == b'{"sourceArticle": 1}'
+        assert entry["etag"] == '"etag"'
+        assert cache.get_cached_article("en.Other") == (None, None)
+    finally:
+        shared_cache.configure("")
+        cache._article_cache.cache.clear()
+
+
+def test_other_dimensions_replace_the_file(tmp_path):
+    """A cache opened with other dimensions gets a new file, leaving the mapped one intact"""
+    path = str(tmp_path / "cache")
+    old = SharedCache(path, size=4096, slots=64)
+    old.put("kept", b"still readable")
+    new = SharedCache(path, size=8192, slots=64)
+    assert old.get("kept")[0] == b"still readable"
+    assert new.get("kept") is None
+    new.put("new", b"value")
+    assert SharedCache(path, size=8192, slots=64).get("new")[0] == b"value"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["cache"]
+    old.close()
+    new.close()
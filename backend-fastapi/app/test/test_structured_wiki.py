@@ -0,0 +1,61 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import structured_wiki
+from app.main import app
+from app.services import article_parser
+from app.test.test_article_parser import SAMPLE_HTML
+
+
+class _FakeParseResponse:
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"parse": {"title": "Fonda Theatre", "revid": 123456, "text": {"*": SAMPLE_HTML}}}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(article_parser.requests, "get", lambda *args, **kwargs: _FakeParseResponse())
+    structured_wiki.structured_cache.clear()
+    yield TestClient(app)
+    structured_wiki.structured_cache.clear()
+
+
+@pytest.mark.parametrize("endpoint", ["structured-article", "citation-analysis", "reference-analysis"])
+def test_conditional_request_returns_304(client, endpoint):
+    """A repeat request carrying the ETag is answered with 304 and no body"""
+    url = f"/symmetry/v1/wiki/{endpoint}"
+    first = client.get(url, params={"query": "Fonda Theatre"})
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert "en-123456" in etag
+    assert first.headers["cache-control"].startswith("public, max-age=")
+
+    second = client.get(url, params={"query": "Fonda Theatre"}, headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == etag
+
+    stale = client.get(url, params={"query": "Fonda Theatre"}, headers={"If-None-Match": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == first.content
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_cached_response_is_precompressed(client, encoding):
+    """Cache hits are sent compressed, with a per-encoding ETag, and compressed only once"""
+    url = "/symmetry/v1/wiki/structured-article"
+    plain = client.get(url, params={"query": "Fonda Theatre"}, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+
+    compressed = client.get(url, params={"query": "Fonda Theatre"}, headers={"Accept-Encoding": encoding})
+    assert compressed.headers["content-encoding"] == encoding
+    assert compressed.headers["etag"] == plain.headers["etag"][:-1] + f'-{encoding}"'
+    assert compressed.content == plain.content  # httpx decodes the body
+
+    entry = structured_wiki.structured_cache["en.Fonda Theatre"]["bodies"]["structured-article"]
+    stored = entry["encoded"][encoding]
+    client.get(url, params={"query": "Fonda Theatre"}, headers={"Accept-Encoding": encoding})
+    assert entry["encoded"][encoding] is stored
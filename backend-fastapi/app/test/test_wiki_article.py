@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import wiki_article
+from app.api.cache import get_cached_article
+from app.main import app
+from app.services import mediawiki, prefetch
+
+
+class _FakeSession:
+    """Answers action=query requests like MediaWiki, returning one extract per response."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get(self, url, params=None, timeout=None):
+        self.requests.append((url, params))
+        titles = params["titles"].split("|")
+        done = int(params.get("excontinue", 0))
+        pages = []
+        for index, title in enumerate(titles):
+            if title.startswith("Missing"):
+                pages.append({"title": title, "missing": True})
+                continue
+            page = {"title": title, "lastrevid": 1000 + index}
+            if index == done:
+                page["extract"] = f"{title} lead.\n\n== History ==\n{title} history.\n"
+            if not done:
+                page["langlinks"] = [{"lang": "fr", "title": f"{title} (fr)"}, {"lang": "de", "title": title}]
+            pages.append(page)
+        data = {"query": {"pages": pages}}
+        if done + 1 < len(titles):
+            data["continue"] = {"excontinue": done + 1, "continue": "||langlinks|info"}
+        return _FakeResponse(data)
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+@pytest.fixture
+def session(monkeypatch):
+    fake = _FakeSession()
+    monkeypatch.setattr(mediawiki, "_session", lambda: fake)
+    monkeypatch.setitem(wiki_article.language_cache, "en", True)
+    monkeypatch.setitem(wiki_article.language_cache, "fr", True)
+    return fake
+
+
+def test_query_pages_follows_continuations(session):
+    """Extracts returned over several continuations are merged per page"""
+    pages = mediawiki.query_pages("en", ["Alpha", "Beta", "Missing page"])
+    assert pages["Alpha"]["text"] == "Alpha lead.\n\nHistory\nAlpha history."
+    assert pages["Beta"]["text"] == "Beta lead.\n\nHistory\nBeta history."
+    assert pages["Alpha"]["langlinks"] == {"fr": "Alpha (fr)", "de": "Alpha"}
+    assert pages["Beta"]["lastrevid"] == 1001
+    assert pages["Missing page"] is None
+
+
+def test_batch_endpoint(session):
+    """Batch requests are grouped by language, chunked to 50 titles and fill the cache"""
+    titles = [f"Batch {index}" for index in range(60)]
+    payload = {"articles": [{"lang": "en", "title": title} for title in titles] + [{"lang": "fr", "title": "Missing"}]}
+    response = TestClient(app).post("/symmetry/v1/wiki/articles:batch", json=payload)
+    assert response.status_code == 200
+
+    articles = response.json()["articles"]
+    assert [article["title"] for article in articles] == titles + ["Missing"]
+    assert articles[0]["found"] and articles[0]["articleLanguages"] == ["fr", "de"]
+    assert articles[-1] == {"lang": "fr", "title": "Missing", "found": False, "sourceArticle": None, "articleLanguages": [],
+                            "articleLanguageTitles": {}}
+
+    queried_titles = [params["titles"] for _, params in session.requests if "excontinue" not in params]
+    assert [len(batch.split("|")) for batch in queried_titles if "Missing" not in batch] == [50, 10]
+
+    content, languages = get_cached_article("en.Batch 59")
+    assert content == articles[59]["sourceArticle"]
+    # The first titles of the batch are not evicted by the later ones
+    content, languages = get_cached_article("en.Batch 0")
+    assert content == articles[0]["sourceArticle"]
+
+
+def test_article_endpoint_uses_single_query(session):
+    """A source article is fetched with one action=query request and returns per-language titles"""
+    response = TestClient(app).get("/symmetry/v1/wiki/articles", params={"query": "Gamma", "lang": "en"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "sourceArticle": "Gamma lead.\n\nHistory\nGamma history.",
+        "articleLanguages": ["fr", "de"],
+        "articleLanguageTitles": {"fr": "Gamma (fr)", "de": "Gamma"},
+    }
+    assert response.headers["etag"] == '"article-v1-en-1000"'
+    assert len(session.requests) == 1
+
+
+def test_prefetch_target_language(session, monkeypatch):
+    """The most requested target language is prefetched, so the follow-up request is a cache hit"""
+    prefetcher = prefetch.Prefetcher(top_languages=1, max_concurrent=2)
+    prefetcher.configure(enabled=True, top_languages=1, max_concurrent=2)
+    monkeypatch.setattr(prefetch, "_prefetcher", prefetcher)
+    prefetcher.record_request("fr")
+
+    client = TestClient(app)
+    assert client.get("/symmetry/v1/wiki/articles", params={"query": "Delta", "lang": "en"}).status_code == 200
+    prefetcher.wait(timeout=5)
+    assert [params["titles"] for _, params in session.requests] == ["Delta", "Delta (fr)"]
+
+    response = client.get("/symmetry/v1/wiki/articles", params={"query": "Delta (fr)", "lang": "fr"})
+    assert response.status_code == 200
+    assert response.json()["sourceArticle"].startswith("Delta (fr) lead.")
+    assert len(session.requests) == 2
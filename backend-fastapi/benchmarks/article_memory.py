@@ -0,0 +1,43 @@
+"""
+Measures the memory retained by one cached article in its pydantic form (Article with
+Section/Citation/Reference objects) and in its compact form (CompactArticle).
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.article_memory
+"""
+import gc
+import tracemalloc
+
+from app.services.article_parser import parse_compact_article
+from benchmarks.fixtures import make_article_html
+
+SIZES = [50, 200, 800]  # Paragraphs per synthetic article
+
+
+def retained_bytes(factory):
+    """Bytes still allocated after factory() returns, while its result is kept alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = factory()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def main():
+    print(f"{'paragraphs':>10} {'citations':>10} {'pydantic':>12} {'compact':>12} {'reduction':>10}")
+    for paragraphs in SIZES:
+        html = make_article_html(paragraphs, seed=paragraphs)
+        compact, compact_bytes = retained_bytes(lambda: parse_compact_article(html, "Benchmark", "en"))
+        article, pydantic_bytes = retained_bytes(compact.to_article)
+        print(
+            f"{paragraphs:>10} {compact.total_citations:>10} {pydantic_bytes:>12,} {compact_bytes:>12,} "
+            f"{pydantic_bytes / compact_bytes:>9.1f}x"
+        )
+        del article, compact
+
+
+if __name__ == "__main__":
+    main()
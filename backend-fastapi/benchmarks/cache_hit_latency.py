@@ -0,0 +1,98 @@
+"""
+Measures p50/p99 latency of cache-hit responses for /structured-article and /articles.
+
+"before" serves the cached pydantic response through FastAPI's response_model validation
+and JSON encoding, the way cache hits were served before the pre-serialized path.
+"after" requests the real routes, which answer cache hits with the stored JSON bytes.
+
+The caches are filled by cold requests to the fake MediaWiki server (benchmarks/fake_server.py).
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.cache_hit_latency
+"""
+import logging
+import statistics
+import tempfile
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import structured_wiki
+from app.api.cache import get_cached_article
+from app.main import app
+from app.model.response import SourceArticleResponse
+from app.model.structured_response import StructuredArticleResponse
+from benchmarks.fake_server import running_fake_mediawiki, write_synthetic_fixtures
+
+REQUESTS = 300
+PARAGRAPHS = 400
+
+
+def percentiles(client, path, params):
+    client.get(path, params=params)  # Warm up
+    timings = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        response = client.get(path, params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1], len(response.content)
+
+
+def build_before_app(structured_response, article_text, languages):
+    before = FastAPI()
+
+    @before.get("/structured-article", response_model=StructuredArticleResponse)
+    def cached_structured_article():
+        return structured_response
+
+    @before.get("/articles", response_model=SourceArticleResponse)
+    def cached_article():
+        return {"sourceArticle": article_text, "articleLanguages": languages}
+
+    return before
+
+
+def main():
+    logging.disable(logging.INFO)  # Keep per-request log lines out of the timings
+    with tempfile.TemporaryDirectory() as fixtures:
+        write_synthetic_fixtures(fixtures, ["Benchmark"], PARAGRAPHS)
+        with running_fake_mediawiki(fixtures):
+            run()
+
+
+def run():
+    after = TestClient(app)
+    # Cold requests, served by the fake MediaWiki server, fill the caches of the real routes
+    after.get("/symmetry/v1/wiki/structured-article", params={"query": "Benchmark"})
+    after.get("/symmetry/v1/wiki/articles", params={"query": "Benchmark"})
+
+    compact = structured_wiki.structured_cache["en.Benchmark"]["article"]
+    structured_response = StructuredArticleResponse(
+        title=compact.title,
+        lang=compact.lang,
+        source=compact.source,
+        sections=compact.sections(),
+        references=compact.reference_models(),
+        total_sections=compact.total_sections,
+        total_citations=compact.total_citations,
+        total_references=compact.analytics.total_references,
+    )
+    article_text, languages = get_cached_article("en.Benchmark")
+    before = TestClient(build_before_app(structured_response, article_text, list(languages)))
+
+    cases = [
+        ("structured-article", before, "/structured-article", after, "/symmetry/v1/wiki/structured-article"),
+        ("articles", before, "/articles", after, "/symmetry/v1/wiki/articles"),
+    ]
+    print(f"{'endpoint':<20} {'variant':<8} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>10}")
+    for name, before_client, before_path, after_client, after_path in cases:
+        for variant, client, path in (("before", before_client, before_path), ("after", after_client, after_path)):
+            p50, p99, size = percentiles(client, path, {"query": "Benchmark"})
+            print(f"{name:<20} {variant:<8} {p50:>8.2f} {p99:>8.2f} {size:>10,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures p50/p99 latency of cold (uncached) requests, served by the fake MediaWiki server
+with a fixed upstream latency, for /articles, /structured-article and /articles:batch.
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.cold_fetch_latency [--latency-ms 50]
+"""
+import argparse
+import logging
+import statistics
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+from app.api import structured_wiki
+from app.api.cache import _article_cache
+from app.main import app
+from benchmarks.fake_server import running_fake_mediawiki, write_synthetic_fixtures
+
+TITLES = [f"Cold {index}" for index in range(60)]
+PARAGRAPHS = 60
+
+
+def timed(request):
+    start = time.perf_counter()
+    response = request()
+    assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) * 1000
+
+
+def report(name, timings):
+    timings = sorted(timings)
+    p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+    print(f"{name:<28} {statistics.median(timings):>8.1f} {p99:>8.1f} {len(timings):>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)  # Keep per-request log lines out of the timings
+    with tempfile.TemporaryDirectory() as fixtures:
+        write_synthetic_fixtures(fixtures, TITLES, PARAGRAPHS)
+        with running_fake_mediawiki(fixtures, latency=args.latency_ms / 1000):
+            client = TestClient(app)
+            client.get("/symmetry/v1/wiki/articles", params={"query": TITLES[0]})  # Validates the language
+
+            print(f"upstream latency {args.latency_ms:.0f} ms")
+            print(f"{'request':<28} {'p50 ms':>8} {'p99 ms':>8} {'requests':>8}")
+            _article_cache.cache.clear()
+            report("articles", [
+                timed(lambda: client.get("/symmetry/v1/wiki/articles", params={"query": title}))
+                for title in TITLES
+            ])
+            structured_wiki.structured_cache.clear()
+            report("structured-article", [
+                timed(lambda: client.get("/symmetry/v1/wiki/structured-article", params={"query": title}))
+                for title in TITLES
+            ])
+            _article_cache.cache.clear()
+            payload = {"articles": [{"lang": "en", "title": title} for title in TITLES]}
+            report(f"articles:batch ({len(TITLES)} titles)", [
+                timed(lambda: client.post("/symmetry/v1/wiki/articles:batch", json=payload))
+            ])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Measures cold start of the backend: the time from launching the process to its first successful
+/healthz/live response and to its first successful /symmetry/v1/wiki/articles response, served
+from the fake MediaWiki server so the network does not count.
+
+Works on the source tree (the default command) or on a frozen build (see main.spec):
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.cold_start [--repeats 5]
+    python -m benchmarks.cold_start --command dist/symmetry-backend/symmetry-backend
+"""
+import argparse
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from benchmarks.fake_server import _free_port, running_fake_mediawiki, write_synthetic_fixtures
+
+TITLE = "Cold Start"
+POLL_INTERVAL = 0.01
+
+
+def _succeeds(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status == 200
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return False
+
+
+def launch_once(command, env, port, timeout):
+    """Launch the backend; returns the seconds to the first live and first article responses."""
+    base = f"http://127.0.0.1:{port}"
+    article_url = f"{base}/symmetry/v1/wiki/articles?query={urllib.parse.quote(TITLE)}"
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    live = None
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"Backend exited with status {process.returncode}:\n"
+                                   f"{process.stderr.read().decode(errors='replace')[-2000:]}")
+            if live is None and _succeeds(f"{base}/healthz/live"):
+                live = time.perf_counter() - started
+            if live is not None and _succeeds(article_url):
+                return live, time.perf_counter() - started
+            time.sleep(POLL_INTERVAL)
+        raise RuntimeError(f"No successful response within {timeout} s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--command", default=f"{shlex.quote(sys.executable)} -m app.main",
+                        help="Command launching the backend (default: the source tree)")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--warmup", action="store_true",
+                        help="Keep the background model warmup on (it does not block the first response)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as fixtures:
+        write_synthetic_fixtures(fixtures, [TITLE], 30, languages=("en",))
+        with running_fake_mediawiki(fixtures) as base_url:
+            lives, articles = [], []
+            for _ in range(args.repeats):
+                port = _free_port()
+                env = {
+                    **os.environ,
+                    "CONTENT_SOURCE": "fake",
+                    "FAKE_MEDIAWIKI_URL": base_url,
+                    "PORT": str(port),
+                    "LOG_LEVEL": "WARNING",
+                }
+                if not args.warmup:
+                    env.update({"WARMUP_MODELS": "", "WARMUP_SPACY_LANGUAGES": ""})
+                live, article = launch_once(shlex.split(args.command), env, port, args.timeout)
+                lives.append(live)
+                articles.append(article)
+
+    print(f"{'':<28} {'median s':>9} {'min s':>9} {'max s':>9}")
+    for name, timings in (("launch -> /healthz/live", lives), ("launch -> first article", articles)):
+        print(f"{name:<28} {statistics.median(timings):>9.3f} {min(timings):>9.3f} {max(timings):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Measures lookup latency of the local dump store (app/services/dump_store.py).
+
+Writes a store of synthetic articles to a temporary directory, then times lookups of random
+titles (p50/p99), each a binary search over the memory-mapped index plus one JSON decode.
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.dump_store_lookup
+"""
+import random
+import statistics
+import tempfile
+import time
+
+from app.services.dump_store import DumpStore
+from app.services.dump_ingest import DumpStoreWriter
+
+ARTICLES = 200000
+LOOKUPS = 20000
+TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 40  # About 2 KB per article
+
+
+def main():
+    rng = random.Random(0)
+    titles = [f"Article {rng.getrandbits(48):x} {index}" for index in range(ARTICLES)]
+    with tempfile.TemporaryDirectory() as directory:
+        writer = DumpStoreWriter(directory, "en")
+        for index, title in enumerate(titles):
+            writer.add({"title": title, "text": TEXT, "langlinks": {"fr": title}, "lastrevid": index})
+        writer.close()
+
+        store = DumpStore(directory)
+        store.get("en", titles[0])  # Opens the mapped files
+        timings = []
+        for title in rng.choices(titles, k=LOOKUPS):
+            start = time.perf_counter()
+            page = store.get("en", title)
+            timings.append((time.perf_counter() - start) * 1e6)
+            assert page is not None
+        store.close()
+
+    timings.sort()
+    print(f"{ARTICLES} articles, {LOOKUPS} lookups: "
+          f"p50 {statistics.median(timings):.1f} us, p99 {timings[int(len(timings) * 0.99) - 1]:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
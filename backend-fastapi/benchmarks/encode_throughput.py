@@ -0,0 +1,86 @@
+"""
+Measures encoding throughput (sentences per second) of every model in comparison_models, with
+SentenceTransformer.encode's defaults (fixed batches of 32) and with the length-sorted,
+token-budget batching of batched_encode (app/ai/semantic_comparison.py) for a few budgets.
+
+Sentences come from the articles in app/testdata, repeated up to --sentences. Models that cannot
+be loaded (e.g. no network access) are reported and skipped; --synthetic-model runs offline with
+a randomly initialised model with the architecture of LaBSE (see benchmarks/prefork_rss.py).
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.encode_throughput [--sentences 1000] [--batch-tokens 512 1024 4096]
+        [--batch-size 64] [--threads N] [--synthetic-model]
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+
+from app.ai import semantic_comparison
+
+TESTDATA = os.path.join(os.path.dirname(__file__), "..", "app", "testdata", "*.txt")
+
+
+def load_sentences(count):
+    sentences = []
+    for path in sorted(glob.glob(TESTDATA)):
+        with open(path, encoding="utf-8") as file:
+            sentences.extend(semantic_comparison.universal_sentences_split(file.read().replace("\n", ".")))
+    return [sentences[index % len(sentences)] for index in range(count)]
+
+
+def throughput(encode, sentences, repeats):
+    encode(sentences[:8])  # Warm up
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        encode(sentences)
+        best = min(best, time.perf_counter() - started)
+    return len(sentences) / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, default=1000)
+    parser.add_argument("--batch-tokens", type=int, nargs="+", default=[512, 1024, 4096])
+    parser.add_argument("--batch-size", type=int, default=semantic_comparison.ENCODE_BATCH_SIZE)
+    parser.add_argument("--threads", type=int, default=0, help="torch threads (default: torch's default)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--synthetic-model", action="store_true",
+                        help="Only measure a random model with LaBSE's architecture, without downloading anything")
+    args = parser.parse_args(argv)
+
+    sentences = load_sentences(args.sentences)
+    models = semantic_comparison.comparison_models
+    with tempfile.TemporaryDirectory() as hf_home:
+        if args.synthetic_model:
+            from benchmarks.prefork_rss import write_synthetic_model
+
+            os.environ.update({"HF_HOME": hf_home, "HF_HUB_OFFLINE": "1"})
+            write_synthetic_model(hf_home)
+            models = [semantic_comparison.DEFAULT_MODEL]
+        if args.threads:
+            import torch
+            torch.set_num_threads(args.threads)
+
+        print(f"{len(sentences)} sentences")
+        print(f"{'model':<36} {'batching':<22} {'sentences/s':>12}")
+        for model_name in models:
+            try:
+                model = semantic_comparison.load_model(model_name)
+            except Exception as e:
+                print(f"{model_name:<36} unavailable: {type(e).__name__}: {str(e).splitlines()[0][:60]}")
+                continue
+            rate = throughput(model.encode, sentences, args.repeats)
+            print(f"{model_name:<36} {'default (32)':<22} {rate:>12.1f}", flush=True)
+            for batch_tokens in args.batch_tokens:
+                semantic_comparison.configure(batch_tokens=batch_tokens, batch_size=args.batch_size)
+                rate = throughput(lambda s: semantic_comparison.batched_encode(model, s), sentences, args.repeats)
+                label = f"{batch_tokens} tokens/{args.batch_size}"
+                print(f"{model_name:<36} {label:<22} {rate:>12.1f}", flush=True)
+            semantic_comparison.unload_models()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Runs the fake MediaWiki server (app/services/fake_mediawiki.py) for the benchmarks, so they
+exercise the real fetch paths without touching Wikipedia.
+
+    with running_fake_mediawiki(fixtures_dir, latency=0.05):
+        ...  # Every Wikipedia request of the service now goes to the fake server
+"""
+import contextlib
+import socket
+import threading
+import time
+
+import uvicorn
+
+from app.api import wiki_article
+from app.services import content_source
+from app.services.fake_mediawiki import create_app, write_fixture
+from benchmarks.fixtures import make_article_html
+
+
+def write_synthetic_fixtures(directory, titles, paragraphs, languages=("en", "fr")):
+    """Write one fixture per title and language, linked to each other through their langlinks."""
+    for lang in languages:
+        for index, title in enumerate(titles):
+            localized = title if lang == languages[0] else f"{title} ({lang})"
+            langlinks = {other: (title if other == languages[0] else f"{title} ({other})")
+                         for other in languages if other != lang}
+            html = make_article_html(paragraphs, seed=index, lang=lang)
+            extract = "\n".join(
+                f"== Section {section} ==\n" + " ".join(f"Sentence {section}.{n} of {localized}." for n in range(20))
+                for section in range(paragraphs // 6 + 1)
+            )
+            write_fixture(directory, lang, localized, html, extract, langlinks, revid=1000 + index)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def running_fake_mediawiki(fixtures, latency=0.0, jitter=0.0):
+    """Serve the fixtures on a local port and point the content source at it."""
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(fixtures, latency, jitter), host="127.0.0.1", port=port, log_level="warning"
+    ))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+
+    base_url = f"http://127.0.0.1:{port}"
+    content_source.configure(content_source.FAKE, base_url)
+    wiki_article.language_cache.clear()
+    try:
+        yield base_url
+    finally:
+        content_source.configure(content_source.LIVE)
+        wiki_article.language_cache.clear()
+        server.should_exit = True
+        thread.join()
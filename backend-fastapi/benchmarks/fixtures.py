@@ -0,0 +1,64 @@
+"""
+Synthetic fixtures for the benchmarks, so they run without network access.
+
+make_article_html() produces HTML shaped like the output of MediaWiki's action=parse:
+headings, paragraphs with internal links, reference markers and a reference list.
+make_article_text() produces plain article text, shaped like the MediaWiki API's extracts,
+in several languages.
+"""
+import random
+
+
+def make_article_html(paragraphs: int, seed: int = 0, lang: str = "en") -> str:
+    rng = random.Random(seed)
+    parts = []
+    for index in range(paragraphs):
+        if index and index % 6 == 0:
+            parts.append(f"<h2>Section {index // 6}</h2>")
+        sentences = []
+        for sentence in range(rng.randint(3, 8)):
+            words = " ".join(f"word{rng.randint(0, 5000)}" for _ in range(rng.randint(6, 24)))
+            target = rng.randint(0, 400)
+            sentences.append(
+                f'{words} <a href="/wiki/Target_{target}" title="Target {target}">target {target}</a> {words[:40]}.'
+            )
+            if rng.random() < 0.4:
+                note = rng.randint(1, 200)
+                sentences.append(f'<sup class="reference"><a href="#cite_note-{note}">[{note}]</a></sup>')
+        parts.append("<p>" + " ".join(sentences) + "</p>")
+
+    parts.append('<ol class="references">')
+    for note in range(1, 201):
+        parts.append(
+            f'<li id="cite_note-{note}"><span class="mw-cite-backlink">^</span> '
+            f'Author {note}, <i>Book {note}</i> ({lang}). '
+            f'<a href="https://example.org/source/{note}">Online</a></li>'
+        )
+    parts.append("</ol>")
+    return "\n".join(parts)
+
+
+# A few common words per language, enough to give sentences realistic lengths and scripts
+VOCABULARY = {
+    "en": "the history of city river was built during century king people first war new museum".split(),
+    "fr": "la histoire de ville fleuve fut construit pendant siècle roi peuple première guerre nouveau musée".split(),
+    "de": "die Geschichte der Stadt Fluss wurde gebaut während Jahrhundert König Volk erste Krieg neues Museum".split(),
+    "es": "la historia de ciudad río fue construido durante siglo rey pueblo primera guerra nuevo museo".split(),
+    "ru": "история города река была построена во время века король народ первая война новый музей".split(),
+}
+LANGUAGES = tuple(VOCABULARY)
+
+
+def make_article_text(sentences: int, lang: str = "en", seed: int = 0) -> str:
+    """Plain article text with the given number of sentences, split into paragraphs and sections."""
+    rng = random.Random(seed)
+    words = VOCABULARY[lang]
+    parts = []
+    for index in range(sentences):
+        if index and index % 40 == 0:
+            parts.append(f"\n\nSection {index // 40}\n")
+        elif index and index % 5 == 0:
+            parts.append("\n\n")
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 28)))
+        parts.append(sentence[0].upper() + sentence[1:] + f" {rng.randint(1000, 2025)}. ")
+    return "".join(parts).strip()
@@ -0,0 +1,79 @@
+"""
+Measures how long a fresh interpreter takes to import app.main (what a worker pays before it can
+answer /healthz/live), lists the slowest imports from python -X importtime, and checks that none
+of the heavy ML libraries are imported at startup.
+
+Exits with status 1 when the median import time exceeds --max-seconds or a heavy library is
+imported eagerly, so it can gate CI.
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.import_time [--repeats 5] [--max-seconds 3]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULE = "app.main"
+# Libraries that must only be imported on first use (see app/ai/semantic_comparison.py)
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "sklearn", "spacy", "ollama")
+
+_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import {MODULE}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def measure_once():
+    output = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(count):
+    """The (cumulative microseconds, module) of the slowest top-level imports of app.main."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {MODULE}"],
+                            capture_output=True, text=True, check=True).stderr
+    timings = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        timings.append((int(cumulative), name.rstrip()))
+    return sorted(timings, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=3.0)
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest imports listed")
+    args = parser.parse_args(argv)
+
+    runs = [measure_once() for _ in range(args.repeats)]
+    timings = [run["seconds"] for run in runs]
+    heavy = sorted({module for run in runs for module in run["heavy"]})
+    median = statistics.median(timings)
+
+    print(f"import {MODULE}: median {median:.3f} s, min {min(timings):.3f} s, max {max(timings):.3f} s "
+          f"({args.repeats} runs)")
+    print("\nSlowest imports (cumulative):")
+    for microseconds, name in slowest_imports(args.top):
+        print(f"  {microseconds / 1e6:>8.3f} s  {name}")
+
+    failed = False
+    if heavy:
+        print(f"\nHeavy modules imported at startup: {', '.join(heavy)}")
+        failed = True
+    if median > args.max_seconds:
+        print(f"\nImport time {median:.3f} s exceeds {args.max_seconds:.3f} s")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Measures the memory of the pre-fork launcher (app/services/prefork.py) with 1, 4 and 8 workers,
+with the models loaded before forking (shared copy-on-write) and, for comparison, loaded by
+every worker itself (--no-preload).
+
+For every run it waits until the workers report ready, then reads /proc/<pid>/smaps_rollup of
+the parent and each worker:
+
+    RSS  resident memory, counting shared pages in full in every process
+    PSS  proportional set size: shared pages divided between the processes sharing them
+    USS  private memory of the process, what it costs on top of the shared pages
+
+The sum of the PSS of all processes is what the whole server really uses. Linux only.
+
+Without network access, --synthetic-model writes a randomly initialised model with the
+architecture of LaBSE (the default model) to a temporary Hugging Face cache and runs offline.
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.prefork_rss [--workers 1 4 8] [--no-preload-workers 1 2] [--synthetic-model]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.fake_server import _free_port
+
+LABSE_VOCABULARY = 501153
+MB = 1024 * 1024
+
+
+def write_synthetic_model(hf_home, vocabulary=LABSE_VOCABULARY):
+    """A random BERT with LaBSE's shape, cached as sentence-transformers/LaBSE in hf_home."""
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    build = os.path.join(hf_home, "build")
+    os.makedirs(build, exist_ok=True)
+    with open(os.path.join(build, "vocab.txt"), "w") as file:
+        file.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+                             + [f"token{index}" for index in range(vocabulary - 5)]))
+    BertTokenizerFast(os.path.join(build, "vocab.txt")).save_pretrained(build)
+    BertModel(BertConfig(vocab_size=vocabulary)).save_pretrained(build)
+    model = SentenceTransformer(modules=[models.Transformer(build), models.Pooling(768, "cls"), models.Normalize()])
+
+    revision = "0" * 40
+    repository = os.path.join(hf_home, "hub", "models--sentence-transformers--LaBSE")
+    model.save(os.path.join(repository, "snapshots", revision))
+    os.makedirs(os.path.join(repository, "refs"), exist_ok=True)
+    with open(os.path.join(repository, "refs", "main"), "w") as file:
+        file.write(revision)
+
+
+def memory(pid):
+    """(RSS, PSS, USS) of a process in bytes."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as file:
+        for line in file:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return fields["Rss"], fields["Pss"], fields["Private_Clean"] + fields["Private_Dirty"]
+
+
+def children(pid):
+    output = subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout
+    return [int(child) for child in output.split()]
+
+
+def wait_until_ready(port, workers, process, timeout):
+    """Ready once enough consecutive /healthz/ready calls, spread over the workers, succeed."""
+    needed = 4 * workers
+    streak = 0
+    started = time.perf_counter()
+    while streak < needed:
+        if process.poll() is not None:
+            raise RuntimeError(f"Launcher exited with status {process.returncode}")
+        if time.perf_counter() - started > timeout:
+            raise RuntimeError(f"Workers not ready after {timeout} s")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz/ready", timeout=5) as response:
+                streak = streak + 1 if response.status == 200 else 0
+        except (urllib.error.URLError, ConnectionError):
+            streak = 0
+            time.sleep(0.2)
+
+
+def measure(workers, preload, env, timeout):
+    port = _free_port()
+    command = [sys.executable, "-m", "app.services.prefork", "--workers", str(workers), "--port", str(port)]
+    if not preload:
+        command.append("--no-preload")
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port, workers, process, timeout)
+        time.sleep(1)  # Let the workers settle after startup
+        worker_pids = children(process.pid)
+        parent = memory(process.pid)
+        per_worker = [memory(pid) for pid in worker_pids]
+    finally:
+        process.terminate()
+        process.wait(timeout=60)
+    return {
+        "workers": len(per_worker),
+        "rss": sum(m[0] for m in per_worker) / len(per_worker),
+        "pss": sum(m[1] for m in per_worker) / len(per_worker),
+        "uss": sum(m[2] for m in per_worker) / len(per_worker),
+        "parent_pss": parent[1],
+        "total_pss": parent[1] + sum(m[1] for m in per_worker),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--no-preload-workers", type=int, nargs="*", default=[1, 4, 8],
+                        help="Worker counts to also measure without pre-loading (each worker loads its own models)")
+    parser.add_argument("--synthetic-model", action="store_true",
+                        help="Use a random model with LaBSE's architecture instead of downloading LaBSE")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "WARMUP_MODELS": "sentence-transformers/LaBSE",
+           "WARMUP_SPACY_LANGUAGES": ""}
+    with tempfile.TemporaryDirectory() as hf_home:
+        if args.synthetic_model:
+            write_synthetic_model(hf_home)
+            env.update({"HF_HOME": hf_home, "HF_HUB_OFFLINE": "1"})
+
+        print(f"{'mode':<12} {'workers':>7} {'RSS/worker':>11} {'PSS/worker':>11} {'USS/worker':>11} "
+              f"{'parent PSS':>11} {'total PSS':>11}")
+        runs = [(workers, True) for workers in args.workers]
+        runs += [(workers, False) for workers in args.no_preload_workers]
+        for workers, preload in runs:
+            result = measure(workers, preload, env, args.timeout)
+            print(f"{'preload' if preload else 'no-preload':<12} {result['workers']:>7} "
+                  f"{result['rss'] / MB:>9.0f}MB {result['pss'] / MB:>9.0f}MB {result['uss'] / MB:>9.0f}MB "
+                  f"{result['parent_pss'] / MB:>9.0f}MB {result['total_pss'] / MB:>9.0f}MB", flush=True)
+
+
+if __name__ == "__main__":
+    main()
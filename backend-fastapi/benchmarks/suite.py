@@ -0,0 +1,263 @@
+"""
+Micro-benchmark suite for the comparison and parsing hot paths.
+
+Every case runs on fixed local fixtures (benchmarks/fixtures.py) of 10 to 5,000 sentences in
+several languages, so results are comparable between runs and machines only differ by speed:
+
+    universal_sentences_split   sentence splitting without spaCy
+    preprocess_input            spaCy sentence segmentation (needs the spaCy language models)
+    encode                      model.encode (needs the sentence transformer)
+    sentences_diff              similarity search over fixed random embeddings
+    semantic_compare            the whole comparison, end to end (needs both models)
+    parse_article               action=parse HTML -> CompactArticle -> Article
+    article_fetcher             fetch and parse through the fake MediaWiki server
+
+Cases whose models are not installed are reported as skipped rather than failing.
+
+Results are written as JSON. Given a baseline (the JSON of an earlier run), the suite exits with
+status 1 when a case's median time regressed by more than its threshold (--max-regression, or
+per case in a thresholds file such as benchmarks/thresholds.json).
+
+Run from the backend-fastapi directory:
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --quick --baseline results.json --thresholds benchmarks/thresholds.json
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.ai import semantic_comparison
+from app.services import article_parser
+from benchmarks.fake_server import running_fake_mediawiki, write_synthetic_fixtures
+from benchmarks.fixtures import LANGUAGES, make_article_html, make_article_text
+
+SIZES = (10, 100, 1000, 5000)  # Sentences per fixture
+QUICK_SIZES = (10, 100, 1000)
+ENCODE_SIZES = (10, 100, 1000)  # Encoding 5,000 sentences takes minutes on a CPU
+MODEL = semantic_comparison.DEFAULT_MODEL
+EMBEDDING_SIZE = 768
+MIN_TIME = 0.5  # Seconds each case is repeated for, at least
+MIN_REPEATS = 3
+MAX_REPEATS = 1000
+DEFAULT_MAX_REGRESSION = 0.25  # Fraction of the baseline median
+
+
+class Skip(Exception):
+    """Raised by a case's setup when it cannot run here, e.g. a model is not installed."""
+
+
+_unavailable = {}  # Model name -> why it could not be loaded, so each model is only tried once
+
+
+def measure(function, min_time=MIN_TIME):
+    """Run a function repeatedly; returns the timings of the runs in seconds."""
+    function()  # Warm up
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < MIN_REPEATS or (time.perf_counter() - started < min_time and len(timings) < MAX_REPEATS):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _require(model_name, load, description):
+    if model_name in _unavailable:
+        raise Skip(_unavailable[model_name])
+    try:
+        return load(model_name)
+    except Exception as e:
+        _unavailable[model_name] = f"{description} '{model_name}' is not available: {e}"
+        raise Skip(_unavailable[model_name])
+
+
+def _require_model():
+    return _require(MODEL, semantic_comparison.load_model, "sentence transformer")
+
+
+def _require_spacy(lang):
+    _require(semantic_comparison.language_model_map[lang], semantic_comparison.load_spacy, "spaCy model")
+
+
+def _sentences(size, lang):
+    return semantic_comparison.universal_sentences_split(make_article_text(size, lang, seed=size))
+
+
+def cases(sizes):
+    """(name, params, setup) for every case; setup() returns the function to time."""
+    for size in sizes:
+        for lang in LANGUAGES:
+            params = {"sentences": size, "lang": lang}
+
+            def split_setup(size=size, lang=lang):
+                text = make_article_text(size, lang, seed=size)
+                return lambda: semantic_comparison.universal_sentences_split(text)
+            yield "universal_sentences_split", params, split_setup
+
+            if lang in semantic_comparison.language_model_map:
+                def preprocess_setup(size=size, lang=lang):
+                    _require_spacy(lang)
+                    text = make_article_text(size, lang, seed=size)
+                    return lambda: semantic_comparison.preprocess_input(text, lang)
+                yield "preprocess_input", params, preprocess_setup
+
+        def diff_setup(size=size):
+            rng = np.random.default_rng(size)
+            first = rng.standard_normal((size, EMBEDDING_SIZE), dtype=np.float32)
+            second = rng.standard_normal((size, EMBEDDING_SIZE), dtype=np.float32)
+            sentences = [""] * size
+            return lambda: semantic_comparison.sentences_diff(sentences, first, second, 0.75)
+        yield "sentences_diff", {"sentences": size}, diff_setup
+
+        if size in ENCODE_SIZES:
+            def encode_setup(size=size):
+                model = _require_model()
+                sentences = _sentences(size, "en")
+                return lambda: model.encode(sentences)
+            yield "encode", {"sentences": size, "model": MODEL}, encode_setup
+
+            def compare_setup(size=size):
+                _require_model()
+                _require_spacy("en")
+                _require_spacy("fr")
+                source = make_article_text(size, "en", seed=size)
+                target = make_article_text(size, "fr", seed=size)
+                return lambda: semantic_comparison.semantic_compare(MODEL, source, target, "en", "fr", 0.75)
+            yield "semantic_compare", {"sentences": size, "model": MODEL, "langs": "en-fr"}, compare_setup
+
+        # About six sentences per paragraph
+        def parse_setup(size=size):
+            html = make_article_html(max(size // 6, 1), seed=size)
+            return lambda: article_parser.parse_compact_article(html, "Benchmark", "en").to_article()
+        yield "parse_article", {"sentences": size}, parse_setup
+
+
+def fetcher_cases(sizes, fixtures):
+    for size in sizes:
+        title = f"Benchmark {size}"
+        write_synthetic_fixtures(fixtures, [title], max(size // 6, 1), languages=("en",))
+        yield "article_fetcher", {"sentences": size}, lambda title=title: (
+            lambda: article_parser.article_fetcher(title, "en")
+        )
+
+
+def run_case(name, params, setup, min_time):
+    result = {"name": name, "params": params}
+    try:
+        function = setup()
+    except Skip as e:
+        return {**result, "status": "skipped", "reason": str(e)}
+    timings = measure(function, min_time)
+    result.update({
+        "status": "ok",
+        "repeats": len(timings),
+        "median_s": statistics.median(timings),
+        "min_s": min(timings),
+        "mean_s": statistics.fmean(timings),
+    })
+    if "sentences" in params:
+        result["sentences_per_s"] = params["sentences"] / result["median_s"]
+    return result
+
+
+def case_key(result):
+    return result["name"] + "[" + ",".join(f"{key}={value}" for key, value in sorted(result["params"].items())) + "]"
+
+
+def compare_to_baseline(results, baseline, max_regression, thresholds):
+    """The cases whose median regressed beyond their threshold, as printable lines."""
+    previous = {case_key(result): result for result in baseline["results"] if result["status"] == "ok"}
+    regressions = []
+    for result in results:
+        before = previous.get(case_key(result))
+        if result["status"] != "ok" or before is None:
+            continue
+        allowed = thresholds.get(result["name"], max_regression)
+        change = result["median_s"] / before["median_s"] - 1
+        result["change"] = change
+        if change > allowed:
+            regressions.append(
+                f"{case_key(result)}: {before['median_s'] * 1000:.3f} ms -> {result['median_s'] * 1000:.3f} ms "
+                f"({change:+.0%}, allowed {allowed:+.0%})"
+            )
+    return regressions
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for the comparison and parsing hot paths.")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Results of an earlier run to check for regressions")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="Allowed slowdown of the median, as a fraction (default 0.25)")
+    parser.add_argument("--thresholds", help="JSON file with the allowed slowdown per case name")
+    parser.add_argument("--quick", action="store_true", help="Skip the 5,000 sentence fixtures")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="Seconds to repeat each case for")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)  # Keep per-request log lines out of the timings
+    sizes = QUICK_SIZES if args.quick else SIZES
+    results = []
+    with tempfile.TemporaryDirectory() as fixtures:
+        all_cases = list(cases(sizes)) + list(fetcher_cases(sizes, fixtures))
+        with running_fake_mediawiki(fixtures):
+            for name, params, setup in all_cases:
+                if args.filter and args.filter not in name:
+                    continue
+                result = run_case(name, params, setup, args.min_time)
+                results.append(result)
+                if result["status"] == "ok":
+                    print(f"{case_key(result):<60} {result['median_s'] * 1000:>10.3f} ms  ({result['repeats']} runs)")
+                else:
+                    print(f"{case_key(result):<60} {'skipped':>13}  {result['reason'].splitlines()[0][:80]}")
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        thresholds = {}
+        if args.thresholds:
+            with open(args.thresholds) as file:
+                thresholds = json.load(file)
+        regressions = compare_to_baseline(results, baseline, args.max_regression, thresholds)
+        report["regressions"] = regressions
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if regressions:
+        print(f"\n{len(regressions)} regression(s):")
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,81 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# Frozen backend for the desktop app, laid out for startup speed:
+#
+# - onedir: the app runs from dist/symmetry-backend/ as installed, instead of a single-file
+#   EXE unpacking the whole torch/transformers/spaCy tree to a temp dir on every launch.
+# - No UPX on large native libraries: decompressing them costs more at load time than it
+#   saves on disk. Small binaries are still compressed when UPX is available.
+# - Heavy packages the service never uses are excluded.
+# - No models are bundled. They are downloaded to and loaded from a persistent cache
+#   directory on first use (app/services/model_cache.py).
+#
+# Build from the backend-fastapi directory:
+#     pyinstaller --noconfirm main.spec
+# Measure the result:
+#     python -m benchmarks.cold_start --command dist/symmetry-backend/symmetry-backend
 
+import os
+
+# Binaries larger than this are left uncompressed
+UPX_MAX_BYTES = 2 * 1024 * 1024
 
 a = Analysis(
     ['app/main.py'],
-    pathex=[],
+    pathex=[SPECPATH],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    # uvicorn picks its event loop, protocol and lifespan implementations by name
+    hiddenimports=[
+        'uvicorn.logging',
+        'uvicorn.loops.auto',
+        'uvicorn.protocols.http.auto',
+        'uvicorn.protocols.websockets.auto',
+        'uvicorn.lifespan.on',
+    ],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        'app.test',
+        'benchmarks',
+        'IPython',
+        'jupyter',
+        'jupyter_client',
+        'jupyter_core',
+        'matplotlib',
+        # Pulled in transitively; its runtime hook would import it on every launch
+        'nltk',
+        'notebook',
+        'pytest',
+        'tensorboard',
+        'tkinter',
+        'torch.utils.tensorboard',
+        'torchaudio',
+        'torchvision',
+        'triton',
+    ],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
+upx_exclude = sorted({
+    os.path.basename(dest)
+    for dest, source, kind in a.binaries
+    if os.path.exists(source) and os.path.getsize(source) > UPX_MAX_BYTES
+})
+
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
-    name='main',
+    exclude_binaries=True,
+    name='symmetry-backend',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +83,12 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=upx_exclude,
+    name='symmetry-backend',
+)
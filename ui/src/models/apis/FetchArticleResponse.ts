@@ -10,4 +10,5 @@ export type FetchArticleResponse = {
   keys: any;
   sourceArticle: string; // Assuming 'article' contains 'text' and 'title'
   articleLanguages: Record<string, string>; // Assuming 'languages' is a map of language codes to language names
+  articleLanguageTitles?: Record<string, string>; // Map of language codes to the article title in that language
 }
@@ -21,7 +21,7 @@ export async function compareArticles(textA: string, textB: string): Promise<Axi
       article_text_blob_1_language: 'en',
       article_text_blob_2_language: 'en',
       comparison_threshold: 0.5,
-      model_name: 'default'
+      model_name: 'sentence-transformers/LaBSE'
     });
   } catch (error) {
     console.error('Failed to get axios instance:', error);